@@ -1,14 +1,24 @@
 import tempfile
 
 import pytest
+from core.runner import isolated_settings
 from mixer.backend.django import mixer as _mixer
 from posts.models import Post, Group
 
 
+@pytest.fixture(scope='session', autouse=True)
+def isolated_storage():
+    with tempfile.TemporaryDirectory() as temp_directory:
+        with isolated_settings(temp_directory):
+            yield temp_directory
+
+
 @pytest.fixture()
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
+        # Миниатюры создаются до удаления временного каталога.
+        settings.POST_THUMBNAILS_EAGER = True
         yield temp_directory
 
 
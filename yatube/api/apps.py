@@ -0,0 +1,7 @@
+"""Модуль настройки приложения Api Django."""
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    """Настройка приложения Api."""
+    name = 'api'
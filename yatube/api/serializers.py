@@ -0,0 +1,140 @@
+"""Модуль сериализации постов и комментариев для API.
+
+Поле ответа - функция от объекта и запроса. Клиент выбирает поля
+параметром ?fields=id,text,author, и вычисляются только они.
+Ответ кодируется по частям (iter_json): каждый объект превращается
+в JSON отдельно, и ни страница, ни комментарии поста не собираются
+в один список перед отправкой.
+"""
+
+
+import json
+from collections.abc import Iterator as IteratorABC
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+Field = Callable[[object, object], object]
+
+POST_FIELDS: Dict[str, Field] = {
+    'id': lambda post, request: post.pk,
+    'text': lambda post, request: post.text,
+    'created': lambda post, request: post.created,
+    'updated': lambda post, request: post.updated,
+    'author': lambda post, request: post.author.username,
+    'author_name': lambda post, request: post.author.get_full_name(),
+    'group': lambda post, request: post.group.slug if post.group else None,
+    'group_title': (
+        lambda post, request: post.group.title if post.group else None),
+    'image': (
+        lambda post, request:
+        request.build_absolute_uri(post.image.url) if post.image else None
+    ),
+    'image_width': lambda post, request: post.image_width,
+    'image_height': lambda post, request: post.image_height,
+    'comment_count': (
+        lambda post, request: getattr(post, 'comment_count', None)),
+    'last_comment': (
+        lambda post, request: getattr(post, 'last_comment', None)),
+    'url': lambda post, request: request.build_absolute_uri(
+        reverse('posts:post_detail', args=[post.pk])),
+}
+
+COMMENT_FIELDS: Dict[str, Field] = {
+    'id': lambda comment, request: comment.pk,
+    'text': lambda comment, request: comment.text,
+    'created': lambda comment, request: comment.created,
+    'author': lambda comment, request: comment.author.username,
+}
+
+# Поля ответа с одним постом: поля ленты и комментарии.
+POST_DETAIL_FIELDS: Dict[str, Field] = {
+    **POST_FIELDS,
+    'comments': lambda post, request: iter_comments(post, request),
+}
+
+
+class FieldsError(ValueError):
+    """Неизвестные поля в параметре ?fields=."""
+
+
+def parse_fields(value: Optional[str],
+                 available: Dict[str, Field]) -> List[str]:
+    """Имена полей из параметра ?fields= (все поля, если не задан)."""
+    if not value:
+        return list(available)
+    fields = list(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise FieldsError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступные поля: {", ".join(available)}.'
+        )
+    return fields
+
+
+def serialize(obj, request, fields: Iterable[str],
+              available: Dict[str, Field]) -> dict:
+    """Выбранные поля объекта."""
+    return {name: available[name](obj, request) for name in fields}
+
+
+def iter_comments(post: Post, request) -> Iterator[dict]:
+    """Комментарии поста по порядку, читаемые из БД пачками."""
+    comments = (
+        Comment.objects.filter(post=post)
+        .select_related('author')
+        .only('id', 'text', 'created', 'author__username')
+        .order_by('created', 'pk')
+    )
+    for comment in comments.iterator(chunk_size=100):
+        yield serialize(comment, request, COMMENT_FIELDS, COMMENT_FIELDS)
+
+
+def encode(value) -> str:
+    """JSON одного значения."""
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def iter_json(obj: dict) -> Iterator[str]:
+    """JSON объекта по частям.
+
+    Значения-итераторы (генераторы) записываются как массивы
+    поэлементно, вложенные словари - рекурсивно.
+    """
+    yield '{'
+    for index, (key, value) in enumerate(obj.items()):
+        yield (',' if index else '') + encode(key) + ':'
+        if isinstance(value, dict):
+            yield from iter_json(value)
+        elif isinstance(value, IteratorABC):
+            yield '['
+            for position, item in enumerate(value):
+                if position:
+                    yield ','
+                if isinstance(item, dict):
+                    yield from iter_json(item)
+                else:
+                    yield encode(item)
+            yield ']'
+        else:
+            yield encode(value)
+    yield '}'
+
+
+def stream_json(obj: dict, chunk_size: int = 8192) -> Iterator[bytes]:
+    """JSON объекта блоками примерно по chunk_size символов."""
+    buffer: List[str] = []
+    length = 0
+    for part in iter_json(obj):
+        buffer.append(part)
+        length += len(part)
+        if length >= chunk_size:
+            yield ''.join(buffer).encode()
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
@@ -0,0 +1,165 @@
+"""Модуль тестов приложения Api."""
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestFeedApi(TestCase):
+    """Тесты JSON API лент и постов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Настройка фикстур для тестов."""
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Анна', last_name='Ахматова')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Стихи', slug='poems', description='Стихи')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Стих {number}')
+            for number in range(15)
+        ]
+        cls.other_post = Post.objects.create(
+            author=cls.reader, text='Пост читателя')
+        Comment.objects.create(
+            author=cls.reader, post=cls.posts[0], text='Первый')
+        Comment.objects.create(
+            author=cls.author, post=cls.posts[0], text='Второй')
+
+    def setUp(self):
+        """Настройка клиентов."""
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, client, url, **params):
+        """Ответ API и разобранное тело."""
+        response = client.get(url, params)
+        content = b''.join(response.streaming_content) if (
+            response.streaming) else response.content
+        return response, json.loads(content) if content else None
+
+    def test_index_fields_projection(self):
+        """Ответ содержит только запрошенные поля."""
+        response, data = self.get_json(
+            self.guest_client, reverse('api:v1:index'),
+            fields='id,author,group')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.other_post.pk, 'author': 'reader', 'group': None})
+        self.assertEqual(
+            data['results'][1],
+            {'id': self.posts[-1].pk, 'author': 'writer', 'group': 'poems'})
+
+    def test_all_fields_by_default(self):
+        """Без fields отдаются все поля поста."""
+        response, data = self.get_json(
+            self.guest_client, reverse('api:v1:group_posts', args=['poems']),
+            limit=20)
+        first = data['results'][-1]
+        self.assertEqual(first['text'], 'Стих 0')
+        self.assertEqual(first['author_name'], 'Анна Ахматова')
+        self.assertEqual(first['group_title'], 'Стихи')
+        self.assertEqual(first['comment_count'], 2)
+        self.assertTrue(first['url'].endswith(
+            reverse('posts:post_detail', args=[self.posts[0].pk])))
+        self.assertIsNone(data['next'])
+
+    def test_unknown_field(self):
+        """Неизвестное поле - 400 с описанием."""
+        response, data = self.get_json(
+            self.guest_client, reverse('api:v1:index'), fields='id,secret')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('secret', data['detail'])
+
+    def test_cursor_pagination(self):
+        """Ссылка next ведет на следующую страницу с теми же полями."""
+        url = reverse('api:v1:profile', args=['writer'])
+        response, data = self.get_json(
+            self.guest_client, url, fields='id', limit=10)
+        self.assertEqual(
+            [item['id'] for item in data['results']],
+            [post.pk for post in reversed(self.posts[5:])])
+        self.assertIsNone(data['previous'])
+        response, data = self.get_json(self.guest_client, data['next'])
+        self.assertEqual(
+            data['results'],
+            [{'id': post.pk} for post in reversed(self.posts[:5])])
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+    def test_limit_is_capped(self):
+        """Размер страницы ограничен API_MAX_PAGE_SIZE."""
+        with self.settings(API_MAX_PAGE_SIZE=3):
+            response, data = self.get_json(
+                self.guest_client, reverse('api:v1:index'), limit=1000)
+        self.assertEqual(len(data['results']), 3)
+
+    def test_etag(self):
+        """Повторный запрос с ETag получает 304, изменение - новый ETag."""
+        url = reverse('api:v1:index')
+        response = self.guest_client.get(url, {'fields': 'id,text'})
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        response = self.guest_client.get(
+            url, {'fields': 'id,text'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.guest_client.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        post = Post.objects.get(pk=self.other_post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.guest_client.get(
+            url, {'fields': 'id,text'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_not_found(self):
+        """Несуществующие группа, автор и пост - 404 в JSON."""
+        urls = (
+            reverse('api:v1:group_posts', args=['missing']),
+            reverse('api:v1:profile', args=['missing']),
+            reverse('api:v1:post_detail', args=[100500]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response, data = self.get_json(self.guest_client, url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', data)
+
+    def test_follow_index(self):
+        """Лента подписок доступна только авторизованному пользователю."""
+        url = reverse('api:v1:follow_index')
+        response, data = self.get_json(self.guest_client, url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response, data = self.get_json(
+            self.reader_client, url, fields='id', limit=3)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(
+            data['results'],
+            [{'id': post.pk} for post in reversed(self.posts[-3:])])
+
+    def test_post_detail_with_comments(self):
+        """Пост отдается с комментариями по порядку."""
+        response, data = self.get_json(
+            self.guest_client,
+            reverse('api:v1:post_detail', args=[self.posts[0].pk]),
+            fields='id,comments')
+        self.assertEqual(data['id'], self.posts[0].pk)
+        self.assertEqual(
+            [(item['author'], item['text']) for item in data['comments']],
+            [('reader', 'Первый'), ('writer', 'Второй')])
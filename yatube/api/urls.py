@@ -0,0 +1,28 @@
+"""Модуль настройки путей url Django.
+
+Версия API входит в путь: /api/v1/... Несовместимые изменения
+формата добавляются новой версией, старая продолжает работать.
+"""
+
+
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+v1_urlpatterns = [
+    path('posts/', views.index, name='index'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path(
+        'profiles/<str:username>/posts/',
+        views.profile,
+        name='profile'
+    ),
+    path('follow/posts/', views.follow_index, name='follow_index'),
+]
+
+urlpatterns = [
+    path('v1/', include((v1_urlpatterns, 'v1'))),
+]
@@ -0,0 +1,186 @@
+"""Модуль функций отображения API.
+
+Ленты выбираются теми же выборками и курсорными паджинаторами,
+что и HTML-страницы (см. posts.views). Ответ - потоковый JSON
+(см. api.serializers) с ETag: при совпадении ETag клиент получает
+304, и сериализация не выполняется.
+"""
+
+
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from core.conditional import conditional_response, make_etag
+from core.surrogate_keys import add_surrogate_keys
+from posts.caching import (page_surrogate_keys, post_snippet_cache_key,
+                           post_surrogate_keys)
+from posts.feeds import FeedPaginator
+from posts.models import Group, Post
+from posts.paginators import CursorPaginator
+
+from .serializers import (POST_DETAIL_FIELDS, POST_FIELDS, FieldsError,
+                          parse_fields, serialize, stream_json)
+
+User = get_user_model()
+
+API_VERSION = 'v1'
+
+
+def error(status: int, detail: str) -> JsonResponse:
+    """Ответ с описанием ошибки."""
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def page_size(request) -> int:
+    """Размер страницы из ?limit= в пределах API_MAX_PAGE_SIZE."""
+    try:
+        limit = int(request.GET['limit'])
+    except (KeyError, ValueError):
+        return settings.NUMBER_OF_POSTS_TO_VIEW
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def page_link(request, **params) -> str:
+    """Адрес соседней страницы с теми же fields и limit."""
+    query = request.GET.copy()
+    for name in ('after', 'before', 'page'):
+        query.pop(name, None)
+    query.update(params)
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def json_response(request, get_content: Callable[[], dict], etag: str,
+                  private: bool = False):
+    """Условный потоковый JSON-ответ.
+
+    Ответ можно хранить в кэшах, но перед использованием его нужно
+    проверить на сервере по ETag (no-cache).
+    """
+    response = conditional_response(
+        request,
+        lambda: StreamingHttpResponse(
+            stream_json(get_content()), content_type='application/json'),
+        etag,
+    )
+    response['Cache-Control'] = (
+        'private, no-cache' if private else 'public, no-cache')
+    return response
+
+
+def feed_response(request, paginator: CursorPaginator,
+                  surrogate_keys: List[str], private: bool = False,
+                  extra: Optional[List] = None):
+    """Страница ленты по параметрам ?after=, ?before=, ?page=."""
+    try:
+        fields = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    except FieldsError as exc:
+        return error(400, str(exc))
+    page_obj = paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        number=request.GET.get('page'),
+    )
+    parts: List = [API_VERSION, *fields, paginator.per_page, *(extra or [])]
+    for post in page_obj:
+        parts.extend((
+            post_snippet_cache_key(post),
+            post.group.title if post.group else '',
+        ))
+    parts.extend((paginator.next_cursor, paginator.previous_cursor))
+
+    def get_content() -> Dict:
+        """Содержимое ответа: посты страницы и соседние страницы."""
+        return {
+            'results': (
+                serialize(post, request, fields, POST_FIELDS)
+                for post in page_obj
+            ),
+            'next': page_link(request, after=paginator.next_cursor)
+            if paginator.next_cursor else None,
+            'previous': page_link(request, before=paginator.previous_cursor)
+            if paginator.previous_cursor else None,
+        }
+
+    response = json_response(
+        request, get_content, make_etag(parts), private)
+    return add_surrogate_keys(
+        response, [*surrogate_keys, *page_surrogate_keys(page_obj)])
+
+
+@require_safe
+def index(request):
+    """Лента всех постов."""
+    return feed_response(
+        request,
+        CursorPaginator(Post.objects.for_listing(), page_size(request)),
+        ['posts'],
+    )
+
+
+@require_safe
+def group_posts(request, slug):
+    """Лента постов сообщества."""
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error(404, 'Сообщество не найдено.')
+    return feed_response(
+        request,
+        CursorPaginator(group.posts.for_listing(), page_size(request)),
+        [f'group-{group.pk}'],
+    )
+
+
+@require_safe
+def profile(request, username):
+    """Лента постов автора."""
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error(404, 'Пользователь не найден.')
+    return feed_response(
+        request,
+        CursorPaginator(author.posts.for_listing(), page_size(request)),
+        [f'author-{author.pk}'],
+    )
+
+
+@require_safe
+def follow_index(request):
+    """Лента подписок пользователя (нужна авторизация)."""
+    if request.user.is_anonymous:
+        return error(401, 'Нужна авторизация.')
+    return feed_response(
+        request,
+        FeedPaginator(request.user, page_size(request)),
+        [],
+        private=True,
+        extra=[request.user.pk],
+    )
+
+
+@require_safe
+def post_detail(request, post_id):
+    """Пост с комментариями."""
+    try:
+        fields = parse_fields(request.GET.get('fields'), POST_DETAIL_FIELDS)
+    except FieldsError as exc:
+        return error(400, str(exc))
+    post = Post.objects.select_related(
+        'author', 'group').with_activity().filter(pk=post_id).first()
+    if post is None:
+        return error(404, 'Пост не найден.')
+    etag = make_etag([
+        API_VERSION, *fields,
+        post_snippet_cache_key(post),
+        post.group.title if post.group else '',
+        post.last_comment,
+    ])
+    response = json_response(
+        request,
+        lambda: serialize(post, request, fields, POST_DETAIL_FIELDS),
+        etag,
+    )
+    return add_surrogate_keys(response, post_surrogate_keys(post))
@@ -0,0 +1,761 @@
+"""Модуль общего для процессов узла кэша в файле SQLite
+и двухуровневого кэша поверх него.
+
+LocMemCache у каждого процесса свой: фрагменты страниц и записи
+sorl-thumbnail дублируются в каждом воркере, а доля попаданий падает
+с ростом числа воркеров. SQLiteCache хранит записи в одном файле
+SQLite в режиме WAL: читатели не блокируют друг друга и писателя,
+сервер не нужен. Объем кэша ограничен бюджетом в байтах (MAX_BYTES),
+при превышении вытесняются давно не читавшиеся записи (LRU).
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_BYTES': 256 * 1024 * 1024},
+        },
+    }
+
+TieredCache добавляет к общему бэкенду небольшой LRU в памяти
+процесса и защиту горячих ключей от одновременного пересчета.
+"""
+
+
+import os
+import pickle
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict, namedtuple
+from math import log
+from random import random
+from time import monotonic, sleep, time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Дата последнего чтения обновляется не чаще, чем раз в столько секунд,
+# чтобы чтения почти никогда не брали блокировку записи.
+ACCESS_RESOLUTION: float = 1.0
+# При превышении бюджета записи вытесняются до этой доли бюджета.
+CULL_TARGET: float = 0.9
+# Максимальное количество параметров одного запроса SQLite.
+MAX_QUERY_PARAMS: int = 900
+# UPSERT появился в SQLite 3.24, оконные функции (для вытеснения) - в 3.25.
+MIN_SQLITE_VERSION: Tuple[int, int, int] = (3, 25, 0)
+# С 3.35 incr обходится одной командой UPDATE ... RETURNING.
+RETURNING_SQLITE_VERSION: Tuple[int, int, int] = (3, 35, 0)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache
+BEGIN
+    UPDATE cache_size SET bytes = bytes + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_size SET bytes = bytes + NEW.size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache
+BEGIN
+    UPDATE cache_size SET bytes = bytes - OLD.size;
+END;
+'''
+
+UPSERT = '''
+INSERT INTO cache (key, value, expires, size, accessed)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    size = excluded.size,
+    accessed = excluded.accessed
+'''
+
+INCR = '''
+UPDATE cache SET value = value + ? WHERE key = ?
+AND typeof(value) = 'integer'
+AND (expires IS NULL OR expires > ?)
+'''
+
+
+def _encode(value):
+    """Целые числа хранятся как есть (для incr в SQL), прочее - pickle."""
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    """Значение записи кэша."""
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+def _size(key: str, value) -> int:
+    """Размер записи в байтах для учета бюджета."""
+    return len(key) + (len(value) if isinstance(value, bytes) else 8)
+
+
+def _chunks(keys: List[str]) -> Iterable[List[str]]:
+    """Ключи пачками, которые помещаются в параметры одного запроса."""
+    for start in range(0, len(keys), MAX_QUERY_PARAMS):
+        yield keys[start:start + MAX_QUERY_PARAMS]
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов узла.
+
+    Соединение открывается отдельно в каждом потоке и заново после
+    fork(), поэтому бэкенд безопасен для воркеров gunicorn.
+    Операции записи и incr атомарны между процессами.
+    """
+
+    def __init__(self, location: str, params: dict):
+        """Путь к файлу кэша и бюджет в байтах."""
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise ImproperlyConfigured(
+                'SQLiteCache требует SQLite 3.25 или новее, '
+                f'установлена {sqlite3.sqlite_version}.'
+            )
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Соединение текущего потока (после fork открывается заново)."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.executescript(SCHEMA)
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _key(self, key, version=None) -> str:
+        """Полный ключ записи с проверкой."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _write(self, rows: List[tuple], replace: bool = True) -> List[bool]:
+        """Записывает строки (key, value, expires) одной транзакцией.
+
+        replace=False - только отсутствующие или просроченные ключи.
+        Возвращает признаки записи по строкам.
+        """
+        now = time()
+        written = []
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value, expires in rows:
+                if not replace and db.execute(
+                    'SELECT 1 FROM cache WHERE key = ? '
+                    'AND (expires IS NULL OR expires > ?)',
+                    (key, now),
+                ).fetchone():
+                    written.append(False)
+                    continue
+                db.execute(
+                    UPSERT, (key, value, expires, _size(key, value), now))
+                written.append(True)
+            self._cull(db, now)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return written
+
+    def _cull(self, db: sqlite3.Connection, now: float) -> None:
+        """Вытесняет просроченные, затем давно не читавшиеся записи."""
+        (total,) = db.execute('SELECT bytes FROM cache_size').fetchone()
+        if total <= self._max_bytes:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        (total,) = db.execute('SELECT bytes FROM cache_size').fetchone()
+        excess = total - self._max_bytes * CULL_TARGET
+        if excess > 0:
+            # Давно не читавшиеся записи, сумма размеров которых
+            # покрывает превышение бюджета.
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM ('
+                'SELECT key, size, SUM(size) OVER '
+                '(ORDER BY accessed, key) AS freed FROM cache'
+                ') WHERE freed - size < ?)',
+                (excess,),
+            )
+
+    def _read(self, keys: List[str]) -> Dict[str, object]:
+        """Непросроченные значения ключей; отмечает чтение для LRU."""
+        now = time()
+        found = {}
+        stale = []
+        for chunk in _chunks(keys):
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self._db.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({placeholders}) '
+                f'AND (expires IS NULL OR expires > ?)',
+                (*chunk, now),
+            ).fetchall()
+            for key, value, accessed in rows:
+                found[key] = _decode(value)
+                if accessed < now - ACCESS_RESOLUTION:
+                    stale.append(key)
+        for chunk in _chunks(stale):
+            placeholders = ', '.join('?' * len(chunk))
+            self._db.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({placeholders})',
+                (now, *chunk),
+            )
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        """Записывает значение, только если ключа нет."""
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        return self._write([(key, _encode(value), expires)], replace=False)[0]
+
+    def get(self, key, default=None, version=None):
+        """Значение ключа или default."""
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> None:
+        """Записывает значение."""
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        self._write([(key, _encode(value), expires)])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        """Продлевает время жизни ключа."""
+        key = self._key(key, version)
+        return bool(self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time()),
+        ).rowcount)
+
+    def delete(self, key, version=None) -> None:
+        """Удаляет ключ."""
+        key = self._key(key, version)
+        self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None) -> bool:
+        """Есть ли непросроченный ключ (без отметки чтения)."""
+        key = self._key(key, version)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None) -> int:
+        """Атомарно увеличивает целое значение одной командой UPDATE.
+
+        На SQLite старше 3.35 (без RETURNING) новое значение читается
+        в той же транзакции, что и UPDATE.
+        """
+        full_key = self._key(key, version)
+        params = (delta, full_key, time())
+        if sqlite3.sqlite_version_info >= RETURNING_SQLITE_VERSION:
+            rows = self._db.execute(
+                INCR + 'RETURNING value', params).fetchall()
+        else:
+            rows = self._incr_in_transaction(params)
+        if rows:
+            return rows[0][0]
+        return super().incr(key, delta, version)
+
+    def _incr_in_transaction(self, params: tuple) -> List[tuple]:
+        """UPDATE и чтение нового значения под одной блокировкой записи."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = []
+            if db.execute(INCR, params).rowcount:
+                rows = db.execute(
+                    'SELECT value FROM cache WHERE key = ?', params[1:2]
+                ).fetchall()
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return rows
+
+    def get_many(self, keys, version=None) -> Dict[str, object]:
+        """Значения нескольких ключей одним запросом."""
+        full_keys = {self._key(key, version): key for key in keys}
+        return {
+            full_keys[key]: value
+            for key, value in self._read(list(full_keys)).items()
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT,
+                 version=None) -> List:
+        """Записывает несколько значений одной транзакцией."""
+        expires = self.get_backend_timeout(timeout)
+        self._write([
+            (self._key(key, version), _encode(value), expires)
+            for key, value in data.items()
+        ])
+        return []
+
+    def delete_many(self, keys, version=None) -> None:
+        """Удаляет несколько ключей."""
+        full_keys = [self._key(key, version) for key in keys]
+        for chunk in _chunks(full_keys):
+            placeholders = ', '.join('?' * len(chunk))
+            self._db.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', chunk)
+
+    def clear(self) -> None:
+        """Удаляет все записи."""
+        self._db.execute('DELETE FROM cache')
+
+    def size(self) -> int:
+        """Текущий объем записей в байтах."""
+        return self._db.execute(
+            'SELECT bytes FROM cache_size').fetchone()[0]
+
+
+# Запись двухуровневого кэша в общем бэкенде: значение, мягкий срок
+# годности (после него значение устаревшее) и длительность пересчета.
+CacheEntry = namedtuple('CacheEntry', 'value soft_expires delta')
+
+LOCK_PREFIX = 'lock:'
+LOCK_POLL_INTERVAL: float = 0.05
+STATS_PREFIX = 'cache_stats:'
+STATS_FAMILIES_KEY = 'cache_stats_families'
+STATS_COUNTERS = ('hit', 'stale', 'miss', 'recompute', 'add')
+KEY_SEPARATORS = re.compile(r'[:.|]+')
+
+
+def key_family(key: str) -> str:
+    """Семейство ключа для счетчиков: части ключа до первой с цифрами.
+
+    'template.cache.index_page.<md5>' -> 'template:cache:index_page',
+    'post_snippet:12:<md5>' -> 'post_snippet'.
+    """
+    family = []
+    for part in KEY_SEPARATORS.split(key):
+        if any(char.isdigit() for char in part):
+            break
+        if part:
+            family.append(part)
+    return ':'.join(family) or key
+
+
+class LocalTier:
+    """Состояние процесса для TieredCache: LRU, пересчеты, счетчики.
+
+    Значения хранятся в pickle, как в LocMemCache, чтобы каждый
+    запрос получал свою копию объекта.
+    """
+
+    def __init__(self, max_entries: int):
+        """Пустой LRU на max_entries записей."""
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.recomputing: OrderedDict = OrderedDict()
+        self.counters: Counter = Counter()
+        self.flushed = monotonic()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        """(True, значение) или (False, None), если записи нет."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            pickled, expires = entry
+            if expires <= time():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+        return True, pickle.loads(pickled)
+
+    def set(self, key: str, value, expires: float) -> None:
+        """Записывает значение до expires, вытесняя самые старые."""
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (pickled, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        """Удаляет записи."""
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def start_recompute(self, key: str) -> None:
+        """Отмечает, что процесс взял блокировку пересчета ключа."""
+        with self.lock:
+            self.recomputing[key] = monotonic()
+            while len(self.recomputing) > self.max_entries:
+                self.recomputing.popitem(last=False)
+
+    def finish_recompute(self, key: str) -> Optional[float]:
+        """Длительность пересчета или None, если процесс его не начинал."""
+        with self.lock:
+            started = self.recomputing.pop(key, None)
+        return None if started is None else monotonic() - started
+
+    def count(self, family: str, counter: str) -> None:
+        """Увеличивает счетчик семейства ключей."""
+        with self.lock:
+            self.counters[(family, counter)] += 1
+
+    def take_counters(self, interval: float) -> Counter:
+        """Накопленные счетчики, если прошло interval секунд (или 0)."""
+        with self.lock:
+            if monotonic() - self.flushed < interval:
+                return Counter()
+            counters, self.counters = self.counters, Counter()
+            self.flushed = monotonic()
+        return counters
+
+    def clear(self) -> None:
+        """Очищает LRU, отметки пересчетов и счетчики."""
+        with self.lock:
+            self.entries.clear()
+            self.recomputing.clear()
+            self.counters.clear()
+
+
+_local_tiers: Dict[Tuple[str, int], LocalTier] = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: LRU процесса поверх общего бэкенда.
+
+    LOCATION - алиас общего бэкенда в CACHES. Горячие записи читаются
+    из памяти процесса не дольше LOCAL_TIMEOUT секунд, целые числа
+    (счетчики поколений и версий) всегда читаются из общего бэкенда.
+
+    Защита от одновременного пересчета (stampede):
+
+    - запись хранится в общем бэкенде на STALE_TIMEOUT секунд дольше
+      своего срока; после срока один процесс берет блокировку
+      и пересчитывает значение (get() возвращает ему None),
+      остальные получают устаревшее значение;
+    - до истечения срока процесс может начать пересчет заранее
+      с вероятностью, растущей к концу срока и пропорциональной
+      длительности прошлого пересчета (probabilistic early refresh);
+    - get_or_set() при полном промахе пересчитывает значение в одном
+      процессе, остальные ждут его до LOCK_WAIT секунд.
+
+    Счетчики hit/stale/miss/recompute/add ведутся по семействам ключей
+    (см. key_family) и раз в STATS_FLUSH_INTERVAL секунд переносятся
+    в общий бэкенд, см. stats() и команду cache_stats.
+    """
+
+    def __init__(self, location: str, params: dict):
+        """Алиас общего бэкенда и параметры уровней."""
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 256))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._stale_timeout = int(options.get('STALE_TIMEOUT', 600))
+        self._lock_timeout = int(options.get('LOCK_TIMEOUT', 30))
+        self._lock_wait = float(options.get('LOCK_WAIT', 2))
+        self._beta = float(options.get('EARLY_REFRESH_BETA', 1))
+        self._stats_interval = float(
+            options.get('STATS_FLUSH_INTERVAL', 10))
+
+    @property
+    def _shared(self) -> BaseCache:
+        """Общий бэкенд."""
+        return caches[self._shared_alias]
+
+    @property
+    def _tier(self) -> LocalTier:
+        """Состояние текущего процесса (после fork - новое)."""
+        tier_key = (self._shared_alias, os.getpid())
+        tier = _local_tiers.get(tier_key)
+        if tier is None:
+            with _local_tiers_lock:
+                tier = _local_tiers.setdefault(
+                    tier_key, LocalTier(self._local_max_entries))
+        return tier
+
+    def _count(self, key: str, counter: str) -> None:
+        """Учитывает обращение к ключу, периодически сохраняя счетчики."""
+        self._tier.count(key_family(key), counter)
+        self.flush_stats(self._stats_interval)
+
+    def _acquire(self, key, version) -> bool:
+        """Берет блокировку пересчета ключа во всех процессах."""
+        if self._shared.add(
+            LOCK_PREFIX + key, 1, self._lock_timeout, version=version
+        ):
+            self._tier.start_recompute(self.make_key(key, version))
+            return True
+        return False
+
+    def _release(self, key, version) -> None:
+        """Снимает блокировку пересчета, если ее взял этот процесс."""
+        full_key = self.make_key(key, version)
+        if self._tier.finish_recompute(full_key) is not None:
+            self._shared.delete(LOCK_PREFIX + key, version=version)
+
+    def _refresh_early(self, entry: CacheEntry, now: float) -> bool:
+        """Решение о досрочном пересчете (XFetch)."""
+        if entry.soft_expires is None or not entry.delta:
+            return False
+        return (
+            now - entry.delta * self._beta * log(1 - random())
+            >= entry.soft_expires
+        )
+
+    def _resolve(self, key, stored, version):
+        """Значение из общего бэкенда; None - вызывающий пересчитывает."""
+        if stored is None:
+            self._count(key, 'miss')
+            return None
+        if not isinstance(stored, CacheEntry):
+            self._count(key, 'hit')
+            return stored
+        now = time()
+        if stored.soft_expires is not None and now >= stored.soft_expires:
+            if self._acquire(key, version):
+                self._count(key, 'miss')
+                return None
+            self._count(key, 'stale')
+            return stored.value
+        if self._refresh_early(stored, now) and self._acquire(key, version):
+            self._count(key, 'miss')
+            return None
+        local_expires = now + self._local_timeout
+        if stored.soft_expires is not None:
+            local_expires = min(local_expires, stored.soft_expires)
+        self._tier.set(self.make_key(key, version), stored.value,
+                       local_expires)
+        self._count(key, 'hit')
+        return stored.value
+
+    def _entry(self, key, value, timeout, version, counter='recompute'):
+        """Значение для общего бэкенда и его срок хранения."""
+        self._count(key, counter)
+        duration = self._tier.finish_recompute(self.make_key(key, version))
+        if type(value) is int:
+            return value, timeout
+        if timeout is None:
+            return CacheEntry(value, None, duration), None
+        return (
+            CacheEntry(value, time() + timeout, duration),
+            timeout + self._stale_timeout,
+        )
+
+    def _timeout(self, timeout) -> Optional[int]:
+        """Время жизни в секундах с учетом значения по умолчанию."""
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, key, default=None, version=None):
+        """Значение из памяти процесса или общего бэкенда."""
+        found, value = self._tier.get(self.make_key(key, version))
+        if found:
+            self._count(key, 'hit')
+            return value
+        value = self._resolve(
+            key, self._shared.get(key, version=version), version)
+        return default if value is None else value
+
+    def get_many(self, keys, version=None) -> Dict[str, object]:
+        """Значения ключей: из памяти процесса, остальные одним запросом."""
+        result = {}
+        missing = []
+        for key in keys:
+            found, value = self._tier.get(self.make_key(key, version))
+            if found:
+                self._count(key, 'hit')
+                result[key] = value
+            else:
+                missing.append(key)
+        stored = self._shared.get_many(missing, version=version)
+        for key in missing:
+            value = self._resolve(key, stored.get(key), version)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT,
+                   version=None):
+        """Значение ключа; при промахе его пересчитывает один процесс."""
+        value = self.get(key, version=version)
+        if value is not None:
+            return value
+        full_key = self.make_key(key, version)
+        if (full_key not in self._tier.recomputing
+                and not self._acquire(key, version)):
+            # Значение пересчитывает другой процесс - ждем его.
+            deadline = monotonic() + self._lock_wait
+            while monotonic() < deadline:
+                sleep(LOCK_POLL_INTERVAL)
+                stored = self._shared.get(key, version=version)
+                if stored is not None:
+                    self._count(key, 'hit')
+                    if isinstance(stored, CacheEntry):
+                        return stored.value
+                    return stored
+        try:
+            if callable(default):
+                default = default()
+            if default is not None:
+                self.set(key, default, timeout, version)
+        finally:
+            # Блокировку снимает set(); если значение не получено
+            # (исключение или None), она не ждет LOCK_TIMEOUT.
+            self._release(key, version)
+        return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> None:
+        """Записывает значение в общий бэкенд и снимает блокировку."""
+        timeout = self._timeout(timeout)
+        full_key = self.make_key(key, version)
+        self._tier.delete(full_key)
+        if timeout is not None and timeout <= 0:
+            self._shared.delete(key, version=version)
+            return
+        recomputing = full_key in self._tier.recomputing
+        self._shared.set(
+            key, *self._entry(key, value, timeout, version), version=version)
+        if recomputing:
+            self._shared.delete(LOCK_PREFIX + key, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT,
+                 version=None) -> List:
+        """Записывает несколько значений и снимает их блокировки."""
+        timeout = self._timeout(timeout)
+        self._tier.delete(*(self.make_key(key, version) for key in data))
+        if timeout is not None and timeout <= 0:
+            self._shared.delete_many(list(data), version=version)
+            return []
+        locked = [
+            key for key in data
+            if self.make_key(key, version) in self._tier.recomputing
+        ]
+        by_timeout: Dict[Optional[int], dict] = {}
+        for key, value in data.items():
+            entry, shared_timeout = self._entry(key, value, timeout, version)
+            by_timeout.setdefault(shared_timeout, {})[key] = entry
+        for shared_timeout, entries in by_timeout.items():
+            self._shared.set_many(entries, shared_timeout, version=version)
+        if locked:
+            self._shared.delete_many(
+                [LOCK_PREFIX + key for key in locked], version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        """Записывает значение, только если ключа нет."""
+        timeout = self._timeout(timeout)
+        self._tier.delete(self.make_key(key, version))
+        return self._shared.add(
+            key, *self._entry(key, value, timeout, version, 'add'),
+            version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        """Продлевает время жизни ключа."""
+        stored = self._shared.get(key, version=version)
+        if stored is None:
+            return False
+        if isinstance(stored, CacheEntry):
+            stored = stored.value
+        self.set(key, stored, timeout, version)
+        return True
+
+    def incr(self, key, delta=1, version=None) -> int:
+        """Атомарно увеличивает счетчик в общем бэкенде."""
+        return self._shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None) -> None:
+        """Удаляет ключ на обоих уровнях."""
+        self._tier.delete(self.make_key(key, version))
+        self._shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None) -> None:
+        """Удаляет ключи на обоих уровнях."""
+        keys = list(keys)
+        self._tier.delete(*(self.make_key(key, version) for key in keys))
+        self._shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None) -> bool:
+        """Есть ли ключ (в том числе устаревший) в общем бэкенде."""
+        return self._shared.has_key(key, version=version)
+
+    def clear(self) -> None:
+        """Очищает оба уровня."""
+        self._tier.clear()
+        self._shared.clear()
+
+    def flush_stats(self, interval: float = 0) -> None:
+        """Переносит счетчики процесса в общий бэкенд."""
+        counters = self._tier.take_counters(interval)
+        if not counters:
+            return
+        shared = self._shared
+        families = shared.get(STATS_FAMILIES_KEY) or set()
+        new_families = {family for family, _ in counters} - families
+        if new_families:
+            shared.set(STATS_FAMILIES_KEY, families | new_families, None)
+        for (family, counter), value in counters.items():
+            stats_key = f'{STATS_PREFIX}{family}:{counter}'
+            try:
+                shared.incr(stats_key, value)
+            except ValueError:
+                if not shared.add(stats_key, value, None):
+                    shared.incr(stats_key, value)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики всех процессов по семействам ключей."""
+        self.flush_stats()
+        families = sorted(self._shared.get(STATS_FAMILIES_KEY) or ())
+        keys = [
+            f'{STATS_PREFIX}{family}:{counter}'
+            for family in families for counter in STATS_COUNTERS
+        ]
+        values = self._shared.get_many(keys)
+        return {
+            family: {
+                counter: values.get(f'{STATS_PREFIX}{family}:{counter}', 0)
+                for counter in STATS_COUNTERS
+            }
+            for family in families
+        }
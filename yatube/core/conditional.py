@@ -0,0 +1,65 @@
+"""Модуль условных GET-запросов (ETag).
+
+Представление вычисляет ETag страницы по уже выбранным данным
+и передает его в conditional_render() вместо render(). Если ETag
+клиента совпал, шаблон не отрисовывается, клиент получает 304.
+conditional_response() делает то же для любого способа построения
+ответа (например, потокового JSON).
+
+Last-Modified не отправляется: дата по данным страницы (наибольшая
+дата изменения постов) не растет при удалении поста или комментария,
+правке группы или автора и изменении подписок, и клиент, который
+присылает только If-Modified-Since, получал бы устаревшую страницу.
+"""
+
+
+from hashlib import md5
+from typing import Callable, Iterable
+
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def make_etag(parts: Iterable) -> str:
+    """ETag из значений, от которых зависит страница."""
+    return md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def request_etag_parts(request) -> list:
+    """Части ETag, зависящие от пользователя.
+
+    Авторизованный пользователь видит свои ссылки и формы с CSRF-токеном,
+    поэтому в ETag входят его id и секрет CSRF (get_token() создает его
+    заранее, если cookie еще нет). Для гостей страница одинакова,
+    и ETag совпадает с закэшированным ответом.
+    """
+    if request.user.is_anonymous:
+        return ['anonymous']
+    get_token(request)
+    return [request.user.pk, request.META['CSRF_COOKIE']]
+
+
+def conditional_render(request, template: str, context: dict, etag: str):
+    """Ответ 304 при совпадении ETag, иначе render().
+
+    ETag добавляется в оба ответа.
+    """
+    return conditional_response(
+        request, lambda: render(request, template, context), etag)
+
+
+def conditional_response(request, get_response: Callable, etag: str):
+    """Ответ 304 при совпадении ETag, иначе get_response().
+
+    ETag добавляется в оба ответа.
+    """
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = get_response()
+    response['ETag'] = etag
+    return response
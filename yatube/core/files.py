@@ -0,0 +1,152 @@
+"""Модуль отдачи файлов с диска.
+
+serve_file() отвечает на условные запросы сам, а тело файла либо
+передает фронтенд-серверу заголовком X-Sendfile (Apache, lighttpd)
+или X-Accel-Redirect (nginx), либо отдает FileResponse: WSGI-сервер
+с file_wrapper (gunicorn) отправляет файл целиком через sendfile()
+без копирования в Python. Запросы Range с одним диапазоном получают
+206 Partial Content.
+"""
+
+
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .conditional import make_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class RangeFile:
+    """Файл, ограниченный диапазоном байтов, для FileResponse.
+
+    Метода fileno() нет намеренно: file_wrapper сервера не должен
+    отправлять файл через sendfile() дальше конца диапазона.
+    """
+
+    def __init__(self, file, start: int, length: int) -> None:
+        """Файл, позиционированный на начало диапазона."""
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        """Чтение в пределах диапазона."""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        """Закрытие файла."""
+        self.file.close()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(начало, конец включительно) одного диапазона Range или None.
+
+    Несколько диапазонов и некорректный заголовок дают None:
+    клиент получает файл целиком, как разрешает RFC 7233.
+    Диапазон за пределами файла дает (size, size).
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None or not size:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start >= size:
+        return size, size
+    return start, end
+
+
+def _if_range_matches(request, etag: str, last_modified: int) -> bool:
+    """Заголовок If-Range отсутствует или совпадает с файлом."""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def serve_file(request, path: str, name: str,
+               immutable: bool = False) -> HttpResponse:
+    """Ответ с файлом path (name - его имя относительно MEDIA_ROOT).
+
+    Способ отдачи задает MEDIA_SENDFILE: 'x-sendfile',
+    'x-accel-redirect' (внутренний location MEDIA_ACCEL_REDIRECT_PREFIX)
+    или None - отдача самим Django. Файлы immutable кэшируются
+    навсегда, остальные - на MEDIA_MAX_AGE секунд.
+    """
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(make_etag([stat.st_mtime_ns, stat.st_size]))
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, name, stat.st_size,
+                                  etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if immutable
+        else f'public, max-age={settings.MEDIA_MAX_AGE}'
+    )
+    return response
+
+
+def _file_response(request, path: str, name: str, size: int,
+                   etag: str, last_modified: int) -> HttpResponse:
+    """Тело ответа: заголовок для фронтенда или FileResponse."""
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+    if settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + name)
+        return response
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+    if byte_range == (size, size):
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file, start, end - start + 1),
+            content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1 @@
+"""Модуль - указатель того, что директория является пакетом."""
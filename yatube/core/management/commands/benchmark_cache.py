@@ -0,0 +1,120 @@
+"""Команда сравнения бэкендов кэша под нагрузкой нескольких процессов."""
+
+
+import multiprocessing
+import os
+import random
+import tempfile
+from time import monotonic
+from typing import Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+def _create_backend(name: str, location: str):
+    """Экземпляр бэкенда из settings.CACHE_BACKENDS.
+
+    Файловые бэкенды получают временный файл вместо рабочего,
+    чтобы замер не вытеснял записи кэша сайта.
+    """
+    params = dict(settings.CACHE_BACKENDS[name])
+    backend_class = import_string(params.pop('BACKEND'))
+    if 'LOCATION' in params:
+        params['LOCATION'] = location
+    return backend_class(params.get('LOCATION', ''), params)
+
+
+def _run_worker(args) -> Tuple[int, int, int, float]:
+    """Нагрузка одного процесса: чтения с досчетом промахов и incr.
+
+    Ключи выбираются с перекосом к горячим (как фрагменты страниц),
+    промах записывает значение заданного размера.
+    Возвращает (операций, попаданий, чтений, секунд).
+    """
+    name, location, operations, keys, value_size, seed = args
+    backend = _create_backend(name, location)
+    rnd = random.Random(seed)
+    value = 'x' * value_size
+    hits = reads = 0
+    backend.set('benchmark-counter', 0)
+    started = monotonic()
+    for _ in range(operations):
+        if rnd.random() < 0.1:
+            backend.incr('benchmark-counter')
+            continue
+        key = f'benchmark-{int(rnd.paretovariate(0.6)) % keys}'
+        reads += 1
+        if backend.get(key) is None:
+            backend.set(key, value, 300)
+        else:
+            hits += 1
+    return operations, hits, reads, monotonic() - started
+
+
+class Command(BaseCommand):
+    """Сравнивает бэкенды кэша из settings.CACHE_BACKENDS."""
+    help = ('Замеряет пропускную способность и долю попаданий бэкендов '
+            'кэша под нагрузкой нескольких процессов.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--backend',
+            action='append',
+            dest='backends',
+            help='Имя бэкенда из CACHE_BACKENDS (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=4,
+            help='Количество процессов нагрузки.',
+        )
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=10000,
+            help='Количество операций на процесс.',
+        )
+        parser.add_argument(
+            '--keys',
+            type=int,
+            default=5000,
+            help='Количество различных ключей.',
+        )
+        parser.add_argument(
+            '--value-size',
+            type=int,
+            default=2048,
+            help='Размер значения в байтах.',
+        )
+
+    def handle(self, *args, **options):
+        """Запуск замеров."""
+        names = options['backends'] or list(settings.CACHE_BACKENDS)
+        unknown = set(names) - set(settings.CACHE_BACKENDS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные бэкенды: {", ".join(sorted(unknown))}.')
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            for name in names:
+                location = os.path.join(directory, f'{name}.sqlite3')
+                jobs = [
+                    (name, location, options['operations'], options['keys'],
+                     options['value_size'], seed)
+                    for seed in range(options['processes'])
+                ]
+                with context.Pool(options['processes']) as pool:
+                    results = pool.map(_run_worker, jobs)
+                operations = sum(result[0] for result in results)
+                hits = sum(result[1] for result in results)
+                reads = sum(result[2] for result in results)
+                elapsed = max(result[3] for result in results)
+                self.stdout.write(
+                    f'{name}: {operations / elapsed:.0f} оп/с, '
+                    f'попаданий {hits / max(reads, 1):.1%}, '
+                    f'{elapsed:.2f} с.'
+                )
@@ -0,0 +1,41 @@
+"""Команда вывода счетчиков двухуровневого кэша."""
+
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache import STATS_COUNTERS, TieredCache
+
+
+class Command(BaseCommand):
+    """Выводит счетчики hit/stale/miss/recompute/add по семействам ключей."""
+    help = ('Выводит счетчики попаданий, устаревших значений, промахов, '
+            'пересчетов и записей add двухуровневого кэша по семействам '
+            'ключей.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--alias',
+            default='default',
+            help='Алиас кэша TieredCache в CACHES.',
+        )
+
+    def handle(self, *args, **options):
+        """Вывод счетчиков."""
+        backend = caches[options['alias']]
+        if not isinstance(backend, TieredCache):
+            raise CommandError(
+                f'Кэш {options["alias"]} не является TieredCache.')
+        header = ['семейство'.ljust(40)]
+        header.extend(name.rjust(10) for name in STATS_COUNTERS)
+        header.append('попаданий'.rjust(10))
+        self.stdout.write(' '.join(header))
+        for family, counters in backend.stats().items():
+            reads = counters['hit'] + counters['stale'] + counters['miss']
+            hit_rate = (counters['hit'] + counters['stale']) / max(reads, 1)
+            self.stdout.write(' '.join([
+                family.ljust(40),
+                *(str(counters[name]).rjust(10) for name in STATS_COUNTERS),
+                f'{hit_rate:.1%}'.rjust(10),
+            ]))
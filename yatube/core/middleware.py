@@ -0,0 +1,166 @@
+"""Модуль промежуточных слоев приложения Core."""
+
+
+import mimetypes
+import os
+import re
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import ENCODINGS
+from .surrogate_keys import get_key_versions, get_surrogate_keys
+
+PAGE_CACHE_PREFIX = 'page_cache:'
+PAGE_CACHE_HEADER = 'X-Page-Cache'
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш полных ответов для неавторизованных пользователей.
+
+    Кэшируются только GET/HEAD-ответы 200 без cookie, помеченные
+    представлением суррогатными ключами. Вместе с ответом хранятся
+    версии его ключей; ответ читается из кэша, пока версии не
+    изменились; ETag и Last-Modified закэшированного ответа
+    проверяются так же, как в представлении, и на совпадение
+    отдается 304. Заголовок X-Page-Cache: HIT или MISS.
+    Должен стоять после AuthenticationMiddleware и
+    DebugToolbarMiddleware, чтобы в кэш не попадала панель отладки.
+    """
+
+    def __init__(self, get_response):
+        """Сохраняем следующий обработчик."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Отдаем ответ из кэша или кэшируем новый."""
+        if not self._is_cacheable_request(request):
+            return self.get_response(request)
+
+        cache_key = self._cache_key(request)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            response, versions = entry
+            if get_key_versions(versions) == versions:
+                response = get_conditional_response(
+                    request,
+                    etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified', '')),
+                    response=response,
+                )
+                response[PAGE_CACHE_HEADER] = 'HIT'
+                return response
+
+        response = self.get_response(request)
+        keys = get_surrogate_keys(response)
+        if keys and self._is_cacheable_response(response):
+            cache.set(
+                cache_key,
+                (response, get_key_versions(keys)),
+                settings.PAGE_CACHE_TIMEOUT,
+            )
+            response[PAGE_CACHE_HEADER] = 'MISS'
+        return response
+
+    @staticmethod
+    def _is_cacheable_request(request) -> bool:
+        """GET/HEAD-запрос неавторизованного пользователя."""
+        return (
+            request.method in ('GET', 'HEAD')
+            and request.user.is_anonymous
+        )
+
+    @staticmethod
+    def _is_cacheable_response(response) -> bool:
+        """Готовый ответ 200 без cookie."""
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
+
+    @staticmethod
+    def _cache_key(request) -> str:
+        """Ключ кэша ответа: хост и полный путь запроса."""
+        url = f'{request.get_host()}{request.get_full_path()}'
+        return PAGE_CACHE_PREFIX + md5(url.encode()).hexdigest()
+
+
+class StaticFilesMiddleware:
+    """Отдача собранной статики из STATIC_ROOT.
+
+    Файлы с хешем в имени (см. CompressedManifestStaticFilesStorage)
+    отдаются с Cache-Control immutable на год, остальные - на
+    STATIC_MAX_AGE секунд. Если клиент принимает br или gzip и рядом
+    с файлом лежит сжатая копия, отдается она с Content-Encoding.
+    Файлы, которых нет в STATIC_ROOT, передаются дальше (при DEBUG
+    их отдает staticfiles). Должен стоять первым после
+    SecurityMiddleware: статике не нужны сессии и пользователь.
+    """
+
+    def __init__(self, get_response):
+        """Сохраняем следующий обработчик."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Отдаем файл статики или передаем запрос дальше."""
+        path = self._file_path(request)
+        if path is None:
+            return self.get_response(request)
+        stat = os.stat(path)
+        response = get_conditional_response(
+            request, last_modified=int(stat.st_mtime))
+        if response is None:
+            content_type, _ = mimetypes.guess_type(path)
+            encoding, served = self._encoded(request, path)
+            response = FileResponse(
+                open(served, 'rb'),
+                content_type=content_type or 'application/octet-stream',
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(stat.st_mtime)
+        if any(os.path.exists(path + ext) for ext in ENCODINGS.values()):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        if HASHED_NAME_RE.search(path):
+            response['Cache-Control'] = (
+                'public, max-age=31536000, immutable')
+        else:
+            response['Cache-Control'] = (
+                f'public, max-age={settings.STATIC_MAX_AGE}')
+        return response
+
+    @staticmethod
+    def _file_path(request):
+        """Путь к файлу статики запроса или None."""
+        if request.method not in ('GET', 'HEAD') or not settings.STATIC_ROOT:
+            return None
+        if not request.path_info.startswith(settings.STATIC_URL):
+            return None
+        name = request.path_info[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        return path if os.path.isfile(path) else None
+
+    @staticmethod
+    def _encoded(request, path):
+        """Кодировка и путь к лучшей сжатой копии, которую примет клиент."""
+        accepted = {
+            value.split(';')[0].strip()
+            for value in request.META.get(
+                'HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        for encoding, extension in ENCODINGS.items():
+            if encoding in accepted and os.path.isfile(path + extension):
+                return encoding, path + extension
+        return None, path
@@ -0,0 +1,51 @@
+"""Модуль запуска тестов проекта.
+
+Тесты не должны читать и засорять кэш и медиафайлы запущенного сайта:
+на время прогона файл общего кэша и MEDIA_ROOT переносятся во
+временный каталог, который удаляется после тестов.
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def isolated_settings(directory: str) -> override_settings:
+    """Переопределение настроек: кэш SQLite и медиафайлы в directory."""
+    location = os.path.join(directory, 'cache.sqlite3')
+    backends = {
+        name: dict(params, LOCATION=location)
+        if params['BACKEND'] == 'core.cache.SQLiteCache' else params
+        for name, params in settings.CACHE_BACKENDS.items()
+    }
+    caches = {
+        name: dict(params, LOCATION=location)
+        if params['BACKEND'] == 'core.cache.SQLiteCache' else params
+        for name, params in settings.CACHES.items()
+    }
+    return override_settings(
+        CACHE_BACKENDS=backends,
+        CACHES=caches,
+        MEDIA_ROOT=os.path.join(directory, 'media'),
+    )
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner с кэшем и медиафайлами во временном каталоге."""
+
+    def setup_test_environment(self, **kwargs) -> None:
+        """Создает временный каталог и переключает на него настройки."""
+        super().setup_test_environment(**kwargs)
+        self._directory = tempfile.mkdtemp(prefix='yatube-test-')
+        self._settings = isolated_settings(self._directory)
+        self._settings.enable()
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        """Возвращает настройки и удаляет временный каталог."""
+        self._settings.disable()
+        shutil.rmtree(self._directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
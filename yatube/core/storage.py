@@ -0,0 +1,156 @@
+"""Модуль файловых хранилищ проекта.
+
+ContentAddressedStorage - хранилище картинок постов. Файл сохраняется
+под именем, которое вычисляется из SHA-256 его содержимого,
+в каталогах-шардах по первым символам хеша:
+posts/9f/86/9f86d08...15a08.gif. Одинаковые загрузки получают одно
+имя и хранятся один раз, а каталоги не разрастаются до миллионов
+записей. Учет ссылок на файлы ведет приложение (см. posts.media):
+существующий файл переиспользуется, только если ссылки на него учтены
+(MEDIA_REFERENCE_CHECK), иначе он записывается заново.
+
+CompressedManifestStaticFilesStorage - хранилище статики: имена
+с хешем содержимого и заранее сжатые копии (.gz, .br), которые
+отдает core.middleware.StaticFilesMiddleware.
+"""
+
+
+import gzip
+import hashlib
+import os
+import re
+from posixpath import dirname, join, splitext
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+CONTENT_NAME_RE = re.compile(
+    r'(?:^|/)(?:[0-9a-f]{%d}/){%d}[0-9a-f]{64}(?:\.\w+)?$'
+    % (SHARD_WIDTH, SHARD_LEVELS)
+)
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml',
+    '.ico', '.eot', '.ttf', '.otf',
+)
+COMPRESS_MIN_SIZE = 256
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def is_content_addressed(name: str) -> bool:
+    """Имя файла построено по хешу содержимого."""
+    return bool(CONTENT_NAME_RE.search(name))
+
+
+def content_hash(content) -> str:
+    """SHA-256 содержимого файла, читаемого по частям."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище MEDIA_ROOT, именующее файлы по хешу содержимого.
+
+    Каталог из upload_to и расширение исходного имени сохраняются.
+    Если файл с таким содержимым уже есть и ссылки на него учтены,
+    он не перезаписывается.
+    """
+
+    def content_name(self, name: str, content) -> str:
+        """Имя файла по хешу содержимого."""
+        digest = content_hash(content)
+        shards = [
+            digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+            for level in range(SHARD_LEVELS)
+        ]
+        extension = splitext(name)[1].lower()
+        return join(dirname(name), *shards, digest + extension)
+
+    def is_referenced(self, name: str) -> bool:
+        """Учтены ли ссылки на файл (без MEDIA_REFERENCE_CHECK - да)."""
+        check = getattr(settings, 'MEDIA_REFERENCE_CHECK', None)
+        return check is None or import_string(check)(name)
+
+    def _save(self, name: str, content) -> str:
+        """Сохраняет файл, если такого содержимого еще нет.
+
+        Файл без учтенных ссылок (его удаление могло уже начаться)
+        записывается заново. Запись идет во временный файл, который
+        атомарно заменяет существующий: одновременные загрузки одного
+        содержимого не получают суффиксов в именах.
+        """
+        name = self.content_name(name, content)
+        if self.exists(name) and self.is_referenced(name):
+            return name
+        temporary = super()._save(f'{name}.{uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+content_storage = ContentAddressedStorage()
+
+
+def compress(data: bytes) -> dict:
+    """Сжатые копии данных {расширение: байты}.
+
+    Brotli используется, если установлен пакет brotli. Копия,
+    которая не меньше оригинала, не создается.
+    """
+    compressed = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['.br'] = brotli.compress(data)
+    return {
+        extension: content for extension, content in compressed.items()
+        if len(content) < len(data)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в именах и заранее сжатыми копиями.
+
+    collectstatic после вычисления хешей записывает рядом с текстовыми
+    файлами их .gz (и .br) копии. Если файла нет в манифесте (шаблон
+    ссылается на статику, которая не собрана), url() возвращает
+    исходное имя вместо ошибки.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name: str) -> str:
+        """Имя с хешем или исходное имя отсутствующего файла."""
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Хеширование имен и создание сжатых копий."""
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            if not self.exists(name) or self.size(name) < COMPRESS_MIN_SIZE:
+                continue
+            with self.open(name) as file:
+                data = file.read()
+            for extension, content in compress(data).items():
+                self.delete(name + extension)
+                self._save(name + extension, ContentFile(content))
+                yield name + extension, name + extension, True
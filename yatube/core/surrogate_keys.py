@@ -0,0 +1,56 @@
+"""Модуль суррогатных ключей для кэша страниц.
+
+Представление помечает ответ ключами данных, из которых он собран
+(заголовок Surrogate-Key). Для каждого ключа в кэше хранится номер
+версии; запись данных увеличивает версии своих ключей (purge),
+и все ответы, помеченные этими ключами, перестают читаться из кэша.
+"""
+
+
+from time import time
+from typing import Dict, Iterable, List
+
+from django.core.cache import cache
+
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+KEY_VERSION_PREFIX = 'surrogate_key:'
+
+
+def add_surrogate_keys(response, keys: Iterable[str]):
+    """Добавляет суррогатные ключи в заголовок ответа."""
+    merged = dict.fromkeys(get_surrogate_keys(response))
+    merged.update(dict.fromkeys(keys))
+    response[SURROGATE_KEY_HEADER] = ' '.join(merged)
+    return response
+
+
+def get_surrogate_keys(response) -> List[str]:
+    """Суррогатные ключи ответа."""
+    return response.get(SURROGATE_KEY_HEADER, '').split()
+
+
+def get_key_versions(keys: Iterable[str]) -> Dict[str, int]:
+    """Текущие версии ключей одним запросом к кэшу.
+
+    Отсутствующая (вытесненная) версия создается из текущего времени
+    в миллисекундах, чтобы не совпасть с ранее выданными номерами.
+    """
+    keys = list(keys)
+    stored = cache.get_many([KEY_VERSION_PREFIX + key for key in keys])
+    versions = {}
+    for key in keys:
+        version = stored.get(KEY_VERSION_PREFIX + key)
+        if version is None:
+            cache.add(KEY_VERSION_PREFIX + key, int(time() * 1000), None)
+            version = cache.get(KEY_VERSION_PREFIX + key)
+        versions[key] = version
+    return versions
+
+
+def purge_surrogate_keys(keys: Iterable[str]) -> None:
+    """Сбрасывает закэшированные ответы, помеченные ключами."""
+    for key in set(keys):
+        try:
+            cache.incr(KEY_VERSION_PREFIX + key)
+        except ValueError:
+            cache.add(KEY_VERSION_PREFIX + key, int(time() * 1000), None)
@@ -1,9 +1,30 @@
 """Модуль настройки тестов для приложения Core."""
 
 
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
 from http import HTTPStatus
+from io import StringIO
+from time import time
+from unittest import mock
 
-from django.test import Client, TestCase, override_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+from .cache import CacheEntry, SQLiteCache
+from .middleware import PAGE_CACHE_HEADER
+
+User = get_user_model()
 
 
 @override_settings(BEBUG=False)
@@ -22,3 +43,391 @@ class TestCoreAppPages(TestCase):
             response,
             'core/404.html',
             msg_prefix=f'Не корректный шаблон для {HTTPStatus.NOT_FOUND}.')
+
+
+class TestAnonymousPageCache(TestCase):
+    """Тесты кэша страниц для неавторизованных пользователей."""
+    @classmethod
+    def setUpClass(cls):
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUserName')
+        cls.post = Post.objects.create(author=cls.user, text='Первый пост.')
+
+    def setUp(self):
+        """Очищаем кэш, создаем клиенты."""
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TestAnonymousPageCache.user)
+        self.url = reverse('posts:profile', args=(self.user.username,))
+
+    def test_guest_page_is_cached(self):
+        """Повторный запрос гостя отдается из кэша."""
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'MISS')
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'HIT')
+
+    def test_authorized_page_is_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются."""
+        self.authorized_client.get(self.url)
+        response = self.authorized_client.get(self.url)
+        self.assertFalse(response.has_header(PAGE_CACHE_HEADER))
+
+    def test_write_purges_tagged_pages(self):
+        """Новый пост автора сбрасывает закэшированный профиль."""
+        self.guest_client.get(self.url)
+        Post.objects.create(author=self.user, text='Второй пост.')
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'MISS')
+        self.assertContains(response, 'Второй пост.')
+
+    def test_cached_page_returns_not_modified(self):
+        """Закэшированная страница отвечает 304 на совпавший ETag."""
+        etag = self.guest_client.get(self.url)['ETag']
+        response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'HIT')
+
+    def test_cache_is_inside_debug_toolbar(self):
+        """Панель отладки добавляется после кэша и не кэшируется."""
+        middleware = settings.MIDDLEWARE
+        self.assertLess(
+            middleware.index(
+                'debug_toolbar.middleware.DebugToolbarMiddleware'),
+            middleware.index('core.middleware.AnonymousPageCacheMiddleware'),
+        )
+
+
+def _incr_in_process(backend: SQLiteCache, times: int) -> None:
+    """Увеличивает счетчик в отдельном процессе."""
+    for _ in range(times):
+        backend.incr('counter')
+
+
+class TestSQLiteCache(SimpleTestCase):
+    """Тесты общего кэша в файле SQLite."""
+    def setUp(self):
+        """Кэш во временном файле с маленьким бюджетом."""
+        self.directory = tempfile.mkdtemp()
+        self.backend = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': {'MAX_BYTES': 10 * 1024}},
+        )
+
+    def tearDown(self):
+        """Удаляем файл кэша."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_add_delete(self):
+        """Базовые операции кэша."""
+        self.backend.set('key', {'value': 1})
+        self.assertEqual(self.backend.get('key'), {'value': 1})
+        self.assertFalse(self.backend.add('key', 'other'))
+        self.assertTrue(self.backend.add('new', 'other'))
+        self.assertEqual(
+            self.backend.get_many(['key', 'new', 'missing']),
+            {'key': {'value': 1}, 'new': 'other'},
+        )
+        self.backend.delete('key')
+        self.assertIsNone(self.backend.get('key'))
+
+    def test_expired_key_is_missing(self):
+        """Просроченная запись не читается и может быть добавлена."""
+        self.backend.set('key', 'value', timeout=0)
+        self.assertIsNone(self.backend.get('key'))
+        self.assertTrue(self.backend.add('key', 'value'))
+
+    def test_lru_eviction_by_byte_budget(self):
+        """При превышении бюджета вытесняются давно не читавшиеся записи."""
+        value = 'x' * 1024
+        clock = iter(range(int(time()), int(time()) + 200, 2))
+        with mock.patch('core.cache.time', lambda: next(clock)):
+            self.backend.set('hot', value)
+            for number in range(20):
+                self.backend.set(f'cold-{number}', value)
+                self.backend.get('hot')
+        self.assertEqual(self.backend.get('hot'), value)
+        self.assertIsNone(self.backend.get('cold-0'))
+        self.assertLessEqual(self.backend.size(), 10 * 1024)
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет обновлений."""
+        self.backend.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=_incr_in_process, args=(self.backend, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.backend.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.backend.incr('missing')
+
+    def test_incr_without_returning(self):
+        """На SQLite без RETURNING incr работает через транзакцию."""
+        self.backend.set('counter', 1)
+        with mock.patch('sqlite3.sqlite_version_info', (3, 31, 1)):
+            self.assertEqual(self.backend.incr('counter', 2), 3)
+            with self.assertRaises(ValueError):
+                self.backend.incr('missing')
+        self.assertEqual(self.backend.get('counter'), 3)
+
+    def test_old_sqlite_is_rejected(self):
+        """Без UPSERT и оконных функций бэкенд не создается."""
+        with mock.patch('sqlite3.sqlite_version_info', (3, 22, 0)):
+            with self.assertRaises(ImproperlyConfigured):
+                SQLiteCache(
+                    os.path.join(self.directory, 'old.sqlite3'), {})
+
+    def test_benchmark_command_reports_backends(self):
+        """Команда замера выводит результаты всех бэкендов."""
+        out = StringIO()
+        call_command(
+            'benchmark_cache', processes=2, operations=100, stdout=out)
+        for name in settings.CACHE_BACKENDS:
+            self.assertIn(f'{name}: ', out.getvalue())
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'STALE_TIMEOUT': 60, 'LOCK_WAIT': 1},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-cache-test',
+    },
+})
+class TestTieredCache(SimpleTestCase):
+    """Тесты двухуровневого кэша с защитой от одновременного пересчета."""
+    def setUp(self):
+        """Очищаем оба уровня кэша."""
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+
+    def test_local_tier_serves_hot_keys(self):
+        """Горячий ключ читается из памяти процесса, счетчик - нет."""
+        self.cache.set('fragment', 'html')
+        self.cache.set('generation', 1)
+        self.assertEqual(self.cache.get('fragment'), 'html')
+        self.shared.clear()
+        self.assertEqual(self.cache.get('fragment'), 'html')
+        self.assertIsNone(self.cache.get('generation'))
+
+    def test_stale_value_is_served_during_recompute(self):
+        """После срока один пересчитывает, остальные получают старое."""
+        self.cache.set('fragment', 'old', timeout=10)
+        with mock.patch('core.cache.time', return_value=time() + 20):
+            self.assertIsNone(self.cache.get('fragment'))
+            self.assertEqual(self.cache.get('fragment'), 'old')
+            self.cache.set('fragment', 'new', timeout=10)
+        self.assertFalse(self.shared.has_key('lock:fragment'))
+        self.assertEqual(self.cache.get('fragment'), 'new')
+        counters = self.cache.stats()['fragment']
+        self.assertEqual(counters['miss'], 1)
+        self.assertEqual(counters['stale'], 1)
+        self.assertEqual(counters['recompute'], 2)
+
+    def test_early_refresh(self):
+        """Ключ с долгим пересчетом обновляется до истечения срока."""
+        self.shared.set(
+            'fragment', CacheEntry('html', time() + 5, 10.0), 60)
+        with mock.patch('core.cache.random', return_value=0.99):
+            self.assertIsNone(self.cache.get('fragment'))
+        self.assertTrue(self.shared.has_key('lock:fragment'))
+
+    def test_get_or_set_waits_for_other_process(self):
+        """get_or_set не пересчитывает ключ, который уже пересчитывают."""
+        self.shared.add('lock:fragment', 1)
+        timer = threading.Timer(
+            0.2, self.shared.set,
+            args=('fragment', CacheEntry('html', time() + 60, 0.2), 120),
+        )
+        timer.start()
+        compute = mock.Mock(return_value='recomputed')
+        self.assertEqual(self.cache.get_or_set('fragment', compute), 'html')
+        compute.assert_not_called()
+        timer.join()
+
+    def test_get_or_set_releases_lock_on_error(self):
+        """Ошибка пересчета снимает блокировку, add считается отдельно."""
+        compute = mock.Mock(side_effect=ValueError)
+        with self.assertRaises(ValueError):
+            self.cache.get_or_set('fragment', compute)
+        self.assertFalse(self.shared.has_key('lock:fragment'))
+        self.assertEqual(self.cache.get_or_set('fragment', 'html'), 'html')
+        self.assertTrue(self.cache.add('snippet', 'html'))
+        self.assertEqual(self.cache.stats()['snippet']['add'], 1)
+        self.assertEqual(self.cache.stats()['snippet']['recompute'], 0)
+
+    def test_cache_stats_command(self):
+        """Команда выводит счетчики семейств ключей."""
+        self.cache.get('post_snippet:1:abc')
+        out = StringIO()
+        call_command('cache_stats', stdout=out)
+        self.assertIn('post_snippet', out.getvalue())
+
+
+class TestStaticFiles(SimpleTestCase):
+    """Тесты сборки и отдачи статики с хешем в именах."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Собираем статику из временного каталога."""
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.source, 'css'))
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'w') as file:
+            file.write('body { margin: 0; }\n' * 100)
+        cls.settings_override = override_settings(
+            STATICFILES_DIRS=[cls.source],
+            STATIC_ROOT=cls.root,
+            INSTALLED_APPS=[
+                'django.contrib.staticfiles', 'core.apps.CoreConfig'],
+        )
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаляем временные каталоги."""
+        cls.settings_override.disable()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        """Адрес собранного файла."""
+        self.url = staticfiles_storage.url('css/site.css')
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """Имя файла содержит хеш, рядом лежит сжатая копия."""
+        self.assertRegex(self.url, r'/static/css/site\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, self.url[len('/static/'):])
+        self.assertTrue(os.path.isfile(path + '.gz'))
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        """Файл с хешем отдается сжатым и кэшируется навсегда."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(
+            len(b''.join(response.streaming_content)), 2100)
+
+    def test_plain_name_is_revalidated(self):
+        """Файл без хеша отдается без сжатия с коротким кэшем."""
+        response = self.client.get('/static/css/site.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(
+            response['Cache-Control'],
+            f'public, max-age={settings.STATIC_MAX_AGE}',
+        )
+        cached = self.client.get(
+            '/static/css/site.css',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class TestMediaServing(SimpleTestCase):
+    """Тесты отдачи медиафайлов."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Временный MEDIA_ROOT с файлами."""
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.root)
+        cls.settings_override.enable()
+        cls.content = bytes(range(256)) * 4
+        cls.hashed = 'posts/ab/cd/' + 'abcd' * 16 + '.gif'
+        for name in ('posts/plain.gif', cls.hashed):
+            os.makedirs(os.path.join(cls.root, os.path.dirname(name)),
+                        exist_ok=True)
+            with open(os.path.join(cls.root, name), 'wb') as file:
+                file.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Удаляем временный каталог."""
+        cls.settings_override.disable()
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_full_file_and_conditional_get(self):
+        """Файл отдается целиком, повторный запрос получает 304."""
+        response = self.client.get('/media/posts/plain.gif')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content)
+        cached = self.client.get(
+            '/media/posts/plain.gif', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_range_request(self):
+        """Запрос Range получает только диапазон."""
+        response = self.client.get(
+            '/media/posts/plain.gif', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[10:20])
+        suffix = self.client.get(
+            '/media/posts/plain.gif', HTTP_RANGE='bytes=-4')
+        self.assertEqual(
+            b''.join(suffix.streaming_content), self.content[-4:])
+        outside = self.client.get(
+            '/media/posts/plain.gif', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(
+            outside.status_code,
+            HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_stale_if_range_returns_full_file(self):
+        """При устаревшем If-Range файл отдается целиком."""
+        response = self.client.get(
+            '/media/posts/plain.gif', HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_content_addressed_file_is_immutable(self):
+        """Файл с именем по хешу кэшируется навсегда."""
+        response = self.client.get('/media/' + self.hashed)
+        self.assertIn('immutable', response['Cache-Control'])
+        plain = self.client.get('/media/posts/plain.gif')
+        self.assertNotIn('immutable', plain['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        """Тело файла передается nginx заголовком X-Accel-Redirect."""
+        response = self.client.get('/media/posts/plain.gif')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/plain.gif')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        """Тело файла передается серверу заголовком X-Sendfile."""
+        response = self.client.get('/media/posts/plain.gif')
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.root, 'posts', 'plain.gif'),
+        )
+
+    def test_path_outside_media_root(self):
+        """Путь за пределами MEDIA_ROOT дает 404."""
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -1,9 +1,23 @@
 """Модуль настройки представлений приложения Core."""
 
 
+import os
+import re
 from http import HTTPStatus
 
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+from .files import serve_file
+from .storage import is_content_addressed
+
+# Имена миниатюр sorl-thumbnail: хеш источника и опций в шардах.
+THUMBNAIL_NAME_RE = re.compile(
+    r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.\w+$')
 
 
 def page_not_found(request, exception):
@@ -26,3 +40,21 @@ def server_error(request):
 def permission_denied(request, exception):
     """Отображение страницы 403 FORBIDDEN."""
     return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
+
+
+@require_safe
+def serve_media(request, path):
+    """Отдача файла из MEDIA_ROOT (см. core.files.serve_file).
+
+    Файлы с именем по хешу содержимого (картинки постов и миниатюры)
+    не меняются и кэшируются браузером навсегда.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    immutable = bool(
+        is_content_addressed(path) or THUMBNAIL_NAME_RE.search(path))
+    return serve_file(request, full_path, path, immutable=immutable)
@@ -1,9 +1,32 @@
 """Модуль настройки приложения Admin Django."""
 
 
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.urls import reverse
 
 from .models import Group, Post
+from .search import filter_posts, search_available
+
+
+class IndexAutocompleteSelect(AutocompleteSelect):
+    """Виджет select2 админки с подсказками из posts.autocomplete."""
+
+    def __init__(self, kind, *args, **kwargs):
+        """kind - вид подсказок: 'groups' или 'users'."""
+        super().__init__(*args, **kwargs)
+        self.kind = kind
+
+    def get_url(self):
+        """Адрес подсказок по префиксному индексу."""
+        return reverse('posts:autocomplete', args=[self.kind])
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        """select2 запрашивает подсказки с AUTOCOMPLETE_MIN_PREFIX букв."""
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-minimum-input-length'] = settings.AUTOCOMPLETE_MIN_PREFIX
+        return attrs
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -19,6 +42,23 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    # Поля, которые вместо списка всех строк получают подсказки.
+    autocomplete_kinds = {'group': 'groups', 'author': 'users'}
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Группа и автор выбираются с подсказками, без полного списка."""
+        kind = self.autocomplete_kinds.get(db_field.name)
+        if kind is not None:
+            kwargs['widget'] = IndexAutocompleteSelect(
+                kind, db_field.remote_field, self.admin_site)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице."""
+        if not search_term.strip() or not search_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return filter_posts(queryset, search_term), False
 
 
 admin.site.register(Post, PostAdmin)
@@ -2,8 +2,28 @@
 
 
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """Восстанавливает триггеры поиска после миграций.
+
+    SQLite пересоздает таблицу при изменении ее схемы, и триггеры
+    индекса FTS5 удаляются вместе со старой таблицей.
+    """
+    from .models import Post
+    from .search import install_search_index
+    connection = connections[using]
+    if Post._meta.db_table in connection.introspection.table_names():
+        install_search_index(connection)
 
 
 class PostsConfig(AppConfig):
     """Настройка приложения Posts."""
     name = 'posts'
+
+    def ready(self):
+        """Подключаем обработчики сигналов приложения."""
+        from . import signals  # noqa: F401
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,205 @@
+"""Модуль Atom-лент приложения Posts.
+
+Ленты (всех постов, сообщества, автора) строятся фреймворком
+django.contrib.syndication из выборки values(): читаются только
+поля, которые попадают в XML, модели не создаются.
+
+Готовая лента хранится в кэше вместе с версиями суррогатных ключей
+ее данных (см. core.surrogate_keys): ключа ленты и ключей авторов
+и сообществ ее постов. Запись поста, группы или автора увеличивает
+версии ключей сигналами, и лента перестраивается при следующем
+запросе. ETag - хеш текста ленты; клиент с актуальной копией
+получает 304 без обращения к БД за постами. Last-Modified не
+отправляется: дата последнего поста не меняется при удалении поста.
+"""
+
+
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+
+from core.conditional import conditional_response, make_etag
+from core.surrogate_keys import add_surrogate_keys, get_key_versions
+
+from .models import Group, Post
+
+User = get_user_model()
+
+ATOM_CACHE_PREFIX = 'atom_feed:'
+ITEM_FIELDS = (
+    'id', 'text', 'created', 'updated', 'author', 'group',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__title',
+)
+
+
+class PostsAtomFeed(Feed):
+    """Atom-лента последних постов сайта."""
+    feed_type = Atom1Feed
+    title = 'Yatube: последние записи'
+    subtitle = 'Последние записи на сайте Yatube'
+
+    def __call__(self, request, *args, **kwargs):
+        """Лента из кэша или новая, с ETag."""
+        obj = self.get_object(request, *args, **kwargs)
+        keys = self.surrogate_keys(obj)
+        cache_key = ATOM_CACHE_PREFIX + md5(
+            request.build_absolute_uri().encode()).hexdigest()
+        entry = cache.get(cache_key)
+        if (entry is None
+                or get_key_versions(entry['versions']) != entry['versions']):
+            # Версии читаются до построения ленты: новый пост,
+            # сохраненный во время построения, сбросит и эту копию.
+            versions = get_key_versions(keys)
+            feedgen = self.get_feed(obj, request)
+            item_keys = {
+                key for item in feedgen.items
+                for key in item['surrogate_keys']
+            }
+            versions.update(get_key_versions(item_keys - versions.keys()))
+            entry = {
+                'content': feedgen.writeString('utf-8'),
+                'content_type': feedgen.content_type,
+                'versions': versions,
+            }
+            cache.set(cache_key, entry, settings.ATOM_FEED_CACHE_TIMEOUT)
+        response = conditional_response(
+            request,
+            lambda: HttpResponse(
+                entry['content'], content_type=entry['content_type']),
+            make_etag([entry['content']]),
+        )
+        response['Cache-Control'] = (
+            f'public, max-age={settings.ATOM_FEED_MAX_AGE}')
+        return add_surrogate_keys(response, entry['versions'])
+
+    def surrogate_keys(self, obj):
+        """Суррогатные ключи данных ленты."""
+        return ['posts']
+
+    def get_posts(self, obj):
+        """Посты ленты."""
+        return Post.objects.all()
+
+    def items(self, obj):
+        """Последние посты: только поля, которые выводит лента."""
+        return self.get_posts(obj).order_by('-created', '-pk').values(
+            *ITEM_FIELDS)[:settings.ATOM_FEED_SIZE]
+
+    def link(self, obj):
+        """Страница сайта, соответствующая ленте."""
+        return reverse('posts:index')
+
+    def item_title(self, item):
+        """Заголовок записи - начало текста поста."""
+        return Truncator(item['text']).words(
+            settings.ATOM_FEED_TITLE_WORDS)
+
+    def item_description(self, item):
+        """Текст поста в HTML."""
+        return linebreaks(item['text'])
+
+    def item_link(self, item):
+        """Адрес поста."""
+        return reverse('posts:post_detail', args=[item['id']])
+
+    def item_pubdate(self, item):
+        """Дата публикации."""
+        return item['created']
+
+    def item_updateddate(self, item):
+        """Дата изменения."""
+        return item['updated'] or item['created']
+
+    def item_author_name(self, item):
+        """Имя автора или имя пользователя."""
+        full_name = (
+            f'{item["author__first_name"]} {item["author__last_name"]}'
+        ).strip()
+        return full_name or item['author__username']
+
+    def item_author_link(self, item):
+        """Профиль автора."""
+        return reverse('posts:profile', args=[item['author__username']])
+
+    def item_extra_kwargs(self, item):
+        """Суррогатные ключи записи (в XML не выводятся)."""
+        keys = [f'author-{item["author"]}']
+        if item['group']:
+            keys.append(f'group-{item["group"]}')
+        return {'surrogate_keys': keys}
+
+    def item_categories(self, item):
+        """Сообщество поста."""
+        return [item['group__title']] if item['group__title'] else []
+
+
+class GroupAtomFeed(PostsAtomFeed):
+    """Atom-лента постов сообщества."""
+
+    def get_object(self, request, slug):
+        """Сообщество по слагу."""
+        return get_object_or_404(
+            Group.objects.only('pk', 'slug', 'title', 'description'),
+            slug=slug,
+        )
+
+    def surrogate_keys(self, obj):
+        """Ключ сообщества: его меняют посты и правка сообщества."""
+        return [f'group-{obj.pk}']
+
+    def get_posts(self, obj):
+        """Посты сообщества."""
+        return obj.posts.all()
+
+    def title(self, obj):
+        """Название ленты."""
+        return f'Yatube: {obj.title}'
+
+    def subtitle(self, obj):
+        """Описание сообщества."""
+        return obj.description
+
+    def link(self, obj):
+        """Страница сообщества."""
+        return reverse('posts:group_posts', args=[obj.slug])
+
+
+class ProfileAtomFeed(PostsAtomFeed):
+    """Atom-лента постов автора."""
+
+    def get_object(self, request, username):
+        """Автор по имени пользователя."""
+        return get_object_or_404(
+            User.objects.only('pk', 'username', 'first_name', 'last_name'),
+            username=username,
+        )
+
+    def surrogate_keys(self, obj):
+        """Ключ автора: его меняют посты и правка пользователя."""
+        return [f'author-{obj.pk}']
+
+    def get_posts(self, obj):
+        """Посты автора."""
+        return obj.posts.all()
+
+    def title(self, obj):
+        """Название ленты."""
+        return f'Yatube: записи {obj.get_full_name() or obj.username}'
+
+    def subtitle(self, obj):
+        """Описание ленты."""
+        return f'Записи пользователя {obj.username} на сайте Yatube'
+
+    def link(self, obj):
+        """Профиль автора."""
+        return reverse('posts:profile', args=[obj.username])
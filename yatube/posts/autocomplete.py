@@ -0,0 +1,183 @@
+"""Модуль автодополнения групп и имен пользователей.
+
+Для каждого вида (группы, пользователи) процесс держит в памяти
+префиксный индекс: отсортированный список ключей, по которому
+двоичным поиском (bisect) находится начало диапазона ключей
+с заданным префиксом. Ключи - название группы и каждое его слово,
+слаг; имя пользователя, имя и фамилия - в нижнем регистре и с ё,
+замененной на е. Ответ на запрос не обращается к БД.
+
+Индекс строится одним потоковым запросом при первом обращении
+и перестраивается, когда сигналы увеличивают номер поколения вида
+в общем кэше (см. posts.caching), поэтому все процессы сайта видят
+изменения без перезапуска. Новые пользователи (регистрации) увеличивают
+отдельный номер отложенных изменений: процесс учитывает их не чаще,
+чем раз в AUTOCOMPLETE_REBUILD_DELAY секунд, и поток регистраций
+не перестраивает индекс на каждом запросе.
+"""
+
+
+import threading
+from bisect import bisect_left
+from time import monotonic, time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .caching import bump_generation, get_generation
+from .models import Group
+
+User = get_user_model()
+
+# Ключи индекса, id объекта и значение, которое отдается в ответе.
+Entry = Tuple[List[str], int, dict]
+
+
+def normalize(text: str) -> str:
+    """Текст для сравнения префиксов."""
+    return text.casefold().replace('ё', 'е').strip()
+
+
+class PrefixIndex:
+    """Отсортированные ключи с поиском по префиксу."""
+
+    def __init__(self, entries: Iterable[Entry]) -> None:
+        """Индекс по записям (ключи, id, значение)."""
+        pairs = []
+        self.items: Dict[int, dict] = {}
+        for keys, pk, item in entries:
+            self.items[pk] = item
+            normalized = {normalize(key) for key in keys}
+            pairs.extend((key, pk) for key in normalized if key)
+        pairs.sort()
+        self.keys = [key for key, pk in pairs]
+        self.ids = [pk for key, pk in pairs]
+
+    def search(self, prefix: str, limit: int) -> List[dict]:
+        """Не больше limit объектов, у которых есть ключ с префиксом."""
+        prefix = normalize(prefix)
+        found = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while (len(found) < limit and position < len(self.keys)
+               and self.keys[position].startswith(prefix)):
+            pk = self.ids[position]
+            if pk not in seen:
+                seen.add(pk)
+                found.append(self.items[pk])
+            position += 1
+        return found
+
+
+def _group_entries() -> Iterator[Entry]:
+    """Записи индекса групп."""
+    groups = Group.objects.order_by().values_list('pk', 'title', 'slug')
+    for pk, title, slug in groups.iterator():
+        yield (
+            [title, slug, *title.split()],
+            pk,
+            {'id': pk, 'slug': slug, 'text': title},
+        )
+
+
+def _user_entries() -> Iterator[Entry]:
+    """Записи индекса пользователей."""
+    users = User.objects.filter(is_active=True).order_by().values_list(
+        'pk', 'username', 'first_name', 'last_name')
+    for pk, username, first_name, last_name in users.iterator():
+        full_name = f'{first_name} {last_name}'.strip()
+        yield (
+            [username, first_name, last_name],
+            pk,
+            {
+                'id': pk,
+                'username': username,
+                'text': f'{username} ({full_name})' if full_name
+                else username,
+            },
+        )
+
+
+SOURCES: Dict[str, Callable[[], Iterator[Entry]]] = {
+    'groups': _group_entries,
+    'users': _user_entries,
+}
+
+# Вид -> (поколение, поколение отложенных изменений, время
+# построения, индекс).
+_indexes: Dict[str, Tuple[int, int, float, PrefixIndex]] = {}
+_lock = threading.Lock()
+
+
+def generation_key(kind: str) -> str:
+    """Ключ номера поколения индекса вида kind."""
+    return f'autocomplete_generation:{kind}'
+
+
+def pending_key(kind: str) -> str:
+    """Ключ номера поколения отложенных изменений индекса вида kind."""
+    return f'autocomplete_pending:{kind}'
+
+
+def invalidate(kind: str, delayed: bool = False) -> None:
+    """Индекс вида kind устаревает во всех процессах.
+
+    С delayed=True процессы перестраивают индекс не сразу, а не чаще,
+    чем раз в AUTOCOMPLETE_REBUILD_DELAY секунд.
+    """
+    bump_generation(pending_key(kind) if delayed else generation_key(kind))
+
+
+def _is_fresh(cached, generation: int, pending: int) -> bool:
+    """Можно ли отвечать по построенному индексу."""
+    return cached is not None and cached[0] == generation and (
+        cached[1] == pending
+        or monotonic() - cached[2] < settings.AUTOCOMPLETE_REBUILD_DELAY
+    )
+
+
+def get_index(kind: str) -> PrefixIndex:
+    """Актуальный индекс вида kind, при необходимости перестроенный."""
+    generation = get_generation(generation_key(kind))
+    pending = get_generation(pending_key(kind))
+    cached = _indexes.get(kind)
+    if _is_fresh(cached, generation, pending):
+        return cached[3]
+    with _lock:
+        cached = _indexes.get(kind)
+        if not _is_fresh(cached, generation, pending):
+            cached = (generation, pending, monotonic(),
+                      PrefixIndex(SOURCES[kind]()))
+            _indexes[kind] = cached
+    return cached[3]
+
+
+def autocomplete_client(request) -> str:
+    """Клиент для лимита запросов: пользователь или IP гостя."""
+    if request.user.is_authenticated:
+        return f'user-{request.user.pk}'
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def rate_limited(client: str) -> bool:
+    """Превысил ли клиент AUTOCOMPLETE_RATE_LIMIT запросов в минуту."""
+    key = f'autocomplete_rate:{client}:{int(time() // 60)}'
+    if cache.add(key, 1, 60):
+        return False
+    try:
+        return cache.incr(key) > settings.AUTOCOMPLETE_RATE_LIMIT
+    except ValueError:
+        return False
+
+
+def autocomplete(kind: str, prefix: str) -> List[dict]:
+    """Подсказки вида kind для начала ввода prefix.
+
+    Для префиксов короче AUTOCOMPLETE_MIN_PREFIX подсказок нет:
+    список пользователей нельзя перебрать короткими запросами.
+    """
+    if len(normalize(prefix)) < settings.AUTOCOMPLETE_MIN_PREFIX:
+        return []
+    return get_index(kind).search(prefix, settings.AUTOCOMPLETE_LIMIT)
@@ -0,0 +1,107 @@
+"""Модуль версионирования кэша страниц приложения Posts.
+
+Фрагменты страниц кэшируются надолго, а ключ фрагмента включает
+номер поколения. При записи постов номер поколения увеличивается
+сигналами, и старые фрагменты перестают читаться сразу же.
+Здесь же из тех же данных строятся валидаторы условных запросов.
+"""
+
+
+from hashlib import md5
+from time import time
+from typing import List
+
+from django.core.cache import cache
+
+from core.conditional import make_etag, request_etag_parts
+
+INDEX_PAGE_GENERATION_KEY = 'index_page_generation'
+
+
+def get_generation(key: str) -> int:
+    """Текущий номер поколения кэша.
+
+    Если счетчик вытеснен из кэша, он начинается с текущего времени
+    в миллисекундах, чтобы не совпасть с уже использованными номерами.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key: str) -> None:
+    """Увеличивает номер поколения: закэшированные фрагменты устаревают."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time() * 1000), None)
+
+
+def post_snippet_cache_key(post, **flags) -> str:
+    """Ключ кэша отрисованного сниппета поста.
+
+    Ключ строится из данных, которые выводит сниппет: id и даты
+    изменения поста, имени файла картинки и ее вариантов, автора,
+    слага группы, количества комментариев и флагов шаблона. Правка поста или
+    переименование группы дают новый ключ, старый фрагмент просто
+    вытесняется из кэша.
+    """
+    parts = [
+        post.pk,
+        post.updated.timestamp() if post.updated else '',
+        post.image.name,
+        post.image_variants,
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group else '',
+        getattr(post, 'comment_count', ''),
+    ]
+    parts.extend(f'{name}={value}' for name, value in sorted(flags.items()))
+    digest = md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'post_snippet:{post.pk}:{digest}'
+
+
+def post_surrogate_keys(post) -> List[str]:
+    """Суррогатные ключи данных, которые выводятся вместе с постом."""
+    keys = [f'post-{post.pk}', f'author-{post.author_id}']
+    if post.group_id:
+        keys.append(f'group-{post.group_id}')
+    return keys
+
+
+def page_surrogate_keys(posts) -> List[str]:
+    """Суррогатные ключи всех постов страницы."""
+    return [key for post in posts for key in post_surrogate_keys(post)]
+
+
+def page_validators(request, page_obj, *extra) -> str:
+    """ETag страницы ленты постов.
+
+    ETag строится из ключей сниппетов постов страницы (они меняются
+    при правке поста, автора, группы и при новых комментариях),
+    курсоров соседних страниц, пользователя и дополнительных
+    значений страницы (extra). Удаление поста меняет состав
+    страницы, а удаление комментария - comment_count.
+    """
+    paginator = page_obj.paginator
+    parts: List = request_etag_parts(request)
+    parts.extend(post_snippet_cache_key(post) for post in page_obj)
+    parts.extend((paginator.next_cursor, paginator.previous_cursor))
+    parts.extend(extra)
+    return make_etag(parts)
+
+
+def post_validators(request, post, *extra) -> str:
+    """ETag страницы поста с комментариями."""
+    parts: List = request_etag_parts(request)
+    parts.extend((
+        post_snippet_cache_key(post),
+        post.group.title if post.group else '',
+        post.last_comment,
+    ))
+    parts.extend(extra)
+    return make_etag(parts)
@@ -0,0 +1,204 @@
+"""Модуль потоковой выгрузки постов и комментариев.
+
+Строки читаются из БД values().iterator(chunk_size=EXPORT_CHUNK_SIZE)
+и сразу кодируются: ни выборка, ни файл целиком не собираются
+в памяти, сколько бы записей ни было у автора. Поля строк совпадают
+с форматом импорта (см. posts.importer): автор - username,
+сообщество - slug, пост комментария - id, поэтому выгрузку можно
+загрузить командой import_content.
+
+Архив zip (посты, комментарии и файлы картинок) тоже пишется
+потоком: zipfile умеет писать в файл без seek, размеры и контрольные
+суммы записей идут после данных.
+"""
+
+
+import csv
+import json
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from core.storage import content_storage
+
+from .models import Comment, Post
+
+FORMATS = ('jsonl', 'csv', 'zip')
+KINDS = ('posts', 'comments')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'zip': 'application/zip',
+}
+
+# Поля строк выгрузки и выражения для values().
+POST_FIELDS = {
+    'id': F('id'),
+    'author': F('author__username'),
+    'group': F('group__slug'),
+    'text': F('text'),
+    'image': F('image'),
+    'created': F('created'),
+    'updated': F('updated'),
+}
+COMMENT_FIELDS = {
+    'id': F('id'),
+    'post': F('post_id'),
+    'author': F('author__username'),
+    'text': F('text'),
+    'created': F('created'),
+}
+
+
+def export_rows(posts: QuerySet, comments: QuerySet,
+                kind: str) -> Tuple[List[str], Iterator[Dict]]:
+    """Заголовок и строки выгрузки постов или комментариев."""
+    queryset, fields = (
+        (posts, POST_FIELDS) if kind == 'posts' else
+        (comments, COMMENT_FIELDS)
+    )
+    # Имена выражений не должны совпадать с полями модели.
+    rows = queryset.order_by('pk').values(**{
+        f'export_{name}': expression for name, expression in fields.items()
+    }).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    return list(fields), (
+        {name: row[f'export_{name}'] for name in fields} for row in rows
+    )
+
+
+def iter_jsonl(rows: Iterable[Dict]) -> Iterator[str]:
+    """Строки JSONL."""
+    for row in rows:
+        yield json.dumps(
+            row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает записанную строку."""
+
+    def write(self, value: str) -> str:
+        """Записанная строка."""
+        return value
+
+
+def iter_csv(header: List[str], rows: Iterable[Dict]) -> Iterator[str]:
+    """Строки CSV с заголовком; даты - в ISO 8601."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([
+            '' if value is None else
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row.values()
+        ])
+
+
+def encode(lines: Iterable[str]) -> Iterator[bytes]:
+    """Строки в UTF-8 блоками около EXPORT_BLOCK_SIZE байт."""
+    buffer: List[bytes] = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= settings.EXPORT_BLOCK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class _ZipStream:
+    """Файл без seek для zipfile: накапливает записанные байты."""
+
+    def __init__(self):
+        self.buffer: List[bytes] = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        """Добавляет байты в буфер."""
+        self.buffer.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """Количество записанных байт."""
+        return self.position
+
+    def flush(self) -> None:
+        """Данные уже в буфере."""
+
+    def pop(self) -> bytes:
+        """Байты, записанные после предыдущего вызова."""
+        data = b''.join(self.buffer)
+        self.buffer = []
+        return data
+
+
+def iter_zip(posts: QuerySet, comments: QuerySet) -> Iterator[bytes]:
+    """Архив zip с posts.jsonl, comments.jsonl и картинками постов."""
+    stream = _ZipStream()
+    date_time = timezone.localtime().timetuple()[:6]
+
+    def entries() -> Iterator[Tuple[str, int, Iterable[bytes]]]:
+        """Имя, способ сжатия и содержимое файлов архива."""
+        for kind in KINDS:
+            header, rows = export_rows(posts, comments, kind)
+            yield f'{kind}.jsonl', zipfile.ZIP_DEFLATED, encode(
+                iter_jsonl(rows))
+        images = posts.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        for name in images.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+            if content_storage.exists(name):
+                # Картинки уже сжаты, повторное сжатие не нужно.
+                yield name, zipfile.ZIP_STORED, _read_file(name)
+
+    with zipfile.ZipFile(stream, 'w') as archive:
+        for name, compress_type, chunks in entries():
+            info = zipfile.ZipInfo(name, date_time)
+            info.compress_type = compress_type
+            with archive.open(info, 'w', force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = stream.pop()
+                    if data:
+                        yield data
+    yield stream.pop()
+
+
+def _read_file(name: str) -> Iterator[bytes]:
+    """Содержимое файла хранилища частями."""
+    with content_storage.open(name) as file:
+        yield from file.chunks()
+
+
+def iter_export(posts: QuerySet, comments: QuerySet, kind: str,
+                file_format: str) -> Iterator[bytes]:
+    """Выгрузка в выбранном формате частями по несколько КБ."""
+    if file_format == 'zip':
+        return iter_zip(posts, comments)
+    header, rows = export_rows(posts, comments, kind)
+    if file_format == 'csv':
+        return encode(iter_csv(header, rows))
+    return encode(iter_jsonl(rows))
+
+
+def user_querysets(user) -> Tuple[QuerySet, QuerySet]:
+    """Посты и комментарии пользователя."""
+    return user.posts.all(), user.comments.all()
+
+
+def all_querysets() -> Tuple[QuerySet, QuerySet]:
+    """Посты и комментарии всех пользователей."""
+    return Post.objects.all(), Comment.objects.all()
+
+
+def export_filename(name: str, kind: str, file_format: str) -> str:
+    """Имя файла выгрузки."""
+    if file_format == 'zip':
+        return f'yatube-{name}.zip'
+    return f'yatube-{name}-{kind}.{file_format}'
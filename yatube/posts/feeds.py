@@ -0,0 +1,230 @@
+"""Модуль материализованной ленты подписок приложения Posts.
+
+Посты раскладываются по лентам подписчиков при публикации
+(fan-out on write), поэтому чтение ленты - один диапазон индекса
+по таблице FeedItem. Посты авторов с очень большим числом
+подписчиков не раскладываются, а подмешиваются при чтении (pull).
+Когда автор перестает быть pull-автором, его посты подмешиваются
+до тех пор, пока команда rebuild_feeds --pull-authors (ее запускают
+по расписанию) не допишет их в ленты подписчиков.
+"""
+
+
+from itertools import islice
+from typing import Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db.models import Count
+
+from .models import FeedItem, FeedPullAuthor, Follow, Post
+from .paginators import Cursor, CursorPaginator
+
+PULL_AUTHORS_CACHE_KEY = 'feed_pull_authors'
+
+
+def get_pull_authors() -> Set[int]:
+    """Id авторов, посты которых подмешиваются в ленты при чтении.
+
+    Это авторы, у которых подписчиков больше FEED_FANOUT_MAX_FOLLOWERS,
+    и выбывшие pull-авторы, чьи посты еще не дописаны в ленты
+    (см. backfill_former_pull_authors). Множество кэшируется
+    на FEED_PULL_AUTHORS_CACHE_TIMEOUT секунд.
+    """
+    return cache.get_or_set(
+        PULL_AUTHORS_CACHE_KEY,
+        _count_pull_authors,
+        settings.FEED_PULL_AUTHORS_CACHE_TIMEOUT,
+    )
+
+
+def _popular_authors() -> Set[int]:
+    """Id авторов, у которых подписчиков больше порога раскладки."""
+    return set(
+        Follow.objects.values('author')
+        .annotate(followers=Count('pk'))
+        .filter(followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        .values_list('author', flat=True)
+    )
+
+
+def _count_pull_authors() -> Set[int]:
+    """Пересчитывает множество pull-авторов.
+
+    Новые pull-авторы записываются в FeedPullAuthor. Строка выбывшего
+    автора остается в таблице, а автор - в множестве, пока ленты его
+    подписчиков не дополнены: запрос страницы ленты ничего
+    не дописывает.
+    """
+    authors = _popular_authors()
+    stored = set(FeedPullAuthor.objects.values_list('author_id', flat=True))
+    FeedPullAuthor.objects.bulk_create(
+        [FeedPullAuthor(author_id=author_id)
+         for author_id in authors - stored],
+        ignore_conflicts=True,
+    )
+    return authors | stored
+
+
+def backfill_former_pull_authors() -> int:
+    """Дописывает посты выбывших pull-авторов в ленты подписчиков.
+
+    Пока автор был pull-автором, его посты не раскладывались
+    по лентам. Строка FeedPullAuthor удаляется после того, как ленты
+    всех подписчиков дополнены; вызывающий код выполняет функцию
+    в транзакции. Возвращает количество выбывших авторов.
+    """
+    former = set(
+        FeedPullAuthor.objects.values_list('author_id', flat=True)
+    ) - _popular_authors()
+    for author_id in sorted(former):
+        followers = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        for user_id in followers.iterator(
+                chunk_size=settings.FEED_BATCH_SIZE):
+            _fill_feed(user_id, author_id)
+        FeedPullAuthor.objects.filter(author_id=author_id).delete()
+    if former:
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+    return len(former)
+
+
+def _bulk_insert(items: Iterable[FeedItem]) -> None:
+    """Вставляет записи ленты пачками по FEED_BATCH_SIZE."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in get_pull_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedItem(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            created=post.created,
+        )
+        for user_id in followers.iterator(chunk_size=settings.FEED_BATCH_SIZE)
+    )
+
+
+def backfill_feed(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту пользователя все посты автора после подписки."""
+    if author_id not in get_pull_authors():
+        _fill_feed(user_id, author_id)
+
+
+def _fill_feed(user_id: int, author_id: int) -> None:
+    """Записывает в ленту пользователя все посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'created')
+    _bulk_insert(
+        FeedItem(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            created=created,
+        )
+        for post_id, created in posts.iterator(
+            chunk_size=settings.FEED_BATCH_SIZE)
+    )
+
+
+def prune_feed(user_id: int, author_id: int) -> None:
+    """Удаляет из ленты пользователя посты автора после отписки."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорный паджинатор ленты подписок.
+
+    Окно выбирается из FeedItem по покрывающему индексу
+    (user, created, post), затем посты окна читаются по первичному
+    ключу выборкой for_listing(). Если пользователь подписан
+    на pull-авторов, их посты выбираются тем же курсором и сливаются
+    с лентой по ключу (created, id). Ключ записи ленты совпадает
+    с ключом поста, поэтому курсоры общие для обоих источников.
+    """
+    key_fields = ('created', 'post_id')
+
+    def __init__(self, user, per_page: int):
+        """Готовим выборки ленты и постов pull-авторов."""
+        super().__init__(
+            FeedItem.objects.filter(user=user).values_list(
+                'post_id', flat=True),
+            per_page,
+        )
+        self.pulled_posts = None
+        pull_authors = get_pull_authors()
+        if pull_authors:
+            authors: List[int] = list(
+                Follow.objects.filter(
+                    user=user, author__in=pull_authors
+                ).values_list('author', flat=True)
+            )
+            if authors:
+                self.pulled_posts = CursorPaginator.order(
+                    Post.objects.for_listing().filter(author__in=authors)
+                )
+
+    def fetch(self, cursor: Optional[Cursor], newer: bool,
+              offset: int, limit: int) -> List[Post]:
+        """Посты окна ленты с подмешанными постами pull-авторов."""
+        if self.pulled_posts is None:
+            post_ids = super().fetch(cursor, newer, offset, limit)
+            posts = Post.objects.for_listing().in_bulk(post_ids)
+            return [posts[pk] for pk in post_ids if pk in posts]
+        inbox = self.seek(self.object_list, cursor, newer)
+        pulled = CursorPaginator.seek(self.pulled_posts, cursor, newer)
+        posts = Post.objects.for_listing().in_bulk(
+            list(inbox[:offset + limit]))
+        posts.update((post.pk, post) for post in pulled[:offset + limit])
+        rows = sorted(
+            posts.values(),
+            key=lambda post: (post.created, post.pk),
+            reverse=not newer,
+        )
+        return rows[offset:offset + limit]
+
+
+def get_feed_page(request, user) -> Page:
+    """Страница ленты подписок по параметрам запроса."""
+    paginator = FeedPaginator(user, settings.NUMBER_OF_POSTS_TO_VIEW)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        number=request.GET.get('page'),
+    )
+
+
+def rebuild_feeds(user_ids: Optional[Iterable[int]] = None) -> int:
+    """Пересобирает ленты пользователей (всех, если user_ids не задан).
+
+    Возвращает количество обработанных подписок.
+    """
+    follows = Follow.objects.order_by('pk')
+    feed_items = FeedItem.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user__in=user_ids)
+        feed_items = feed_items.filter(user__in=user_ids)
+    backfill_former_pull_authors()
+    cache.delete(PULL_AUTHORS_CACHE_KEY)
+    feed_items.delete()
+    processed = 0
+    for user_id, author_id in follows.values_list(
+        'user_id', 'author_id'
+    ).iterator(chunk_size=settings.FEED_BATCH_SIZE):
+        backfill_feed(user_id, author_id)
+        processed += 1
+    return processed
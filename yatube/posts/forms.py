@@ -1,9 +1,16 @@
 """Модуль форм приложения Posts."""
 
 
+from django import forms
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
+from .uploads import process_image_upload
+from .widgets import AutocompleteSelect
+
+User = get_user_model()
 
 
 class PostForm(ModelForm):
@@ -12,6 +19,17 @@ class PostForm(ModelForm):
         """Класс настройки формы поста."""
         model = Post
         fields = ('text', 'group', 'image')
+        widgets = {'group': AutocompleteSelect('groups')}
+
+    def clean_image(self):
+        """Новая картинка проверяется, уменьшается и очищается.
+
+        См. posts.uploads.process_image_upload.
+        """
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            image = process_image_upload(image)
+        return image
 
 
 class CommentForm(ModelForm):
@@ -20,3 +38,24 @@ class CommentForm(ModelForm):
         """Класс настройки формы комментария."""
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    """Форма поиска постов с фильтрами по группе и автору."""
+    q = forms.CharField(label='Запрос', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        label='Группа',
+        queryset=Group.objects.order_by('title'),
+        to_field_name='slug',
+        required=False,
+        empty_label='Все группы',
+        widget=AutocompleteSelect('groups'),
+    )
+    author = forms.ModelChoiceField(
+        label='Автор',
+        queryset=User.objects.all(),
+        to_field_name='username',
+        required=False,
+        empty_label='Все авторы',
+        widget=AutocompleteSelect('users'),
+    )
@@ -0,0 +1,129 @@
+"""Модуль обработки картинок постов Pillow.
+
+Для картинки поста создаются адаптивные варианты - кадрирование
+с пропорциями сниппета нескольких ширин в современных форматах
+(WebP, AVIF, если его поддерживает Pillow), - и крошечная размытая
+заглушка (LQIP) в виде data URI. Размеры оригинала, список вариантов
+и заглушка сохраняются в модели, поэтому шаблоны выводят srcset
+и размеры картинки, не открывая файлов.
+"""
+
+
+from base64 import b64encode
+from io import BytesIO
+from posixpath import splitext
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps
+
+VARIANTS_PREFIX = 'variants/'
+# image_variants картинки, для которой Pillow не умеет сохранять
+# ни один формат: варианты не создаются, но и не ставятся в очередь.
+NO_VARIANTS = 'none'
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+def supported_formats() -> List[str]:
+    """Форматы вариантов из настроек, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_VARIANT_FORMATS
+        if image_format.upper() in Image.SAVE
+    ]
+
+
+def variant_height(width: int) -> int:
+    """Высота варианта с пропорциями сниппета POST_IMAGE_ASPECT."""
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    return round(width * aspect_height / aspect_width)
+
+
+def variant_name(image_name: str, width: int, image_format: str) -> str:
+    """Имя файла варианта картинки."""
+    return f'{VARIANTS_PREFIX}{splitext(image_name)[0]}-{width}.{image_format}'
+
+
+def variant_source_stem(name: str) -> str:
+    """Имя оригинала без расширения по имени файла варианта."""
+    return name[len(VARIANTS_PREFIX):].rsplit('-', 1)[0]
+
+
+def parse_variants(variants: str) -> Dict[str, List[int]]:
+    """Разбор image_variants: 'webp:320 webp:640' -> {формат: ширины}."""
+    parsed: Dict[str, List[int]] = {}
+    if variants == NO_VARIANTS:
+        return parsed
+    for token in variants.split():
+        image_format, width = token.split(':')
+        parsed.setdefault(image_format, []).append(int(width))
+    return parsed
+
+
+def variant_sources(image) -> List[Tuple[str, str]]:
+    """(MIME-тип, srcset) готовых вариантов картинки поста по форматам."""
+    sources = []
+    variants = parse_variants(image.instance.image_variants)
+    for image_format, widths in variants.items():
+        srcset = ', '.join(
+            '{} {}w'.format(
+                default_storage.url(
+                    variant_name(image.name, width, image_format)),
+                width,
+            )
+            for width in widths
+        )
+        sources.append((MIME_TYPES[image_format], srcset))
+    return sources
+
+
+def _crop(image: Image.Image, width: int) -> Image.Image:
+    """Кадрирование по центру до ширины width с пропорциями сниппета."""
+    return ImageOps.fit(
+        image, (width, variant_height(width)), Image.LANCZOS)
+
+
+def _placeholder(image: Image.Image) -> str:
+    """Размытая заглушка шириной POST_IMAGE_PLACEHOLDER_WIDTH в data URI."""
+    tiny = _crop(image, settings.POST_IMAGE_PLACEHOLDER_WIDTH)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    tiny.convert('RGB').save(buffer, format='JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+def build_variants(post) -> None:
+    """Создает варианты и заглушку картинки поста.
+
+    Заполняются поля image_width, image_height, image_placeholder
+    и image_variants (NO_VARIANTS, если форматов нет), сама модель
+    не сохраняется. Ширины берутся из POST_IMAGE_VARIANT_WIDTHS,
+    но не больше ширины оригинала (минимум одна, самая узкая).
+    """
+    with post.image.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    widths = [
+        width for width in settings.POST_IMAGE_VARIANT_WIDTHS
+        if width <= image.width
+    ] or [min(settings.POST_IMAGE_VARIANT_WIDTHS)]
+    tokens = []
+    for image_format in supported_formats():
+        for width in widths:
+            buffer = BytesIO()
+            _crop(image, width).save(
+                buffer,
+                format=image_format.upper(),
+                quality=settings.POST_IMAGE_VARIANT_QUALITY,
+            )
+            name = variant_name(post.image.name, width, image_format)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+            tokens.append(f'{image_format}:{width}')
+    post.image_width, post.image_height = image.size
+    post.image_placeholder = _placeholder(image)
+    post.image_variants = ' '.join(tokens) or NO_VARIANTS
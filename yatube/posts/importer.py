@@ -0,0 +1,364 @@
+"""Модуль массового импорта пользователей, сообществ, постов,
+комментариев и подписок.
+
+Входной файл (JSONL - объект на строку, или CSV с заголовком)
+читается потоком, без загрузки в память. Строки собираются в пачки
+и вставляются bulk_create: сигналы post_save не отправляются, поэтому
+ленты, счетчики, индекс поиска и учет картинок после импорта
+пересобираются один раз (см. management-команду import_content).
+
+Пачки объединяются в транзакции. После фиксации каждой транзакции
+в файл контрольной точки записывается смещение во входном файле,
+и прерванный импорт продолжается с него. Вставка идет с
+ignore_conflicts: строки с уникальными ключами (имя пользователя,
+слаг, id поста или комментария, пара подписки), попавшие в БД до
+сбоя, при повторе пропускаются.
+
+Связи задаются естественными ключами: автор - username, сообщество -
+slug, пост комментария - id. Ключи переводятся в id одним запросом
+на пачку и кэшируются в памяти.
+"""
+
+
+import csv
+import json
+import os
+from contextlib import contextmanager
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple, Union)
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .caching import post_surrogate_keys
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+Record = Dict[str, object]
+
+FORMATS = ('jsonl', 'csv')
+# Количество ключей в одном запросе IN (ограничение SQLite - 999).
+LOOKUP_CHUNK_SIZE = 500
+
+
+class RecordError(ValueError):
+    """Строку входного файла нельзя импортировать."""
+
+
+def detect_format(path: str) -> str:
+    """Формат файла по расширению."""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(path: str, file_format: str, offset: int = 0
+                 ) -> Iterator[Tuple[Union[Record, RecordError], int]]:
+    """Записи файла, начиная с байта offset, и смещение после каждой.
+
+    Файл читается в двоичном режиме, чтобы смещение было точным
+    номером байта для seek при продолжении импорта. Вместо записи
+    из некорректной строки JSON выдается RecordError: import_batch
+    пропускает ее, как и другие ошибочные строки.
+    """
+    with open(path, 'rb') as file:
+        if file_format == 'csv':
+            header = next(csv.reader([file.readline().decode('utf-8-sig')]))
+            position = max(offset, file.tell())
+            file.seek(position)
+
+            def lines() -> Iterator[str]:
+                nonlocal position
+                for line in file:
+                    position += len(line)
+                    yield line.decode('utf-8')
+
+            for row in csv.reader(lines()):
+                if row:
+                    yield dict(zip(header, row)), position
+            return
+        file.seek(offset)
+        position = offset
+        for line in file:
+            position += len(line)
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    record = RecordError(
+                        f'некорректный JSON перед байтом {position}: {exc}')
+                yield record, position
+
+
+def text(record: Record, name: str) -> str:
+    """Строковое поле записи; пустые значения CSV - пустая строка."""
+    value = record.get(name)
+    return '' if value is None else str(value)
+
+
+def optional_int(record: Record, name: str) -> Optional[int]:
+    """Целое поле записи или None."""
+    value = text(record, name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RecordError(f'{name}: ожидается целое число, получено {value}')
+
+
+def date(record: Record, name: str, default=None):
+    """Дата записи в формате ISO 8601; без зоны - в зоне сайта."""
+    value = text(record, name)
+    if not value:
+        return default or timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise RecordError(f'{name}: некорректная дата {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class KeyResolver:
+    """Id объектов по естественному ключу.
+
+    Ключи пачки, которых еще нет в кэше, читаются одним запросом.
+    Без кэша (cache=False) найденные id хранятся только до следующей
+    пачки: так проверяются id постов, которых могут быть миллионы.
+    """
+
+    def __init__(self, queryset: models.QuerySet, field: str,
+                 convert: Callable[[str], object] = str,
+                 cache: bool = True):
+        self.queryset = queryset
+        self.field = field
+        self.convert = convert
+        self.cache = cache
+        self.ids: Dict[object, int] = {}
+
+    def _key(self, value: str):
+        """Ключ из значения поля записи или None."""
+        try:
+            return self.convert(value) if value else None
+        except ValueError:
+            return None
+
+    def resolve(self, values: Iterable[str]) -> None:
+        """Загружает id для ключей пачки."""
+        if not self.cache:
+            self.ids = {}
+        keys = {self._key(value) for value in values} - {None}
+        missing = list(keys - self.ids.keys())
+        for start in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+            self.ids.update(self.queryset.filter(**{
+                f'{self.field}__in': missing[start:start + LOOKUP_CHUNK_SIZE]
+            }).values_list(self.field, 'pk'))
+
+    def get(self, record: Record, name: str) -> int:
+        """Id объекта, на который ссылается поле записи."""
+        value = text(record, name)
+        try:
+            return self.ids[self._key(value)]
+        except KeyError:
+            raise RecordError(f'{name}: не найден объект {value!r}')
+
+
+def _password(record: Record) -> str:
+    """Хеш пароля; без пароля - непригодный для входа."""
+    value = text(record, 'password')
+    if not value:
+        return make_password(None)
+    try:
+        identify_hasher(value)
+    except ValueError:
+        # Хешировать пароли при импорте слишком долго (PBKDF2).
+        raise RecordError('password: ожидается хеш пароля')
+    return value
+
+
+class Kind:
+    """Тип импортируемых объектов: модель, связи и сборка строки.
+
+    lookups - поля записи со ссылками на другие объекты и их кэши
+    ключей, keys - суррогатные ключи страниц, которые меняет объект.
+    """
+
+    def __init__(self, model, build: Callable[[Record], object],
+                 lookups: Optional[Dict[str, KeyResolver]] = None,
+                 keys: Callable[[object], List[str]] = lambda obj: [],
+                 date_fields: Tuple[str, ...] = ()):
+        self.model = model
+        self.build = build
+        self.lookups = lookups or {}
+        self.keys = keys
+        self.date_fields = date_fields
+
+
+def get_kinds() -> Dict[str, Kind]:
+    """Поддерживаемые типы объектов с новыми кэшами ключей."""
+    users = KeyResolver(User.objects, 'username')
+    groups = KeyResolver(Group.objects, 'slug')
+    posts = KeyResolver(Post.objects, 'pk', convert=int, cache=False)
+    return {
+        'users': Kind(
+            User,
+            lambda record: User(
+                username=text(record, 'username'),
+                email=text(record, 'email'),
+                first_name=text(record, 'first_name'),
+                last_name=text(record, 'last_name'),
+                password=_password(record),
+                date_joined=date(record, 'date_joined'),
+            ),
+        ),
+        'groups': Kind(
+            Group,
+            lambda record: Group(
+                title=text(record, 'title'),
+                slug=text(record, 'slug'),
+                description=text(record, 'description'),
+            ),
+        ),
+        'posts': Kind(
+            Post,
+            lambda record: _build_post(record, users, groups),
+            {'author': users, 'group': groups},
+            lambda post: post_surrogate_keys(post)[1:],
+            ('created', 'updated'),
+        ),
+        'comments': Kind(
+            Comment,
+            lambda record: Comment(
+                id=optional_int(record, 'id'),
+                post_id=posts.get(record, 'post'),
+                author_id=users.get(record, 'author'),
+                text=text(record, 'text'),
+                created=date(record, 'created'),
+            ),
+            {'author': users, 'post': posts},
+            lambda comment: [f'post-{comment.post_id}'],
+            ('created',),
+        ),
+        'follows': Kind(
+            Follow,
+            lambda record: _build_follow(record, users),
+            {'user': users, 'author': users},
+            lambda follow: [
+                f'author-{follow.user_id}', f'author-{follow.author_id}'],
+        ),
+    }
+
+
+def _build_post(record: Record, users: KeyResolver,
+                groups: KeyResolver) -> Post:
+    """Пост из записи."""
+    created = date(record, 'created')
+    return Post(
+        id=optional_int(record, 'id'),
+        author_id=users.get(record, 'author'),
+        group_id=groups.get(record, 'group') if text(
+            record, 'group') else None,
+        text=text(record, 'text'),
+        image=text(record, 'image'),
+        created=created,
+        updated=date(record, 'updated', created),
+    )
+
+
+def _build_follow(record: Record, users: KeyResolver) -> Follow:
+    """Подписка из записи."""
+    user_id = users.get(record, 'user')
+    author_id = users.get(record, 'author')
+    if user_id == author_id:
+        raise RecordError('подписка на самого себя')
+    return Follow(user_id=user_id, author_id=author_id)
+
+
+@contextmanager
+def explicit_dates(model, names: Iterable[str]):
+    """Отключает auto_now и auto_now_add: даты берутся из файла."""
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def load_checkpoint(path: str) -> Dict[str, int]:
+    """Состояние прерванного импорта или пустое."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(path: str, state: Dict[str, int]) -> None:
+    """Атомарно записывает состояние импорта."""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
+
+
+def import_batch(kind: Kind, records: List[Record],
+                 batch_size: int) -> Tuple[int, List[str], List[str]]:
+    """Вставляет пачку записей.
+
+    Возвращает количество строк, переданных в INSERT, суррогатные
+    ключи затронутых страниц и ошибки пропущенных записей.
+    """
+    invalid = [record for record in records
+               if isinstance(record, RecordError)]
+    records = [record for record in records
+               if not isinstance(record, RecordError)]
+    for name, resolver in kind.lookups.items():
+        resolver.resolve(text(record, name) for record in records)
+    objects, keys, errors = [], [], [str(error) for error in invalid]
+    for record in records:
+        try:
+            obj = kind.build(record)
+        except RecordError as exc:
+            errors.append(f'{exc}: {record}')
+            continue
+        objects.append(obj)
+        keys.extend(kind.keys(obj))
+    kind.model.objects.bulk_create(
+        objects, batch_size=batch_size, ignore_conflicts=True)
+    return len(objects), keys, errors
+
+
+def import_records(kind: Kind, records: Iterator[Tuple[Record, int]],
+                   batch_size: int, transaction_size: int
+                   ) -> Iterator[Tuple[int, int, List[str], List[str]]]:
+    """Импорт записей транзакциями по transaction_size строк.
+
+    После фиксации каждой транзакции выдает смещение в файле после
+    последней записи, количество строк, ключи страниц и ошибки.
+    """
+    with explicit_dates(kind.model, kind.date_fields):
+        while True:
+            chunk: List[Record] = []
+            position = None
+            for record, position in records:
+                chunk.append(record)
+                if len(chunk) >= transaction_size:
+                    break
+            if not chunk:
+                return
+            rows, keys, errors = 0, [], []
+            with transaction.atomic():
+                for start in range(0, len(chunk), batch_size):
+                    count, batch_keys, batch_errors = import_batch(
+                        kind, chunk[start:start + batch_size], batch_size)
+                    rows += count
+                    keys.extend(batch_keys)
+                    errors.extend(batch_errors)
+            yield position, rows, keys, errors
@@ -0,0 +1,108 @@
+"""Команда удаления медиафайлов, на которые нет ссылок."""
+
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.defaultfilters import filesizeformat
+
+from posts.media_gc import (KINDS, MAX_BATCH_SIZE, RateLimiter,
+                            collect_shard, iter_shards,
+                            prune_thumbnail_references)
+
+
+def _collect_shard(*args, **kwargs) -> Counter:
+    """Обход шарда в рабочем потоке со своим соединением с БД."""
+    try:
+        return collect_shard(*args, **kwargs)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    """Удаляет оригиналы, варианты и миниатюры картинок без ссылок."""
+    help = ('Находит и удаляет картинки постов, их варианты и миниатюры, '
+            'на которые не ссылается ни один пост.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--kind',
+            action='append',
+            dest='kinds',
+            choices=KINDS,
+            help='Вид файлов (по умолчанию все, можно указать '
+                 'несколько раз).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество файлов в пачке проверки ссылок '
+                 f'(не больше {MAX_BATCH_SIZE}).',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Не больше стольких удалений в секунду (0 - без '
+                 'ограничения).',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=3600,
+            help='Не удалять файлы моложе стольких секунд.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество потоков обхода каталогов-шардов.',
+        )
+
+    def handle(self, *args, **options):
+        """Сборка мусора."""
+        if not 0 < options['batch_size'] <= MAX_BATCH_SIZE:
+            raise CommandError(
+                f'Размер пачки должен быть от 1 до {MAX_BATCH_SIZE}.')
+        started = monotonic()
+        kinds = options['kinds'] or KINDS
+        dry_run = options['dry_run']
+        pruned = 0
+        if 'thumbnails' in kinds:
+            pruned = prune_thumbnail_references(
+                options['batch_size'], dry_run)
+        collect = partial(
+            _collect_shard if options['workers'] > 1 else collect_shard,
+            limiter=RateLimiter(options['rate']),
+            batch_size=options['batch_size'],
+            min_age=options['min_age'],
+            dry_run=dry_run,
+        )
+        shards = iter_shards(kinds)
+        stats = Counter()
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                for shard_stats in executor.map(collect, shards):
+                    stats.update(shard_stats)
+        else:
+            for shard in shards:
+                stats.update(collect(shard))
+        deleted = stats['orphaned'] if dry_run else stats['deleted']
+        verb = 'будет удалено' if dry_run else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {stats["scanned"]}, {verb}: {deleted} '
+            f'({filesizeformat(stats["bytes"])}), пропущено новых: '
+            f'{stats["recent"]}, источников миниатюр без постов: {pruned}, '
+            f'{monotonic() - started:.1f} с.'
+        ))
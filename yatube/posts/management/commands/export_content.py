@@ -0,0 +1,73 @@
+"""Команда потоковой выгрузки постов и комментариев."""
+
+
+from time import monotonic
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (FORMATS, KINDS, all_querysets, iter_export,
+                          user_querysets)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Выгружает посты и комментарии пользователя или всего сайта."""
+    help = ('Выгружает посты или комментарии в JSONL или CSV (или все '
+            'вместе с картинками в zip) потоком, не загружая выборку '
+            'в память. Формат строк совпадает с форматом import_content.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--username',
+            help='Пользователь (по умолчанию - все пользователи).',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=KINDS,
+            default='posts',
+            help='Тип данных (для zip не используется).',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='jsonl',
+            help='Формат выгрузки.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл выгрузки (по умолчанию - стандартный вывод; '
+                 'для zip обязателен).',
+        )
+
+    def handle(self, *args, **options):
+        """Выгрузка."""
+        file_format, output = options['format'], options['output']
+        if file_format == 'zip' and not output:
+            raise CommandError('Для формата zip нужен --output.')
+        if options['username']:
+            user = User.objects.filter(username=options['username']).first()
+            if user is None:
+                raise CommandError(
+                    f'Пользователь {options["username"]} не найден.')
+            querysets = user_querysets(user)
+        else:
+            querysets = all_querysets()
+        chunks = iter_export(*querysets, options['kind'], file_format)
+        if not output:
+            # Блоки JSONL и CSV состоят из целых строк.
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        started = monotonic()
+        size = 0
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгрузка записана в {output}: {size} байт, '
+            f'{monotonic() - started:.1f} с.'
+        ))
@@ -0,0 +1,174 @@
+"""Команда массового импорта контента из JSONL или CSV."""
+
+
+import os
+from itertools import islice
+from time import monotonic
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.surrogate_keys import purge_surrogate_keys
+from posts.autocomplete import invalidate as invalidate_autocomplete
+from posts.caching import INDEX_PAGE_GENERATION_KEY, bump_generation
+from posts.feeds import rebuild_feeds
+from posts.importer import (FORMATS, detect_format, get_kinds,
+                            import_records, load_checkpoint, read_records,
+                            save_checkpoint)
+from posts.media import recount_media
+from posts.search import drop_search_triggers, install_search_index
+from posts.stats import recount_stats
+
+User = get_user_model()
+
+# Сколько ошибок пропущенных строк выводится при обычной подробности.
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    """Загружает пользователей, сообщества, посты, комментарии и подписки.
+
+    Строки вставляются пачками в обход сигналов; ленты, счетчики,
+    учет картинок и кэши пересобираются в конце. Индекс поиска
+    перестраивается после загрузки постов в любом случае (и при
+    ошибке, и с --no-rebuild): до этого поиск работает по старому.
+    Если процесс был убит (SIGKILL) до восстановления триггеров
+    индекса, их восстанавливает следующий запуск команды, в том числе
+    продолжение с контрольной точки.
+    """
+    help = ('Импортирует объекты одного типа из файла JSONL или CSV '
+            'пачками bulk_create с контрольными точками и пересобирает '
+            'производные данные после загрузки. Триггеры индекса поиска, '
+            'оставшиеся удаленными после убитого импорта постов, '
+            'восстанавливаются при следующем запуске (или командой '
+            'rebuild_search_index).')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            'kind',
+            choices=list(get_kinds()),
+            help='Тип объектов: users, groups, posts, comments, follows.',
+        )
+        parser.add_argument('path', help='Путь к файлу.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла (по умолчанию - по расширению).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT.',
+        )
+        parser.add_argument(
+            '--transaction-size',
+            type=int,
+            default=50000,
+            help='Количество строк в транзакции (между контрольными '
+                 'точками).',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <path>.checkpoint).',
+        )
+        parser.add_argument(
+            '--no-rebuild',
+            action='store_true',
+            help='Не пересобирать производные данные (при загрузке '
+                 'нескольких файлов подряд - для всех, кроме последнего; '
+                 'индекс поиска перестраивается всегда).',
+        )
+
+    def handle(self, *args, **options):
+        """Импорт файла."""
+        kind_name, path = options['kind'], options['path']
+        self.verbosity = options['verbosity']
+        self.reported = 0
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        if options['batch_size'] < 1 or options['transaction_size'] < 1:
+            raise CommandError('Размеры пачки и транзакции должны быть > 0.')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        state = load_checkpoint(checkpoint)
+        if state:
+            self.stdout.write(
+                f'Продолжение импорта с байта {state["offset"]}: '
+                f'уже обработано строк {state["rows"]}.'
+            )
+        state.setdefault('offset', 0)
+        state.setdefault('rows', 0)
+        state.setdefault('skipped', 0)
+        if install_search_index(connection):
+            self.stdout.write(
+                'Индекс поиска восстановлен после прерванного импорта '
+                'постов.'
+            )
+        if kind_name == 'posts':
+            # Триггеры индекса поиска замедляют вставку; индекс
+            # остается для поиска и перестраивается после загрузки.
+            drop_search_triggers(connection)
+        records = read_records(
+            path, options['format'] or detect_format(path), state['offset'])
+        started = monotonic()
+        rows = 0
+        try:
+            for offset, count, keys, errors in import_records(
+                get_kinds()[kind_name], records,
+                options['batch_size'], options['transaction_size'],
+            ):
+                state['offset'] = offset
+                state['rows'] += count
+                state['skipped'] += len(errors)
+                save_checkpoint(checkpoint, state)
+                purge_surrogate_keys(keys)
+                self.report_errors(errors)
+                rows += count
+                elapsed = monotonic() - started
+                self.stdout.write(
+                    f'Строк {state["rows"]}, пропущено {state["skipped"]}, '
+                    f'{rows / elapsed if elapsed else 0:.0f} строк/с.'
+                )
+        finally:
+            if kind_name == 'posts':
+                install_search_index(connection)
+        elapsed = monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: строк {state["rows"]}, пропущено '
+            f'{state["skipped"]}, {elapsed:.1f} с.'
+        ))
+        if not options['no_rebuild']:
+            self.rebuild(kind_name)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    def report_errors(self, errors) -> None:
+        """Выводит ошибки пропущенных строк (все - при -v 2)."""
+        for error in errors:
+            if self.verbosity < 2 and self.reported >= MAX_REPORTED_ERRORS:
+                return
+            self.stderr.write(f'Пропущена строка: {error}')
+            self.reported += 1
+
+    def rebuild(self, kind_name: str) -> None:
+        """Пересобирает данные, которые обычно обновляют сигналы."""
+        started = monotonic()
+        if kind_name == 'posts':
+            recount_media()
+        if kind_name in ('posts', 'follows'):
+            rebuild_feeds()
+        if kind_name in ('posts', 'comments', 'follows'):
+            user_ids = User.objects.order_by('pk').values_list(
+                'pk', flat=True).iterator()
+            for chunk in iter(lambda: list(islice(user_ids, 1000)), []):
+                recount_stats(chunk)
+        if kind_name in ('users', 'groups'):
+            invalidate_autocomplete(kind_name)
+        bump_generation(INDEX_PAGE_GENERATION_KEY)
+        purge_surrogate_keys(['posts'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Производные данные пересобраны: '
+            f'{monotonic() - started:.1f} с.'
+        ))
@@ -0,0 +1,120 @@
+"""Команда переноса картинок постов в хранилище по хешу содержимого."""
+
+
+from time import monotonic
+from typing import List
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.storage import is_content_addressed
+from core.surrogate_keys import purge_surrogate_keys
+from posts.caching import (INDEX_PAGE_GENERATION_KEY, bump_generation,
+                           post_surrogate_keys)
+from posts.media import acquire_media, delete_unreferenced, recount_media
+from posts.models import MediaFile, Post
+
+
+class Command(BaseCommand):
+    """Переименовывает старые картинки постов по хешу содержимого."""
+    help = ('Переносит картинки постов из плоского каталога в шарды '
+            'по хешу содержимого, объединяя одинаковые файлы, '
+            'и пересчитывает ссылки на файлы.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество постов в пачке.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько картинок будет перенесено.',
+        )
+        parser.add_argument(
+            '--keep-originals',
+            action='store_true',
+            help='Не удалять старые файлы после переноса.',
+        )
+
+    def handle(self, *args, **options):
+        """Перенос картинок."""
+        started = monotonic()
+        storage = Post._meta.get_field('image').storage
+        posts = Post.objects.exclude(image='').order_by('pk')
+        moved = missing = last_pk = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)
+                .only('pk', 'author', 'group', 'image')
+                [:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            legacy = []
+            for post in batch:
+                old_name = post.image.name
+                if is_content_addressed(old_name):
+                    continue
+                if not storage.exists(old_name):
+                    missing += 1
+                    continue
+                legacy.append(post)
+            moved += len(legacy)
+            if legacy and not options['dry_run']:
+                self.move_batch(storage, legacy, options['keep_originals'])
+        if options['dry_run']:
+            self.stdout.write(
+                f'Будет перенесено картинок: {moved}, '
+                f'не найдено файлов: {missing}.'
+            )
+            return
+        counted = recount_media()
+        removed = delete_unreferenced(list(
+            MediaFile.objects.filter(references=0)
+            .values_list('name', flat=True)
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, не найдено файлов: {missing}, '
+            f'учтено файлов: {counted}, удалено без ссылок: {removed}, '
+            f'{monotonic() - started:.1f} с.'
+        ))
+
+    def move_batch(self, storage, posts: List[Post],
+                   keep_originals: bool) -> None:
+        """Переносит картинки пачки постов и удаляет старые файлы.
+
+        Посты обновляются запросом UPDATE без сигналов, чтобы не менять
+        дату правки: ссылки на новые файлы учитываются, а кэши страниц
+        со старым адресом картинки сбрасываются явно.
+        """
+        old_names = set()
+        keys = []
+        with transaction.atomic():
+            for post in posts:
+                old_name = post.image.name
+                with storage.open(old_name, 'rb') as file:
+                    new_name = storage.save(old_name, file)
+                updated = Post.objects.filter(
+                    pk=post.pk, image=old_name,
+                ).update(
+                    image=new_name, image_width=None, image_height=None,
+                    image_placeholder='', image_variants='',
+                )
+                if updated:
+                    acquire_media(new_name)
+                    keys.extend(post_surrogate_keys(post))
+                    old_names.add(old_name)
+        purge_surrogate_keys(keys)
+        bump_generation(INDEX_PAGE_GENERATION_KEY)
+        if keep_originals:
+            return
+        still_used = set(
+            Post.objects.filter(image__in=old_names)
+            .values_list('image', flat=True)
+        )
+        for name in old_names - still_used:
+            storage.delete(name)
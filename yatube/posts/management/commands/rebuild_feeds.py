@@ -0,0 +1,63 @@
+"""Команда пересборки материализованных лент подписок."""
+
+
+from time import monotonic
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.feeds import backfill_former_pull_authors, rebuild_feeds
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Пересобирает ленты подписок из таблицы Follow пачками."""
+    help = ('Пересобирает материализованные ленты подписок (FeedItem). '
+            'С --pull-authors только дописывает в ленты посты авторов, '
+            'переставших быть pull-авторами (запускайте по расписанию).')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Пересобрать ленту только этого пользователя '
+                 '(можно указать несколько раз).',
+        )
+        parser.add_argument(
+            '--pull-authors',
+            action='store_true',
+            help='Только дописать посты выбывших pull-авторов '
+                 'в ленты их подписчиков.',
+        )
+
+    def handle(self, *args, **options):
+        """Пересборка лент."""
+        if options['pull_authors']:
+            started = monotonic()
+            with transaction.atomic():
+                authors = backfill_former_pull_authors()
+            self.stdout.write(self.style.SUCCESS(
+                f'Ленты дополнены: выбывших pull-авторов {authors}, '
+                f'{monotonic() - started:.1f} с.'
+            ))
+            return
+        user_ids = None
+        if options['usernames']:
+            user_ids = list(
+                User.objects.filter(
+                    username__in=options['usernames']
+                ).values_list('pk', flat=True)
+            )
+            if len(user_ids) != len(set(options['usernames'])):
+                raise CommandError('Пользователь не найден.')
+        started = monotonic()
+        with transaction.atomic():
+            processed = rebuild_feeds(user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны: подписок {processed}, '
+            f'{monotonic() - started:.1f} с.'
+        ))
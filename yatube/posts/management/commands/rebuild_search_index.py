@@ -0,0 +1,30 @@
+"""Команда перестроения индекса полнотекстового поиска постов."""
+
+
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.models import Post
+from posts.search import (install_search_index, rebuild_search_index,
+                          search_available)
+
+
+class Command(BaseCommand):
+    """Пересоздает триггеры и перестраивает индекс FTS5 постов."""
+    help = ('Создает недостающие таблицу и триггеры полнотекстового '
+            'поиска и перестраивает индекс по текстам постов.')
+
+    def handle(self, *args, **options):
+        """Перестроение индекса."""
+        if not search_available(connection):
+            raise CommandError(
+                'Полнотекстовый индекс поддерживается только для SQLite.')
+        started = monotonic()
+        if not install_search_index(connection):
+            rebuild_search_index(connection)
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс поиска перестроен: постов {Post.objects.count()}, '
+            f'{monotonic() - started:.1f} с.'
+        ))
@@ -0,0 +1,92 @@
+"""Команда пересчета счетчиков пользователей."""
+
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
+from typing import Iterator, List
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.stats import recount_stats
+
+User = get_user_model()
+
+
+def _recount_chunk(user_ids: List[int]) -> int:
+    """Пересчет пачки в рабочем потоке со своим соединением с БД."""
+    try:
+        return recount_stats(user_ids)
+    finally:
+        connection.close()
+
+
+def _user_id_chunks(batch_size: int) -> Iterator[List[int]]:
+    """Id пользователей пачками по ключу, каждая пачка - отдельный запрос.
+
+    Открытый курсор iterator() держал бы блокировку чтения SQLite,
+    и потоки пересчета не смогли бы зафиксировать свои транзакции.
+    """
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_id).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+class Command(BaseCommand):
+    """Пересчитывает AuthorStats всех пользователей пачками."""
+    help = ('Пересчитывает денормализованные счетчики пользователей '
+            '(AuthorStats) пачками, при необходимости в несколько потоков.')
+
+    def add_arguments(self, parser):
+        """Аргументы команды."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество пользователей в пачке.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество потоков пересчета.',
+        )
+
+    def handle(self, *args, **options):
+        """Пересчет счетчиков."""
+        batch_size = options['batch_size']
+        chunks = _user_id_chunks(batch_size)
+        started = monotonic()
+        if options['workers'] > 1:
+            processed = self.recount_parallel(chunks, options['workers'])
+        else:
+            processed = sum(map(recount_stats, chunks))
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики пересчитаны: пользователей {processed}, '
+            f'{monotonic() - started:.1f} с.'
+        ))
+
+    def recount_parallel(self, chunks, workers: int) -> int:
+        """Пересчет в потоках; в работе не больше двух пачек на поток.
+
+        executor.map сразу забрал бы все пачки, то есть все id
+        пользователей, поэтому пачки отправляются по мере завершения.
+        """
+        processed = 0
+        with ThreadPoolExecutor(workers) as executor:
+            pending = set()
+            for chunk in chunks:
+                pending.add(executor.submit(_recount_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    processed += sum(future.result() for future in done)
+            processed += sum(future.result() for future in pending)
+        return processed
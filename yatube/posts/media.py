@@ -0,0 +1,100 @@
+"""Модуль учета ссылок на файлы картинок постов.
+
+Картинки хранятся по хешу содержимого (core.storage), поэтому один
+файл может принадлежать нескольким постам. Счетчик ссылок MediaFile
+меняется F-выражениями при сохранении и удалении постов (см. сигналы),
+а файл без ссылок удаляется после фиксации транзакции вместе со
+строкой счетчика, заблокированной до удаления файла. Пока строки нет
+или ссылок ноль, хранилище не переиспользует файл, а пишет его заново
+(см. is_referenced), поэтому новый пост не останется без файла. Ссылки
+учитываются только для имен по хешу: файлы, загруженные раньше,
+остаются как есть до переноса командой migrate_media_storage.
+"""
+
+
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from core.storage import is_content_addressed
+
+from .models import MediaFile, Post
+
+
+def is_referenced(name: str) -> bool:
+    """Есть ли учтенные ссылки на файл (см. MEDIA_REFERENCE_CHECK)."""
+    return MediaFile.objects.filter(name=name, references__gt=0).exists()
+
+
+def acquire_media(name: str) -> None:
+    """Увеличивает счетчик ссылок на файл."""
+    if not is_content_addressed(name):
+        return
+    acquired = MediaFile.objects.filter(name=name).update(
+        references=F('references') + 1)
+    if acquired:
+        return
+    # Строки нет (или ее только что удалил delete_unreferenced).
+    _, created = MediaFile.objects.get_or_create(
+        name=name, defaults={'references': 1})
+    if not created:
+        MediaFile.objects.filter(name=name).update(
+            references=F('references') + 1)
+
+
+def release_media(name: str) -> None:
+    """Уменьшает счетчик ссылок; файл без ссылок удаляется."""
+    if not is_content_addressed(name):
+        return
+    released = MediaFile.objects.filter(
+        name=name, references__gt=0
+    ).update(references=F('references') - 1)
+    if released:
+        transaction.on_commit(lambda: delete_unreferenced([name]))
+
+
+def delete_unreferenced(names: Iterable[str]) -> int:
+    """Удаляет файлы и строки MediaFile без ссылок.
+
+    Строка удаляется условным DELETE ... WHERE references = 0 (у модели
+    нет связей и сигналов, поэтому запрос один) в той же транзакции,
+    что и файл: строка заблокирована до конца удаления, и acquire_media
+    другого поста создает ее заново уже после удаления файла.
+    Возвращает количество удаленных файлов.
+    """
+    storage = Post._meta.get_field('image').storage
+    deleted = 0
+    for name in names:
+        with transaction.atomic():
+            removed, _ = MediaFile.objects.filter(
+                name=name, references=0).delete()
+            if removed:
+                storage.delete(name)
+                deleted += 1
+    return deleted
+
+
+def recount_media() -> int:
+    """Пересчитывает счетчики ссылок по таблице постов.
+
+    Возвращает количество учтенных файлов.
+    """
+    counts = {
+        name: count for name, count in (
+            Post.objects.exclude(image='')
+            .order_by()
+            .values('image')
+            .annotate(count=Count('pk'))
+            .values_list('image', 'count')
+        )
+        if is_content_addressed(name)
+    }
+    with transaction.atomic():
+        MediaFile.objects.exclude(
+            name__in=Post.objects.values('image')
+        ).update(references=0)
+        for name, count in counts.items():
+            MediaFile.objects.update_or_create(
+                name=name, defaults={'references': count})
+    return len(counts)
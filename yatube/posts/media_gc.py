@@ -0,0 +1,260 @@
+"""Модуль сборки мусора в каталоге медиафайлов постов.
+
+Оригиналы картинок (posts/), адаптивные варианты (variants/posts/)
+и миниатюры sorl-thumbnail (cache/) сверяются со ссылками в БД
+пачками: каталоги обходятся потоково (os.scandir), а ссылки
+проверяются одним запросом на пачку имен, поэтому ни список файлов,
+ни таблицы не загружаются в память целиком. Каталоги-шарды верхнего
+уровня обрабатываются независимо и могут обходиться параллельно.
+
+Файлы моложе min_age не удаляются: картинка пишется на диск
+до фиксации транзакции, в которой сохраняется пост.
+"""
+
+
+import os
+import threading
+from collections import Counter
+from functools import reduce
+from itertools import islice
+from operator import or_
+from posixpath import splitext
+from time import monotonic, sleep, time
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .images import VARIANTS_PREFIX, variant_source_stem
+from .models import MediaFile, Post
+
+KINDS = ('originals', 'variants', 'thumbnails')
+# Наибольшая пачка имен: столько параметров занимает запрос
+# проверки ссылок (SQLite ограничивает их число).
+MAX_BATCH_SIZE: int = 500
+
+# Каталог шарда и признак рекурсивного обхода: файлы, лежащие прямо
+# в корне (старые картинки без шардов), составляют отдельный шард.
+Shard = Tuple[str, str, bool]
+
+
+class RateLimiter:
+    """Ограничитель частоты удалений, общий для всех потоков."""
+
+    def __init__(self, rate: float) -> None:
+        """rate - удалений в секунду, 0 - без ограничения."""
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Ждет очереди на следующее удаление."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            sleep(delay)
+
+
+def upload_root() -> str:
+    """Каталог оригиналов картинок постов (upload_to)."""
+    return Post._meta.get_field('image').upload_to.strip('/')
+
+
+def kind_storage(kind: str):
+    """Хранилище файлов данного вида."""
+    if kind == 'originals':
+        return Post._meta.get_field('image').storage
+    if kind == 'thumbnails':
+        return default.storage
+    return default_storage
+
+
+def kind_root(kind: str) -> str:
+    """Корневой каталог файлов данного вида."""
+    if kind == 'originals':
+        return upload_root()
+    if kind == 'variants':
+        return VARIANTS_PREFIX + upload_root()
+    return sorl_settings.THUMBNAIL_PREFIX.strip('/')
+
+
+def iter_shards(kinds: Iterable[str]) -> Iterator[Shard]:
+    """Шарды (вид, каталог, рекурсивно) верхнего уровня."""
+    for kind in kinds:
+        root = kind_root(kind)
+        path = kind_storage(kind).path(root)
+        if not os.path.isdir(path):
+            continue
+        yield kind, root, False
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield kind, f'{root}/{entry.name}', True
+
+
+def _scan(path: str, recursive: bool) -> Iterator[os.DirEntry]:
+    """Потоковый обход файлов каталога."""
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def _referenced_originals(names: List[str]) -> Set[str]:
+    """Оригиналы, на которые ссылаются посты или счетчики ссылок."""
+    referenced = set(
+        Post.objects.filter(image__in=names)
+        .values_list('image', flat=True)
+    )
+    referenced.update(
+        MediaFile.objects.filter(name__in=names, references__gt=0)
+        .values_list('name', flat=True)
+    )
+    return referenced
+
+
+def _referenced_variants(names: List[str]) -> Set[str]:
+    """Варианты картинок, оригиналы которых принадлежат постам."""
+    stems = {name: variant_source_stem(name) for name in names}
+    query = reduce(or_, (
+        Q(image__startswith=stem + '.') for stem in set(stems.values())
+    ))
+    live = {
+        splitext(image)[0]
+        for image in Post.objects.filter(query).values_list(
+            'image', flat=True)
+    }
+    return {name for name, stem in stems.items() if stem in live}
+
+
+def _referenced_thumbnails(names: List[str]) -> Set[str]:
+    """Миниатюры, известные KV-хранилищу sorl-thumbnail."""
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): name
+        for name in names
+    }
+    return {
+        keys[key] for key in KVStoreModel.objects.filter(
+            key__in=keys).values_list('key', flat=True)
+    }
+
+
+REFERENCE_CHECKS: Dict[str, Callable[[List[str]], Set[str]]] = {
+    'originals': _referenced_originals,
+    'variants': _referenced_variants,
+    'thumbnails': _referenced_thumbnails,
+}
+
+
+def collect_shard(shard: Shard, limiter: RateLimiter, batch_size: int,
+                  min_age: float, dry_run: bool) -> Counter:
+    """Удаляет файлы шарда, на которые нет ссылок.
+
+    Возвращает счетчики scanned, recent, orphaned, deleted и bytes.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    kind, directory, recursive = shard
+    storage = kind_storage(kind)
+    location = storage.path('')
+    entries = _scan(storage.path(directory), recursive)
+    batches = iter(lambda: list(islice(entries, batch_size)), [])
+    cutoff = time() - min_age
+    stats = Counter()
+    for batch in batches:
+        files = {
+            os.path.relpath(entry.path, location).replace(os.sep, '/'):
+            entry for entry in batch
+        }
+        stats['scanned'] += len(files)
+        referenced = REFERENCE_CHECKS[kind](list(files))
+        deleted = []
+        for name, entry in files.items():
+            if name in referenced:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                stats['recent'] += 1
+                continue
+            stats['orphaned'] += 1
+            stats['bytes'] += stat.st_size
+            if dry_run:
+                continue
+            limiter.wait()
+            storage.delete(name)
+            deleted.append(name)
+        stats['deleted'] += len(deleted)
+        if kind == 'originals' and deleted:
+            MediaFile.objects.filter(
+                name__in=deleted, references=0).delete()
+    return stats
+
+
+def prune_thumbnail_references(batch_size: int, dry_run: bool) -> int:
+    """Удаляет из KV-хранилища миниатюры картинок без постов.
+
+    sorl-thumbnail хранит для картинки-источника список ключей ее
+    миниатюр. Если источник больше не принадлежит ни одному посту,
+    ссылки на источник и его миниатюры удаляются, после чего файлы
+    миниатюр становятся мусором для collect_shard. Строки читаются
+    пачками по ключу. Возвращает количество источников.
+    """
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    prefix = add_prefix('', 'thumbnails')
+    root = upload_root() + '/'
+    rows = KVStoreModel.objects.filter(
+        key__startswith=prefix).order_by('key')
+    last_key = ''
+    pruned = 0
+    while True:
+        batch = list(
+            rows.filter(key__gt=last_key)
+            .values_list('key', 'value')[:batch_size]
+        )
+        if not batch:
+            return pruned
+        last_key = batch[-1][0]
+        thumbnails = {
+            del_prefix(key): deserialize(value) for key, value in batch
+        }
+        sources = {
+            del_prefix(key): deserialize_image_file(value)
+            for key, value in KVStoreModel.objects.filter(
+                key__in=[add_prefix(key) for key in thumbnails]
+            ).values_list('key', 'value')
+        }
+        referenced = set(
+            Post.objects.filter(
+                image__in={source.name for source in sources.values()}
+            ).values_list('image', flat=True)
+        )
+        stale = [
+            key for key in thumbnails
+            if key not in sources or (
+                sources[key].name.startswith(root)
+                and sources[key].name not in referenced
+            )
+        ]
+        pruned += len(stale)
+        if dry_run or not stale:
+            continue
+        raw_keys = []
+        for key in stale:
+            raw_keys += [add_prefix(key, 'thumbnails'), add_prefix(key)]
+            raw_keys += [add_prefix(thumbnail) for thumbnail in
+                         thumbnails[key] or []]
+        default.kvstore._delete_raw(*raw_keys)
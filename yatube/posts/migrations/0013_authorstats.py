@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_author_stats(apps, schema_editor):
+    """Заполняет счетчики для существующих пользователей."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+
+    def count_by(model, field):
+        return dict(
+            model.objects.order_by().values(field)
+            .annotate(count=Count('pk')).values_list(field, 'count')
+        )
+
+    posts = count_by(Post, 'author')
+    followers = count_by(Follow, 'author')
+    following = count_by(Follow, 'user')
+    comments = count_by(Comment, 'author')
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(
+                user_id=user_id,
+                post_count=posts.get(user_id, 0),
+                follower_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+                comment_count=comments.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Пользователь', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+                ('post_count', models.PositiveIntegerField(default=0, help_text='Количество постов пользователя', verbose_name='постов')),
+                ('follower_count', models.PositiveIntegerField(default=0, help_text='Количество подписчиков пользователя', verbose_name='подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, help_text='Количество подписок пользователя', verbose_name='подписок')),
+                ('comment_count', models.PositiveIntegerField(default=0, help_text='Количество комментариев пользователя', verbose_name='комментариев')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_pull_authors(apps, schema_editor):
+    """Запоминает авторов, посты которых не раскладываются по лентам."""
+    Follow = apps.get_model('posts', 'Follow')
+    FeedPullAuthor = apps.get_model('posts', 'FeedPullAuthor')
+    FeedPullAuthor.objects.bulk_create(
+        FeedPullAuthor(author_id=author_id)
+        for author_id in Follow.objects.values('author')
+        .annotate(followers=Count('pk'))
+        .filter(followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        .values_list('author', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedPullAuthor',
+            fields=[
+                ('author', models.OneToOneField(help_text='Автор с большим числом подписчиков', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='автор')),
+            ],
+            options={
+                'verbose_name': 'Pull-автор ленты',
+                'verbose_name_plural': 'Pull-авторы ленты',
+            },
+        ),
+        migrations.RunPython(fill_pull_authors, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,10 @@
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.storage import content_storage
 
 User = get_user_model()
 
@@ -48,6 +52,46 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов."""
+
+    def for_listing(self) -> 'PostQuerySet':
+        """Выборка для лент постов.
+
+        Автор и группа подгружаются тем же запросом, читаются только
+        поля, которые выводит сниппет поста, и добавляются счетчики
+        комментариев (см. with_activity).
+        """
+        return self.select_related('author', 'group').only(
+            'id', 'created', 'updated', 'text', 'image',
+            'image_width', 'image_height', 'image_placeholder',
+            'image_variants',
+            'author', 'author__username',
+            'author__first_name', 'author__last_name',
+            'group', 'group__slug', 'group__title',
+        ).with_activity()
+
+    def with_activity(self) -> 'PostQuerySet':
+        """Выборка с количеством и датой последнего комментария.
+
+        Количество (comment_count) и дата последнего комментария
+        (last_comment) - коррелированные подзапросы по индексу
+        (post, created), без группировки всей выборки постов.
+        """
+        comments = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post')
+        return self.annotate(
+            comment_count=Coalesce(Subquery(
+                comments.annotate(count=Count('pk')).values('count')
+            ), 0),
+            last_comment=Subquery(
+                comments.annotate(last=Max('created')).values('last'),
+                output_field=models.DateTimeField(),
+            ),
+        )
+
+
 class Post(DateTimedModel):
     """Запись."""
     text = models.TextField(
@@ -73,14 +117,67 @@ class Post(DateTimedModel):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=content_storage,
         help_text='Картинка к посту',
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='ширина картинки',
+        help_text='Ширина оригинала картинки в пикселях'
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='высота картинки',
+        help_text='Высота оригинала картинки в пикселях'
+    )
+    image_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='заглушка картинки',
+        help_text='Размытая уменьшенная копия картинки (data URI)'
+    )
+    image_variants = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='варианты картинки',
+        help_text='Готовые варианты картинки: формат:ширина через пробел'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='дата изменения',
+        help_text='Дата последнего изменения поста'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta(DateTimedModel.Meta):
-        """Мета опции модели Post."""
+        """Мета опции модели Post.
+
+        Индексы покрывают ключ курсора (created, id) для общей ленты,
+        ленты автора и ленты сообщества.
+        """
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['created', 'id'],
+                name='post_created_id_idx',
+            ),
+            models.Index(
+                fields=['author', 'created'],
+                name='post_author_created_idx',
+            ),
+            models.Index(
+                fields=['group', 'created'],
+                name='post_group_created_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         """Выводим текст поста."""
@@ -112,6 +209,12 @@ class Comment(DateTimedModel):
         """Мета опции модели comment."""
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         """Выводим текст комментария."""
@@ -139,6 +242,12 @@ class Follow(models.Model):
         """Мета опции модели follow."""
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -150,3 +259,163 @@ class Follow(models.Model):
                 name='users_cannot_follow_themselves',
             )
         ]
+
+
+class AuthorStats(models.Model):
+    """Счетчики пользователя: посты, подписчики, подписки, комментарии.
+
+    Денормализованные значения обновляются F-выражениями при записи
+    (см. posts.stats), поэтому страницы профиля и поста не выполняют
+    агрегирующих запросов.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='пользователь',
+        help_text='Пользователь'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='постов',
+        help_text='Количество постов пользователя'
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='подписчиков',
+        help_text='Количество подписчиков пользователя'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='подписок',
+        help_text='Количество подписок пользователя'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='комментариев',
+        help_text='Количество комментариев пользователя'
+    )
+
+    class Meta:
+        """Мета опции модели AuthorStats."""
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self) -> str:
+        """Выводим пользователя и количество постов."""
+        return f'{self.user_id}: {self.post_count}'
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок пользователя (материализованная лента).
+
+    Заполняется при публикации поста (fan-out on write), дополняется
+    при подписке и очищается при отписке. Поле created копирует
+    дату публикации поста, чтобы лента читалась одним диапазоном
+    индекса (user, created, post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='читатель',
+        help_text='Владелец ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='пост',
+        help_text='Пост в ленте'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+        help_text='Автор поста'
+    )
+    created = models.DateTimeField(
+        verbose_name='дата публикации',
+        help_text='Дата публикации поста'
+    )
+
+    class Meta:
+        """Мета опции модели FeedItem."""
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_user_post',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'created', 'post'],
+                name='feed_user_created_post_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Выводим читателя и пост."""
+        return f'{self.user_id}: {self.post_id}'
+
+
+class FeedPullAuthor(models.Model):
+    """Автор, посты которого подмешиваются в ленты при чтении (pull).
+
+    Хранит множество pull-авторов, известное на момент последнего
+    пересчета (см. posts.feeds.get_pull_authors): автору, который
+    выбыл из множества, ленты подписчиков дополняются его постами.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='автор',
+        help_text='Автор с большим числом подписчиков'
+    )
+
+    class Meta:
+        """Мета опции модели FeedPullAuthor."""
+        verbose_name = 'Pull-автор ленты'
+        verbose_name_plural = 'Pull-авторы ленты'
+
+    def __str__(self) -> str:
+        """Выводим id автора."""
+        return str(self.author_id)
+
+
+class MediaFile(models.Model):
+    """Счетчик ссылок постов на файл картинки.
+
+    Файлы картинок именуются по хешу содержимого, и одинаковые
+    загрузки разных постов ссылаются на один файл (см. posts.media).
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='файл',
+        help_text='Имя файла в хранилище'
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='ссылок',
+        help_text='Количество постов, использующих файл'
+    )
+
+    class Meta:
+        """Мета опции модели MediaFile."""
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self) -> str:
+        """Выводим имя файла и количество ссылок."""
+        return f'{self.name}: {self.references}'
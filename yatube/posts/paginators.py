@@ -0,0 +1,179 @@
+"""Модуль курсорного (keyset) паджинатора приложения Posts.
+
+Страница ленты выбирается диапазонным запросом по паре (created, id)
+без COUNT(*) и без OFFSET по всей таблице, поэтому стоимость страницы
+не зависит от ее глубины. Курсоры передаются в параметрах ?after=
+и ?before= в виде непрозрачных токенов.
+"""
+
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(obj) -> str:
+    """Непрозрачный токен курсора для записи: (created, id)."""
+    raw = f'{obj.created.isoformat()}|{obj.pk}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """Разбирает токен курсора. Для некорректного токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created, pk = raw.split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (created, id) в порядке убывания.
+
+    Экземпляр описывает одно окно ленты: после выборки страницы
+    в нем сохраняются курсоры соседних страниц (next_cursor,
+    previous_cursor), а num_pages подставляется так, чтобы
+    Page.has_next() и Page.has_previous() работали без COUNT(*).
+    Номерные страницы ?page=N поддерживаются для старых ссылок,
+    но номер ограничен PAGINATOR_MAX_PAGE_NUMBER, так что OFFSET
+    никогда не превышает нескольких страниц.
+    """
+    key_fields = ('created', 'pk')
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 max_page_number: Optional[int] = None):
+        """Упорядочиваем выборку по ключу курсора."""
+        super().__init__(self.order(object_list), per_page)
+        if max_page_number is None:
+            max_page_number = settings.PAGINATOR_MAX_PAGE_NUMBER
+        self.max_page_number = max_page_number
+        self.next_cursor: Optional[str] = None
+        self.previous_cursor: Optional[str] = None
+
+    @classmethod
+    def order(cls, queryset: QuerySet,
+              key_fields: Optional[Tuple[str, str]] = None) -> QuerySet:
+        """Выборка в порядке убывания ключа курсора."""
+        created_field, pk_field = key_fields or cls.key_fields
+        return queryset.order_by(f'-{created_field}', f'-{pk_field}')
+
+    @classmethod
+    def seek(cls, queryset: QuerySet, cursor: Optional[Cursor],
+             newer: bool = False,
+             key_fields: Optional[Tuple[str, str]] = None) -> QuerySet:
+        """Диапазон упорядоченной выборки от курсора.
+
+        newer=False - записи старше курсора в порядке убывания ключа,
+        newer=True - записи новее курсора в порядке возрастания ключа.
+        """
+        created_field, pk_field = key_fields or cls.key_fields
+        lookup = 'gt' if newer else 'lt'
+        if cursor is not None:
+            created, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{created_field}__{lookup}': created})
+                | Q(**{created_field: created, f'{pk_field}__{lookup}': pk})
+            )
+        return queryset.reverse() if newer else queryset
+
+    def get_cursor_page(self, after: Optional[str] = None,
+                        before: Optional[str] = None,
+                        number=None) -> Page:
+        """Страница после/до курсора или по номеру (с ограничением)."""
+        after_cursor = decode_cursor(after)
+        if after_cursor is not None:
+            return self._page_after(after_cursor)
+        before_cursor = decode_cursor(before)
+        if before_cursor is not None:
+            return self._page_before(before_cursor)
+        return self._page_by_number(number)
+
+    def fetch(self, cursor: Optional[Cursor], newer: bool,
+              offset: int, limit: int) -> List:
+        """Записи окна: limit штук после offset от курсора."""
+        queryset = self.seek(self.object_list, cursor, newer)
+        return list(queryset[offset:offset + limit])
+
+    def _page_after(self, cursor: Cursor) -> Page:
+        """Записи старше курсора.
+
+        Курсор за концом ленты (например, последние посты удалены)
+        ведет на первую страницу, а не на пустую страницу без
+        курсора назад.
+        """
+        rows = self.fetch(cursor, False, 0, self.per_page + 1)
+        if not rows:
+            return self._page_by_number(1)
+        return self._window(
+            rows[:self.per_page], None,
+            has_next=len(rows) > self.per_page,
+            has_previous=True,
+        )
+
+    def _page_before(self, cursor: Cursor) -> Page:
+        """Записи новее курсора (выбираются в обратном порядке)."""
+        rows = self.fetch(cursor, True, 0, self.per_page + 1)
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты - отдаем полную первую страницу.
+            return self._page_by_number(1)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._window(rows, None, has_next=True, has_previous=True)
+
+    def _page_by_number(self, number) -> Page:
+        """Номерная страница, номер ограничен сверху max_page_number."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        number = min(max(number, 1), self.max_page_number)
+        bottom = (number - 1) * self.per_page
+        rows = self.fetch(None, False, bottom, self.per_page + 1)
+        return self._window(
+            rows[:self.per_page], number,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def _window(self, rows: List, number: Optional[int],
+                has_next: bool, has_previous: bool) -> Page:
+        """Страница окна ленты и курсоры соседних страниц.
+
+        Для курсорных страниц абсолютный номер неизвестен, поэтому
+        номер условный: 1 - начало ленты, 2 - любая следующая.
+        """
+        # Ссылка назад строится по курсору первой записи окна.
+        has_previous = has_previous and bool(rows)
+        if number is None:
+            number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        self.next_cursor = encode_cursor(rows[-1]) if has_next else None
+        self.previous_cursor = (
+            encode_cursor(rows[0]) if has_previous else None
+        )
+        return Page(rows, number, self)
+
+
+def get_cursor_page(request, object_list: QuerySet) -> Page:
+    """Страница ленты по параметрам запроса ?after=, ?before=, ?page=."""
+    paginator = CursorPaginator(object_list, settings.NUMBER_OF_POSTS_TO_VIEW)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        number=request.GET.get('page'),
+    )
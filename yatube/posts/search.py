@@ -0,0 +1,245 @@
+"""Модуль полнотекстового поиска постов (SQLite FTS5).
+
+Индекс posts_post_fts - внешняя FTS5-таблица над posts_post.text:
+текст хранится только в таблице постов, а индекс обновляют триггеры
+на вставку, изменение и удаление, поэтому он не расходится с данными
+и при queryset.update() или bulk_create(). Токенизатор unicode61
+приводит кириллицу к нижнему регистру, ё заменяется на е. Русские
+окончания слов запроса отбрасываются, и слова ищутся как префиксы:
+запрос «котами» находит «кот», «коты» и «котик». Результаты
+упорядочены по релевантности (bm25).
+
+На других СУБД индекса нет, и поиск выполняется через icontains.
+"""
+
+
+import re
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+TERM_RE = re.compile(r'\w+')
+MIN_STEM_LENGTH = 3
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ией', 'ий', 'ый', 'ой', 'ей', 'ая', 'яя', 'ое', 'ее', 'ую', 'юю',
+    'ых', 'их', 'ах', 'ях', 'ом', 'ем', 'ам', 'ям', 'ов', 'ев', 'ью',
+    'а', 'я', 'о', 'е', 'и', 'ы', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+# unicode61 не считает ё буквой е с диакритикой, поэтому текст
+# приводится к е до индексации. Индексируемый текст отличается от
+# posts_post.text, и перестроение выполняется вставкой из SELECT,
+# а не командой 'rebuild'.
+FOLDED_TEXT = "replace(replace({}.text, 'ё', 'е'), 'Ё', 'Е')"
+
+INSTALL_SQL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text)
+            VALUES (new.id, {FOLDED_TEXT.format('new')});
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, {FOLDED_TEXT.format('old')});
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, {FOLDED_TEXT.format('old')});
+            INSERT INTO {FTS_TABLE}(rowid, text)
+            VALUES (new.id, {FOLDED_TEXT.format('new')});
+        END""",
+)
+TRIGGERS = (f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au')
+
+
+def search_available(using=connection) -> bool:
+    """Индекс FTS5 поддерживается СУБД соединения."""
+    return using.vendor == 'sqlite'
+
+
+def install_search_index(using=connection) -> bool:
+    """Создает индекс и триггеры, если их нет.
+
+    SQLite пересоздает таблицу posts_post при изменении ее схемы,
+    и триггеры пропадают, поэтому функция вызывается и после каждой
+    миграции. Если триггеры пришлось создавать заново, индекс
+    перестраивается. Возвращает True, если индекс перестроен.
+    """
+    if not search_available(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            TRIGGERS,
+        )
+        installed = cursor.fetchone()[0] == len(TRIGGERS)
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+    if not installed:
+        rebuild_search_index(using)
+    return not installed
+
+
+def drop_search_triggers(using=connection) -> None:
+    """Удаляет триггеры: индекс остается и отвечает на запросы.
+
+    Новые строки попадают в индекс, когда install_search_index
+    создаст триггеры заново и перестроит его.
+    """
+    if not search_available(using):
+        return
+    with using.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+
+def drop_search_index(using=connection) -> None:
+    """Удаляет индекс и триггеры."""
+    if not search_available(using):
+        return
+    drop_search_triggers(using)
+    with using.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def rebuild_search_index(using=connection) -> None:
+    """Перестраивает индекс по таблице постов."""
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, text) "
+            f"SELECT id, {FOLDED_TEXT.format('posts_post')} FROM posts_post")
+
+
+def stem(word: str) -> str:
+    """Слово без русского окончания (не короче MIN_STEM_LENGTH)."""
+    word = word.lower().replace('ё', 'е')
+    for ending in RUSSIAN_ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def build_match(query: str) -> Optional[str]:
+    """Выражение MATCH: префиксы основ слов запроса через AND.
+
+    Кавычки и операторы FTS5 из запроса не попадают в выражение:
+    берутся только буквенно-цифровые слова. Для пустого запроса
+    возвращает None.
+    """
+    terms = TERM_RE.findall(query)[:settings.SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{stem(term)}"*' for term in terms)
+
+
+def match_ids(match: str) -> RawSQL:
+    """Подзапрос id постов, найденных выражением MATCH."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,),
+    )
+
+
+def filter_posts(queryset: QuerySet, query: str) -> QuerySet:
+    """Посты выборки, содержащие слова запроса (без ранжирования)."""
+    match = build_match(query)
+    if match is None:
+        return queryset.none()
+    if search_available():
+        return queryset.filter(pk__in=match_ids(match))
+    for term in TERM_RE.findall(query)[:settings.SEARCH_MAX_TERMS]:
+        queryset = queryset.filter(text__icontains=stem(term))
+    return queryset
+
+
+class PostSearch:
+    """Поиск постов по запросу с фильтрами по группе и автору."""
+
+    def __init__(self, query: str, group_id: Optional[int] = None,
+                 author_id: Optional[int] = None) -> None:
+        """Запрос и фильтры поиска."""
+        self.query = query
+        self.match = build_match(query)
+        self.filters = {}
+        if group_id is not None:
+            self.filters['group_id'] = group_id
+        if author_id is not None:
+            self.filters['author_id'] = author_id
+
+    def ids(self, offset: int, limit: int) -> List[int]:
+        """id найденных постов в порядке релевантности."""
+        if self.match is None:
+            return []
+        if not search_available():
+            return list(
+                filter_posts(Post.objects.filter(**self.filters), self.query)
+                .order_by('-created', '-pk')
+                .values_list('pk', flat=True)[offset:offset + limit]
+            )
+        where = ''.join(
+            f' AND p.{column} = %s' for column in self.filters)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT p.id FROM {FTS_TABLE} f '
+                f'JOIN posts_post p ON p.id = f.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s{where} '
+                f'ORDER BY f.rank, p.created DESC LIMIT %s OFFSET %s',
+                [self.match, *self.filters.values(), limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def fetch(self, offset: int, limit: int) -> List[Post]:
+        """Посты для ленты в порядке релевантности."""
+        ids = self.ids(offset, limit)
+        posts: Dict[int, Post] = Post.objects.for_listing().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class SearchPaginator(CursorPaginator):
+    """Номерные страницы результатов поиска без COUNT(*).
+
+    Результаты упорядочены по релевантности, а не по ключу курсора,
+    поэтому доступны только страницы ?page=N, номер ограничен
+    PAGINATOR_MAX_PAGE_NUMBER.
+    """
+
+    def __init__(self, search: PostSearch, per_page: int):
+        """Паджинатор поиска search."""
+        super().__init__(Post.objects.none(), per_page)
+        self.search = search
+
+    def fetch(self, cursor, newer, offset, limit):
+        """Записи страницы из поиска."""
+        return self.search.fetch(offset, limit)
+
+    def _window(self, rows, number, has_next, has_previous):
+        """Последняя доступная номерная страница не ссылается дальше."""
+        has_next = has_next and number < self.max_page_number
+        return super()._window(rows, number, has_next, has_previous)
+
+
+def get_search_page(request, search: PostSearch):
+    """Страница результатов поиска по параметру ?page=."""
+    paginator = SearchPaginator(search, settings.NUMBER_OF_POSTS_TO_VIEW)
+    return paginator.get_cursor_page(number=request.GET.get('page'))
@@ -0,0 +1,249 @@
+"""Модуль обработчиков сигналов приложения Posts."""
+
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.surrogate_keys import purge_surrogate_keys
+
+from .autocomplete import invalidate as invalidate_autocomplete
+from .caching import (INDEX_PAGE_GENERATION_KEY, bump_generation,
+                      post_surrogate_keys)
+from .feeds import backfill_feed, fan_out_post, prune_feed
+from .media import acquire_media, release_media
+from .models import Comment, Follow, Group, Post
+from .stats import bump_stats
+from .thumbnails import schedule_thumbnails
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора."""
+    if created and not raw:
+        fan_out_post(instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_image_reset(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    """При замене картинки сбрасываются ее размеры, заглушка и варианты.
+
+    Новые варианты создает фоновая задача миниатюр. Прежнее имя
+    картинки запоминается для учета ссылок в post_media_references.
+    """
+    if raw:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    stored = None
+    if instance.pk is not None:
+        stored = (Post.objects.filter(pk=instance.pk)
+                  .values_list('image', flat=True).first())
+    instance._stored_image = stored
+    if stored is not None and stored != instance.image.name:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def post_media_references(sender, instance, raw=False, **kwargs):
+    """Новая картинка получает ссылку, прежняя ее теряет."""
+    if raw or not hasattr(instance, '_stored_image'):
+        return
+    stored = instance.__dict__.pop('_stored_image')
+    if stored == instance.image.name:
+        return
+    if instance.image:
+        acquire_media(instance.image.name)
+    if stored:
+        release_media(stored)
+
+
+@receiver(post_delete, sender=Post)
+def post_media_release(sender, instance, **kwargs):
+    """Удаленный пост освобождает ссылку на картинку."""
+    if instance.image:
+        release_media(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, raw=False, **kwargs):
+    """Миниатюры картинки поста создаются в фоне после сохранения."""
+    if instance.image and not raw:
+        schedule_thumbnails(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    """После подписки посты автора попадают в ленту подписчика."""
+    if created and not raw:
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_prune(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты подписчика."""
+    prune_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def post_stats_increment(sender, instance, created, raw=False, **kwargs):
+    """Новый пост увеличивает счетчик постов автора."""
+    if created and not raw:
+        bump_stats(instance.author_id, post_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_stats_decrement(sender, instance, **kwargs):
+    """Удаленный пост уменьшает счетчик постов автора."""
+    bump_stats(instance.author_id, create=False, post_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_stats_increment(sender, instance, created, raw=False, **kwargs):
+    """Новый комментарий увеличивает счетчик комментариев автора."""
+    if created and not raw:
+        bump_stats(instance.author_id, comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_stats_decrement(sender, instance, **kwargs):
+    """Удаленный комментарий уменьшает счетчик комментариев автора."""
+    bump_stats(instance.author_id, create=False, comment_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_stats_increment(sender, instance, created, raw=False, **kwargs):
+    """Подписка увеличивает счетчики подписчика и автора."""
+    if created and not raw:
+        bump_stats(instance.user_id, following_count=1)
+        bump_stats(instance.author_id, follower_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_stats_decrement(sender, instance, **kwargs):
+    """Отписка уменьшает счетчики подписчика и автора."""
+    bump_stats(instance.user_id, create=False, following_count=-1)
+    bump_stats(instance.author_id, create=False, follower_count=-1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def index_page_invalidate(sender, **kwargs):
+    """Записи постов, групп и комментариев меняют главную страницу."""
+    bump_generation(INDEX_PAGE_GENERATION_KEY)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_index_page_invalidate(sender, update_fields=None, **kwargs):
+    """Изменение пользователя меняет имена авторов на главной странице.
+
+    Обновление только last_login при входе на сайт страницу не меняет.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_generation(INDEX_PAGE_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_page_cache_purge(sender, instance, **kwargs):
+    """Запись поста сбрасывает страницы с постом, автором и группой."""
+    purge_surrogate_keys(['posts', *post_surrogate_keys(instance)])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_page_cache_purge(sender, instance, **kwargs):
+    """Комментарий сбрасывает страницы с комментируемым постом."""
+    purge_surrogate_keys([f'post-{instance.post_id}'])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_page_cache_purge(sender, instance, **kwargs):
+    """Подписка сбрасывает страницы подписчика и автора."""
+    purge_surrogate_keys(
+        [f'author-{instance.user_id}', f'author-{instance.author_id}'])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_page_cache_purge(sender, instance, **kwargs):
+    """Изменение группы сбрасывает страницы с ее постами."""
+    purge_surrogate_keys([f'group-{instance.pk}'])
+
+
+@receiver(post_save, sender=User)
+def user_page_cache_purge(sender, instance, update_fields=None, **kwargs):
+    """Изменение пользователя сбрасывает страницы с его постами.
+
+    Обновление только last_login при входе на сайт страницы не меняет.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    purge_surrogate_keys([f'author-{instance.pk}'])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_autocomplete_invalidate(sender, **kwargs):
+    """Изменение групп перестраивает индекс подсказок групп."""
+    invalidate_autocomplete('groups')
+
+
+# Поля пользователя, из которых строится индекс подсказок.
+USER_AUTOCOMPLETE_FIELDS = ('username', 'first_name', 'last_name',
+                            'is_active')
+
+
+@receiver(pre_save, sender=User)
+def user_autocomplete_snapshot(sender, instance, raw=False,
+                               update_fields=None, **kwargs):
+    """Запоминает поля индекса подсказок до изменения пользователя."""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+            USER_AUTOCOMPLETE_FIELDS):
+        return
+    instance._stored_autocomplete = (
+        User.objects.filter(pk=instance.pk)
+        .values_list(*USER_AUTOCOMPLETE_FIELDS).first())
+
+
+@receiver(post_save, sender=User)
+def user_autocomplete_invalidate(sender, instance, created, raw=False,
+                                 **kwargs):
+    """Изменение полей индекса перестраивает индекс подсказок.
+
+    Вход на сайт (last_login), смена пароля и другие поля индекс
+    не меняют. Регистрации учитываются с задержкой (см.
+    posts.autocomplete), чтобы не перестраивать индекс на каждую.
+    """
+    if raw:
+        return
+    if created:
+        if instance.is_active:
+            invalidate_autocomplete('users', delayed=True)
+        return
+    if not hasattr(instance, '_stored_autocomplete'):
+        return
+    stored = instance.__dict__.pop('_stored_autocomplete')
+    current = tuple(
+        getattr(instance, name) for name in USER_AUTOCOMPLETE_FIELDS)
+    if stored != current:
+        invalidate_autocomplete('users')
+
+
+@receiver(post_delete, sender=User)
+def user_autocomplete_delete(sender, **kwargs):
+    """Удаление пользователя перестраивает индекс подсказок."""
+    invalidate_autocomplete('users')
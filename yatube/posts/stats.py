@@ -0,0 +1,83 @@
+"""Модуль денормализованных счетчиков пользователей приложения Posts."""
+
+
+from typing import Iterable
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+STATS_FIELDS = (
+    'post_count', 'follower_count', 'following_count', 'comment_count')
+
+
+def bump_stats(user_id: int, create: bool = True, **deltas: int) -> None:
+    """Атомарно изменяет счетчики пользователя на deltas.
+
+    Если строки счетчиков еще нет, при create=True она создается
+    пересчетом (значения уже учитывают текущее изменение).
+    При удалениях create=False: пользователь может удаляться
+    в той же транзакции каскадом.
+    """
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    for field, delta in deltas.items():
+        if delta < 0:
+            # Счетчик не уходит ниже нуля даже при расхождении с данными.
+            stats = stats.filter(**{f'{field}__gte': -delta})
+    updated = stats.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create:
+        recount_stats([user_id])
+
+
+def _count(queryset, field: str) -> Coalesce:
+    """Подзапрос UPDATE: количество строк queryset пользователя строки."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('user')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def recount_stats(user_ids: Iterable[int]) -> int:
+    """Пересчитывает счетчики пользователей по данным таблиц.
+
+    Недостающие строки счетчиков создаются, затем все строки пачки
+    обновляются одним UPDATE с подзапросами. Строки не удаляются,
+    поэтому пересчет не конфликтует с одновременными F()-изменениями
+    bump_stats: оба обновления выполняются под блокировкой строки.
+    Возвращает количество пересчитанных пользователей.
+    """
+    user_ids = list(user_ids)
+    # Чтение до транзакции: в SQLite транзакция, начатая чтением,
+    # не может перейти к записи, пока пишет другой поток.
+    missing = list(User.objects.filter(
+        pk__in=user_ids, stats__isnull=True
+    ).values_list('pk', flat=True))
+    with transaction.atomic():
+        AuthorStats.objects.bulk_create(
+            [AuthorStats(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True,
+        )
+        return AuthorStats.objects.filter(user__in=user_ids).update(
+            post_count=_count(Post.objects, 'author'),
+            follower_count=_count(Follow.objects, 'author'),
+            following_count=_count(Follow.objects, 'user'),
+            comment_count=_count(Comment.objects, 'author'),
+        )
+
+
+def get_stats(user) -> AuthorStats:
+    """Счетчики пользователя; пустые, если строки счетчиков нет."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
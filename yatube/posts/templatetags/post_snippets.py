@@ -0,0 +1,63 @@
+"""Модуль тегов шаблонов приложения Posts."""
+
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.caching import post_snippet_cache_key
+from posts.thumbnails import get_ready_thumbnail
+
+register = template.Library()
+
+SNIPPET_TEMPLATE = 'posts/includes/post_snippet.html'
+
+
+@register.simple_tag(takes_context=True)
+def post_snippets(context, posts, is_profile_template=False,
+                  is_group_template=False):
+    """Список сниппетов постов страницы с кэшированием каждого сниппета.
+
+    Готовые фрагменты читаются одним cache.get_many, отрисовываются
+    и записываются в кэш только отсутствующие; карта миниатюр страницы
+    (thumbnails) передается в их шаблон. Сниппеты с заглушкой вместо
+    миниатюры не кэшируются: миниатюра появится без смены ключа.
+    Используется в форме {% post_snippets page_obj as snippets %}.
+    """
+    posts = list(posts)
+    flags = {
+        'is_profile_template': bool(is_profile_template),
+        'is_group_template': bool(is_group_template),
+    }
+    thumbnails = context.get('thumbnails')
+    keys = [post_snippet_cache_key(post, **flags) for post in posts]
+    cached = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cached:
+            cached[key] = render_to_string(SNIPPET_TEMPLATE, {
+                'post': post,
+                'thumbnails': thumbnails,
+                **flags,
+            })
+            if not _thumbnails_pending(post, thumbnails):
+                missing[key] = cached[key]
+    if missing:
+        cache.set_many(missing, settings.POST_SNIPPET_CACHE_TIMEOUT)
+    return [mark_safe(cached[key]) for key in keys]
+
+
+def _thumbnails_pending(post, thumbnails) -> bool:
+    """Выводится ли вместо миниатюры картинки поста заглушка."""
+    if not post.image:
+        return False
+    for geometry in settings.POST_IMAGE_THUMBNAILS:
+        if thumbnails is not None:
+            thumbnail = thumbnails.get((post.pk, geometry))
+        else:
+            thumbnail = get_ready_thumbnail(post.image, geometry)
+        if thumbnail is None:
+            return True
+    return False
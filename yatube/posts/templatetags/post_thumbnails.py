@@ -0,0 +1,54 @@
+"""Модуль тегов шаблонов миниатюр картинок постов."""
+
+
+from django import template
+from django.conf import settings
+
+from posts.images import variant_sources
+from posts.thumbnails import get_ready_thumbnail, schedule_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def ready_thumbnail(context, post, geometry):
+    """Готовая миниатюра картинки поста или None.
+
+    Миниатюра берется из карты страницы thumbnails в контексте
+    (см. posts.thumbnails.page_thumbnails), без нее - отдельным
+    запросом к KV-хранилищу. Картинка не читается и не масштабируется:
+    если миниатюры еще нет, ее генерация ставится в фоновую очередь,
+    а шаблон выводит заглушку.
+    Используется в форме {% ready_thumbnail post "960x339" as im %}.
+    """
+    if not post.image:
+        return None
+    thumbnails = context.get('thumbnails')
+    if thumbnails is not None:
+        thumbnail = thumbnails.get((post.pk, geometry))
+    else:
+        thumbnail = get_ready_thumbnail(post.image, geometry)
+    if thumbnail is None:
+        schedule_thumbnails(post)
+    return thumbnail
+
+
+@register.simple_tag
+def post_image_sources(post):
+    """Источники <picture> картинки поста: [(MIME-тип, srcset)].
+
+    Список строится по полю image_variants без обращения к файлам.
+    Пока вариантов нет, их создание ставится в фоновую очередь.
+    Используется в форме {% post_image_sources post as sources %}.
+    """
+    if not post.image:
+        return []
+    if not post.image_variants:
+        schedule_thumbnails(post)
+    return variant_sources(post.image)
+
+
+@register.simple_tag
+def post_image_sizes():
+    """Атрибут sizes источников картинки поста из POST_IMAGE_SIZES."""
+    return settings.POST_IMAGE_SIZES
@@ -0,0 +1,47 @@
+"""Модуль функции проверки планов запросов страницы."""
+
+
+from typing import List
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def explain_query_plan(sql: str) -> List[str]:
+    """Строки EXPLAIN QUERY PLAN для запроса SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def check_query_plan(self, client: Client, url: str):
+    """Проверяет, что запросы страницы читают данные по индексам.
+
+    Запросы, выполненные при открытии страницы, повторяются через
+    EXPLAIN QUERY PLAN. Проверка не проходит, если SQLite читает
+    таблицу целиком (SCAN без индекса) или сортирует выборку
+    во временном B-дереве (USE TEMP B-TREE).
+    __________
+    client: Client
+        тестовый клиент, от имени которого открывается страница
+    url: str
+        адрес страницы
+    """
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    for query in queries.captured_queries:
+        sql = query['sql']
+        if not sql.startswith('SELECT'):
+            continue
+        for detail in explain_query_plan(sql):
+            with self.subTest(url=url, sql=sql, plan=detail):
+                self.assertNotIn(
+                    'USE TEMP B-TREE', detail,
+                    f'Запрос страницы {url} сортирует выборку '
+                    'без индекса.'
+                )
+                self.assertFalse(
+                    detail.startswith('SCAN') and 'USING' not in detail,
+                    f'Запрос страницы {url} читает таблицу целиком.'
+                )
@@ -0,0 +1,128 @@
+"""Модуль тестов Atom-лент."""
+
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(ATOM_FEED_SIZE=3)
+class AtomFeedTest(TestCase):
+    """Тест Atom-лент сайта, сообщества и автора."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Настройка фикстур для тестов."""
+        cls.author = User.objects.create_user(
+            username='poet', first_name='Марина', last_name='Цветаева')
+        cls.group = Group.objects.create(
+            title='Стихи', slug='poems', description='Стихи и поэмы')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group,
+                text=f'Стихотворение номер {number}')
+            for number in range(4)
+        ]
+
+    def setUp(self) -> None:
+        """Кэш лент пуст в начале каждого теста."""
+        cache.clear()
+        self.client = Client()
+
+    def test_index_feed(self):
+        """Лента содержит последние посты с автором и сообществом."""
+        response = self.client.get(reverse('posts:atom_index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        content = response.content.decode()
+        self.assertEqual(content.count('<entry>'), 3)
+        self.assertIn('Стихотворение номер 3', content)
+        self.assertNotIn('Стихотворение номер 0', content)
+        self.assertIn('<name>Марина Цветаева</name>', content)
+        self.assertIn('term="Стихи"', content)
+        self.assertIn(
+            reverse('posts:post_detail', args=[self.posts[3].pk]), content)
+
+    def test_group_and_profile_feeds(self):
+        """Ленты сообщества и автора; неизвестные - 404."""
+        other = User.objects.create_user(username='other')
+        Post.objects.create(author=other, text='Чужой пост')
+        for url in (reverse('posts:atom_group', args=['poems']),
+                    reverse('posts:atom_profile', args=['poet'])):
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                self.assertEqual(content.count('<entry>'), 3)
+                self.assertNotIn('Чужой пост', content)
+        for url in (reverse('posts:atom_group', args=['missing']),
+                    reverse('posts:atom_profile', args=['missing'])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_conditional_requests(self):
+        """Клиент с актуальной копией получает 304."""
+        url = reverse('posts:atom_group', args=['poems'])
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_deleted_post_changes_etag(self):
+        """Удаление поста меняет ETag ленты."""
+        self.client.force_login(self.author)
+        url = reverse('posts:atom_group', args=['poems'])
+        etag = self.client.get(url)['ETag']
+        Post.objects.filter(pk=self.posts[3].pk).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn('Стихотворение номер 3', response.content.decode())
+
+    def test_cached_until_posts_change(self):
+        """Лента берется из кэша, пока посты не изменились."""
+        url = reverse('posts:atom_group', args=['poems'])
+        # Авторизованному клиенту ответ не отдается из кэша страниц,
+        # и проверяется кэш самой ленты.
+        self.client.force_login(self.author)
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(
+            [query for query in queries if 'posts_post' in query['sql']])
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новое стихотворение')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Новое стихотворение', response.content.decode())
+
+    def test_author_rename_invalidates_index(self):
+        """Изменение имени автора перестраивает ленту сайта."""
+        url = reverse('posts:atom_index')
+        self.client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Анна'
+        author.save()
+        content = self.client.get(url).content.decode()
+        self.assertIn('<name>Анна Цветаева</name>', content)
+
+    def test_feed_links_on_pages(self):
+        """Страницы сообщества и автора ссылаются на свои ленты."""
+        response = self.client.get(
+            reverse('posts:group_posts', args=['poems']))
+        self.assertContains(
+            response, reverse('posts:atom_group', args=['poems']))
+        self.assertContains(response, reverse('posts:atom_index'))
+        response = self.client.get(reverse('posts:profile', args=['poet']))
+        self.assertContains(
+            response, reverse('posts:atom_profile', args=['poet']))
@@ -0,0 +1,205 @@
+"""Модуль тестов автодополнения групп и пользователей."""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..autocomplete import PrefixIndex, get_index
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PrefixIndexTest(TestCase):
+    """Тест префиксного индекса."""
+
+    def test_search_by_any_key(self):
+        """Поиск по любому ключу без учета регистра и ё, без повторов."""
+        index = PrefixIndex([
+            (['Ёжики в тумане', 'hedgehogs', 'Ёжики', 'в', 'тумане'], 1,
+             {'id': 1}),
+            (['Тушканчики', 'jerboas'], 2, {'id': 2}),
+            (['Ежедневник', 'daily'], 3, {'id': 3}),
+        ])
+        self.assertEqual(index.search('еж', 10), [{'id': 3}, {'id': 1}])
+        self.assertEqual(index.search('ТУ', 10), [{'id': 1}, {'id': 2}])
+        self.assertEqual(index.search('jer', 10), [{'id': 2}])
+        self.assertEqual(index.search('', 1), [{'id': 3}])
+        self.assertEqual(index.search('zzz', 10), [])
+
+
+class AutocompleteViewTest(TestCase):
+    """Тест адреса подсказок и виджетов форм."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Настройка фикстур для тестов."""
+        cls.user = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа номер {number}', slug=f'group-{number}',
+                description='Описание')
+            for number in range(12)
+        ]
+        cls.cats = Group.objects.create(
+            title='Любители котов', slug='cats', description='Про котов')
+
+    def setUp(self) -> None:
+        """Индексы строятся заново для каждого теста."""
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_results(self, kind, **params):
+        """Подсказки из ответа адреса автодополнения."""
+        response = self.client.get(
+            reverse('posts:autocomplete', args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_groups(self):
+        """Группы ищутся по слову названия и слагу, ответ ограничен."""
+        self.assertEqual(
+            self.get_results('groups', q='кот'),
+            [{'id': self.cats.pk, 'slug': 'cats', 'text': 'Любители котов'}])
+        self.assertEqual(
+            [item['id'] for item in self.get_results('groups', term='cat')],
+            [self.cats.pk])
+        self.assertEqual(len(self.get_results('groups', q='груп')), 10)
+
+    def test_users(self):
+        """Пользователи ищутся по имени пользователя, имени и фамилии."""
+        expected = [
+            {'id': self.user.pk, 'username': 'leo',
+             'text': 'leo (Лев Толстой)'},
+        ]
+        self.assertEqual(self.get_results('users', q='толс'), expected)
+        self.assertEqual(self.get_results('users', q='LE'), expected)
+
+    def test_prefix_length_required(self):
+        """Подсказки выдаются для начала ввода от двух букв."""
+        self.assertEqual(self.get_results('users', q='l'), [])
+        self.assertEqual(self.get_results('users'), [])
+
+    @override_settings(AUTOCOMPLETE_RATE_LIMIT=2)
+    def test_rate_limit(self):
+        """Сверх лимита запросов в минуту - 429 с пустым списком."""
+        url = reverse('posts:autocomplete', args=['groups'])
+        guest = Client()
+        for _ in range(2):
+            self.assertEqual(guest.get(url, {'q': 'кот'}).status_code, 200)
+        response = guest.get(url, {'q': 'кот'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(len(self.get_results('groups', q='кот')), 1)
+
+    def test_guest_search_filters(self):
+        """Гость получает подсказки фильтров поиска и ищет с ними."""
+        post = Post.objects.create(
+            author=self.user, group=self.cats, text='Кот на крыше')
+        Post.objects.create(author=self.user, text='Кот без группы')
+        guest = Client()
+        search_url = reverse('posts:search')
+        response = guest.get(search_url)
+        self.assertContains(
+            response, reverse('posts:autocomplete', args=['groups']))
+        self.assertContains(
+            response, reverse('posts:autocomplete', args=['users']))
+        for kind, prefix, field, value in (
+            ('groups', 'кот', 'slug', 'cats'),
+            ('users', 'leo', 'username', 'leo'),
+        ):
+            response = guest.get(
+                reverse('posts:autocomplete', args=[kind]), {'q': prefix})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'][0][field], value)
+        response = guest.get(
+            search_url, {'q': 'кот', 'group': 'cats', 'author': 'leo'})
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_unknown_kind(self):
+        """Неизвестный вид подсказок - 404."""
+        response = self.client.get(
+            reverse('posts:autocomplete', args=['posts']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_answers_from_memory_and_invalidation(self):
+        """Индекс отвечает без запросов и перестраивается при изменении."""
+        get_index('groups')
+        url = reverse('posts:autocomplete', args=['groups'])
+        with self.assertNumQueries(0):
+            Client().get(url, {'q': 'соб'})
+        group = Group.objects.create(
+            title='Собаководы', slug='dogs', description='Про собак')
+        self.assertEqual(
+            [item['id'] for item in self.get_results('groups', q='соб')],
+            [group.pk])
+        group.delete()
+        self.assertEqual(self.get_results('groups', q='соб'), [])
+
+    def test_login_keeps_user_index(self):
+        """Обновление last_login при входе не перестраивает индекс."""
+        index = get_index('users')
+        Client().force_login(self.user)
+        self.assertIs(get_index('users'), index)
+
+    def test_only_indexed_user_fields_rebuild_index(self):
+        """Индекс перестраивается при смене имени, но не пароля."""
+        user = User.objects.get(pk=self.user.pk)
+        index = get_index('users')
+        user.set_password('new-password')
+        user.save()
+        self.assertIs(get_index('users'), index)
+        user.last_name = 'Николаевич'
+        user.save()
+        self.assertIsNot(get_index('users'), index)
+        self.assertEqual(
+            [item['id'] for item in get_index('users').search('никол', 10)],
+            [user.pk])
+
+    def test_signups_are_indexed_with_delay(self):
+        """Регистрации попадают в индекс с задержкой."""
+        index = get_index('users')
+        User.objects.create_user(username='leonid')
+        self.assertIs(get_index('users'), index)
+        with override_settings(AUTOCOMPLETE_REBUILD_DELAY=0):
+            self.assertEqual(
+                [item['username']
+                 for item in self.get_results('users', q='leon')],
+                ['leonid'])
+
+    def test_post_form_renders_only_selected_group(self):
+        """Форма поста не выводит список всех групп."""
+        post = Post.objects.create(
+            author=self.user, group=self.cats, text='Текст поста')
+        response = self.client.get(
+            reverse('posts:post_edit', args=[post.pk]))
+        content = response.content.decode()
+        self.assertIn('Любители котов', content)
+        self.assertNotIn('Группа номер', content)
+        self.assertIn(
+            reverse('posts:autocomplete', args=['groups']), content)
+        self.assertIn('js/autocomplete.js', content)
+        response = self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': 'Новый текст', 'group': self.groups[0].pk})
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.groups[0])
+
+    def test_admin_widgets(self):
+        """Админка использует подсказки вместо списков групп и авторов."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        Post.objects.create(author=self.user, group=self.cats, text='Пост')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        content = response.content.decode()
+        self.assertIn(
+            reverse('posts:autocomplete', args=['groups']), content)
+        self.assertNotIn('Группа номер', content)
+        response = self.client.get(reverse('admin:posts_post_add'))
+        self.assertIn(
+            reverse('posts:autocomplete', args=['users']),
+            response.content.decode())
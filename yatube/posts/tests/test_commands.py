@@ -0,0 +1,274 @@
+"""Модуль тестов management-команд приложения Posts."""
+
+
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, FeedItem, Follow, Group, Post
+from ..search import TRIGGERS, drop_search_triggers, filter_posts
+from ..stats import recount_stats
+
+User = get_user_model()
+
+
+class RebuildFeedsCommandTest(TestCase):
+    """Тест команды rebuild_feeds."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.second_user = User.objects.create_user(username='TestUser2Name')
+        Follow.objects.create(user=cls.second_user, author=cls.user)
+        for i in range(3):
+            Post.objects.create(author=cls.user, text=f'Пост номер {i}.')
+
+    def test_rebuild_feeds_restores_inboxes(self):
+        """Команда восстанавливает ленты по подпискам."""
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(
+            FeedItem.objects.filter(user=self.second_user).count(), 3,
+            'Лента подписчика не восстановлена командой rebuild_feeds.'
+        )
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.user).exists(),
+            'В ленте автора без подписок появились записи.'
+        )
+
+
+class RecountStatsCommandTest(TestCase):
+    """Тест счетчиков AuthorStats и команды recount_stats."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.second_user = User.objects.create_user(username='TestUser2Name')
+        Follow.objects.create(user=cls.second_user, author=cls.user)
+        cls.post = Post.objects.create(author=cls.user, text='Пост.')
+        Post.objects.create(author=cls.user, text='Второй пост.')
+        Comment.objects.create(
+            text='Комментарий.', author=cls.second_user, post=cls.post)
+
+    def check_stats(self):
+        """Счетчики соответствуют данным таблиц."""
+        expected = {
+            self.user: (2, 1, 0, 0),
+            self.second_user: (0, 0, 1, 1),
+        }
+        for user, counts in expected.items():
+            with self.subTest(user=user.username):
+                stats = AuthorStats.objects.get(user=user)
+                self.assertEqual(
+                    (stats.post_count, stats.follower_count,
+                     stats.following_count, stats.comment_count),
+                    counts,
+                    'Счетчики пользователя не соответствуют ожидаемым.'
+                )
+
+    def test_stats_follow_writes(self):
+        """Счетчики обновляются при записи и удалении."""
+        self.check_stats()
+        post = Post.objects.create(author=self.user, text='Временный пост.')
+        post.delete()
+        self.check_stats()
+
+    def test_recount_stats_repairs_drift(self):
+        """Команда восстанавливает разошедшиеся счетчики."""
+        AuthorStats.objects.update(post_count=100, comment_count=0)
+        AuthorStats.objects.filter(user=self.second_user).delete()
+        call_command('recount_stats', '--batch-size', '1', stdout=StringIO())
+        self.check_stats()
+
+    def test_recount_stats_updates_rows_in_place(self):
+        """Пересчет обновляет существующие строки и создает недостающие."""
+        AuthorStats.objects.filter(user=self.user).update(post_count=100)
+        AuthorStats.objects.filter(user=self.second_user).delete()
+        # SAVEPOINT, выборка недостающих, INSERT, UPDATE, RELEASE.
+        with self.assertNumQueries(5):
+            recount_stats([self.user.pk, self.second_user.pk])
+        self.check_stats()
+
+    def test_profile_ignores_counter_drift(self):
+        """Посты видны в профиле, даже если счетчик разошелся с данными."""
+        AuthorStats.objects.filter(user=self.user).update(post_count=0)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username]))
+        self.assertContains(response, 'Второй пост.')
+
+
+class ImportContentCommandTest(TestCase):
+    """Тест команды import_content."""
+
+    def setUp(self) -> None:
+        """Временный каталог для входных файлов."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, lines):
+        """Создает входной файл и возвращает путь к нему."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(f'{line}\n' for line in lines)
+        return path
+
+    def write_jsonl(self, name, records):
+        """Создает файл JSONL из записей."""
+        return self.write(
+            name, [json.dumps(record, ensure_ascii=False)
+                   for record in records])
+
+    def import_file(self, *args):
+        """Запускает импорт и возвращает вывод команды."""
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_content', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_content(self):
+        """Импорт всех типов объектов и пересборка производных данных."""
+        self.import_file('users', self.write_jsonl('users.jsonl', [
+            {'username': 'poet', 'first_name': 'Анна'},
+            {'username': 'reader'},
+        ]))
+        self.import_file('groups', self.write('groups.csv', [
+            'slug,title,description',
+            'poems,Стихи,"Стихи,\nи поэмы"',
+        ]))
+        self.import_file('follows', self.write_jsonl('follows.jsonl', [
+            {'user': 'reader', 'author': 'poet'},
+        ]))
+        output, errors = self.import_file(
+            'posts', self.write_jsonl('posts.jsonl', [
+                {'id': 10, 'author': 'poet', 'group': 'poems',
+                 'text': 'Белая ночь', 'created': '2020-01-02T03:04:05Z'},
+                {'author': 'poet', 'text': 'Без группы'},
+                {'author': 'missing', 'text': 'Чужой пост'},
+            ]), '--batch-size', '1')
+        self.assertIn('Импорт завершен: строк 2, пропущено 1', output)
+        self.assertIn('missing', errors)
+        self.import_file('comments', self.write_jsonl('comments.jsonl', [
+            {'post': 10, 'author': 'reader', 'text': 'Прекрасно'},
+        ]))
+        group = Group.objects.get(slug='poems')
+        self.assertEqual(group.description, 'Стихи,\nи поэмы')
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.group, group)
+        self.assertEqual(post.created.year, 2020)
+        self.assertEqual(post.updated, post.created)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        poet = User.objects.get(username='poet')
+        stats = AuthorStats.objects.get(user=poet)
+        self.assertEqual(
+            (stats.post_count, stats.follower_count), (2, 1),
+            'Счетчики не пересчитаны после импорта.'
+        )
+        self.assertEqual(
+            FeedItem.objects.filter(user__username='reader').count(), 2,
+            'Ленты подписчиков не пересобраны после импорта.'
+        )
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), 'белая')), [post],
+            'Индекс поиска не перестроен после импорта.'
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(
+                self.directory, 'posts.jsonl.checkpoint')),
+            'Контрольная точка не удалена после импорта.'
+        )
+
+    def test_resume_from_checkpoint(self):
+        """Импорт продолжается со смещения в контрольной точке."""
+        User.objects.create_user(username='poet')
+        path = self.write_jsonl('posts.jsonl', [
+            {'id': 1, 'author': 'poet', 'text': 'Загружен до сбоя'},
+            {'id': 2, 'author': 'poet', 'text': 'Загружается после сбоя'},
+        ])
+        with open(path, 'rb') as file:
+            offset = len(file.readline())
+        with open(f'{path}.checkpoint', 'w') as file:
+            json.dump({'offset': offset, 'rows': 1, 'skipped': 0}, file)
+        output, errors = self.import_file(
+            'posts', path, '--transaction-size', '1')
+        self.assertIn(f'Продолжение импорта с байта {offset}', output)
+        self.assertIn('Импорт завершен: строк 2', output)
+        self.assertEqual(
+            list(Post.objects.values_list('pk', flat=True)), [2])
+
+    def test_malformed_json_line_is_skipped(self):
+        """Строка с некорректным JSON пропускается, импорт продолжается."""
+        User.objects.create_user(username='poet')
+        path = self.write('posts.jsonl', [
+            json.dumps({'author': 'poet', 'text': 'Первый'}),
+            '{"author": "poet", "text":',
+            json.dumps({'author': 'poet', 'text': 'Второй'}),
+        ])
+        output, errors = self.import_file('posts', path)
+        self.assertIn('Импорт завершен: строк 2, пропущено 1', output)
+        self.assertIn('некорректный JSON', errors)
+
+    def test_search_works_after_failed_and_partial_imports(self):
+        """Индекс поиска не удаляется и восстанавливается после импорта."""
+        poet = User.objects.create_user(username='poet')
+        old = Post.objects.create(author=poet, text='Старая ночь')
+        path = self.write_jsonl('posts.jsonl', [
+            {'author': 'poet', 'text': 'Белая ночь'},
+        ])
+        with mock.patch('posts.importer.import_batch',
+                        side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                self.import_file('posts', path)
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), 'ночь')), [old])
+        self.import_file('posts', path, '--no-rebuild')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+                "AND name IN (%s, %s, %s)", TRIGGERS)
+            self.assertEqual(cursor.fetchone()[0], len(TRIGGERS))
+        self.assertEqual(
+            filter_posts(Post.objects.all(), 'белая').get().text,
+            'Белая ночь')
+
+    def test_killed_import_triggers_are_restored(self):
+        """Триггеры, удаленные убитым импортом, восстанавливаются."""
+        poet = User.objects.create_user(username='poet')
+        drop_search_triggers(connection)
+        Post.objects.create(author=poet, text='Белая ночь')
+        output, errors = self.import_file(
+            'groups', self.write_jsonl('groups.jsonl', [
+                {'slug': 'poems', 'title': 'Стихи'},
+            ]))
+        self.assertIn('Индекс поиска восстановлен', output)
+        self.assertEqual(
+            filter_posts(Post.objects.all(), 'белая').get().text,
+            'Белая ночь')
+        Post.objects.create(author=poet, text='Черная ночь')
+        self.assertEqual(
+            filter_posts(Post.objects.all(), 'черная').get().text,
+            'Черная ночь')
+
+    def test_plain_password_rejected(self):
+        """Пароль без хеша не импортируется."""
+        output, errors = self.import_file(
+            'users', self.write_jsonl('users.jsonl', [
+                {'username': 'plain', 'password': 'secret'},
+                {'username': 'hashed', 'password': make_password('secret')},
+            ]))
+        self.assertIn('хеш пароля', errors)
+        self.assertEqual(
+            list(User.objects.values_list('username', flat=True)),
+            ['hashed'])
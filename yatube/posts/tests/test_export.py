@@ -0,0 +1,142 @@
+"""Модуль тестов выгрузки постов и комментариев."""
+
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2,
+                   EXPORT_BLOCK_SIZE=64)
+class ExportTest(TestCase):
+    """Тест потоковой выгрузки."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='poet')
+        cls.other = User.objects.create_user(username='other')
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        group = Group.objects.create(
+            title='Стихи', slug='poems', description='Стихи')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=group,
+                text=f'Стихотворение, строка "{number}"')
+            for number in range(5)
+        ]
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        cls.image_post = Post.objects.create(
+            author=cls.author, text='С картинкой',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'))
+        Comment.objects.create(
+            author=cls.author, post=cls.posts[0], text='Мой комментарий')
+        Comment.objects.create(
+            author=cls.other, post=cls.posts[0], text='Чужой комментарий')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Удаление временных файлов."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        """Авторизованный клиент автора."""
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def export(self, client=None, **params):
+        """Ответ выгрузки и его содержимое."""
+        response = (client or self.client).get(reverse('posts:export'), params)
+        return response, b''.join(response.streaming_content)
+
+    def test_jsonl(self):
+        """Выгрузка JSONL - только посты автора в формате импорта."""
+        response, content = self.export()
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="yatube-poet-posts.jsonl"')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['id'], self.posts[0].pk)
+        self.assertEqual(rows[0]['author'], 'poet')
+        self.assertEqual(rows[0]['group'], 'poems')
+        self.assertEqual(rows[0]['text'], 'Стихотворение, строка "0"')
+        self.assertIsNone(rows[-1]['group'])
+
+    def test_csv_comments(self):
+        """Выгрузка комментариев в CSV."""
+        response, content = self.export(format='csv', kind='comments')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Мой комментарий')
+        self.assertEqual(rows[0]['post'], str(self.posts[0].pk))
+
+    def test_zip(self):
+        """Архив содержит посты, комментарии и картинки."""
+        response, content = self.export(format='zip')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(archive.testzip(), None)
+            self.assertEqual(
+                len(archive.read('posts.jsonl').splitlines()), 6)
+            self.assertEqual(
+                len(archive.read('comments.jsonl').splitlines()), 1)
+            self.assertEqual(
+                archive.read(self.image_post.image.name), SMALL_GIF)
+
+    def test_access(self):
+        """Гость не может выгрузить данные, чужие - только администратор."""
+        response = Client().get(reverse('posts:export'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.client.get(
+            reverse('posts:export'), {'username': 'other'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        admin_client = Client()
+        admin_client.force_login(self.admin)
+        response, content = self.export(admin_client, username='other')
+        self.assertIn('Чужой пост', content.decode())
+        response = self.client.get(reverse('posts:export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_export_import_round_trip(self):
+        """Выгрузка команды export_content загружается import_content."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'posts.csv')
+        call_command(
+            'export_content', '--format', 'csv', '--output', path,
+            stdout=io.StringIO())
+        Post.objects.all().delete()
+        call_command('import_content', 'posts', path, stdout=io.StringIO())
+        post = Post.objects.get(pk=self.posts[1].pk)
+        self.assertEqual(post.text, 'Стихотворение, строка "1"')
+        self.assertEqual(post.created, self.posts[1].created)
+        self.assertEqual(Post.objects.count(), 7)
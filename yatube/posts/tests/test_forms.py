@@ -3,12 +3,15 @@
 import shutil
 import tempfile
 from datetime import datetime
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.shortcuts import get_object_or_404
 from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post
 from .page_description import PageDescription
@@ -108,7 +111,8 @@ class PostFormTests(TestCase):
                 group=self.group.pk,
                 author=self.user,
                 created__date=datetime.today(),
-                image='posts/' + self.uploaded_image.name
+                image__startswith='posts/',
+                image__endswith='.gif',
             ).exists(),
             'Созданный пост не найден.'
         )
@@ -207,3 +211,123 @@ class PostFormTests(TestCase):
             ).exists(),
             'Созданный комментарий не найден.'
         )
+
+
+def make_jpeg(size, **options) -> bytes:
+    """JPEG заданного размера."""
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='JPEG', **options)
+    return buffer.getvalue()
+
+
+def make_gif(size, colors=('red', 'blue')) -> bytes:
+    """Анимация GIF заданного размера, кадр на каждый цвет."""
+    buffer = BytesIO()
+    frames = [Image.new('RGB', size, color) for color in colors]
+    frames[0].save(buffer, format='GIF', save_all=True,
+                   append_images=frames[1:], duration=100, loop=0)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    """Тест потоковой обработки картинки в форме поста."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов загрузки картинок."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUserName')
+        cls.url = reverse('posts:post_create')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Очищаем временный каталог для картинок."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        """Создаем тестовый клиент."""
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post_image(self, content, name='photo.jpg'):
+        """Отправляет форму создания поста с картинкой."""
+        return self.client.post(self.url, data={
+            'text': 'Пост с картинкой.',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=20)
+    def test_large_image_is_downscaled_without_metadata(self):
+        """Большая картинка уменьшается, метаданные удаляются."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        response = self.post_image(make_jpeg((80, 40), exif=exif.tobytes()))
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(author=self.user)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 10))
+            self.assertNotIn('exif', image.info)
+
+    def test_small_image_is_stored_unchanged(self):
+        """Картинку без метаданных и в пределах размера не пересохраняем."""
+        content = make_jpeg((20, 10))
+        self.post_image(content)
+        post = Post.objects.get(author=self.user)
+        with post.image.open('rb') as file:
+            self.assertEqual(file.read(), content)
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=20)
+    def test_animated_gif_keeps_all_frames(self):
+        """У уменьшенной анимации сохраняются оба кадра."""
+        response = self.post_image(make_gif((40, 40)), name='anim.gif')
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(author=self.user)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (20, 20))
+            self.assertEqual(image.n_frames, 2)
+            colors = []
+            for frame in range(image.n_frames):
+                image.seek(frame)
+                colors.append(image.convert('RGB').getpixel((10, 10)))
+        self.assertEqual(colors, [(255, 0, 0), (0, 0, 255)])
+
+    @override_settings(POST_IMAGE_MAX_DIMENSION=20,
+                       POST_IMAGE_MAX_DECODE_MEMORY=10_000)
+    def test_many_frame_animation_is_rejected(self):
+        """Лимит памяти обработки учитывает все кадры анимации."""
+        colors = [(shade, 0, 0) for shade in range(0, 250, 5)]
+        response = self.post_image(
+            make_gif((40, 40), colors), name='anim.gif')
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка слишком велика для обработки.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_decompression_bomb_is_rejected(self):
+        """Картинка с чрезмерным числом пикселей отклоняется."""
+        response = self.post_image(make_jpeg((20, 10)))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка 20×10 слишком велика.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_oversized_upload_is_rejected(self):
+        """Загрузка больше лимита запроса отклоняется."""
+        response = self.post_image(make_jpeg((80, 40)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Размер файла не должен превышать 100\xa0байт.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_unsupported_format_is_rejected(self):
+        """Картинка в неподдерживаемом формате отклоняется."""
+        buffer = BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='BMP')
+        response = self.post_image(buffer.getvalue(), name='image.bmp')
+        self.assertFormError(
+            response, 'form', 'image',
+            'Загрузите картинку в формате JPEG, PNG, GIF или WebP.')
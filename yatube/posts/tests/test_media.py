@@ -0,0 +1,264 @@
+"""Модуль тестов хранения картинок постов по хешу содержимого."""
+
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.storage import is_content_addressed
+
+from ..images import variant_name
+from ..media import delete_unreferenced
+from ..media_gc import MAX_BATCH_SIZE, RateLimiter, collect_shard
+from ..models import MediaFile, Post
+from ..thumbnails import get_ready_thumbnail, refresh_post_thumbnails
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTest(TestCase):
+    """Тест дедупликации картинок и учета ссылок на файлы."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUserName')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        cls.expected_name = (
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Очищаем временный каталог для картинок."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name='small.gif'):
+        """Пост с картинкой SMALL_GIF."""
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой.',
+            image=SimpleUploadedFile(
+                name=name, content=SMALL_GIF, content_type='image/gif'),
+        )
+
+    def references(self):
+        """Счетчик ссылок на файл SMALL_GIF."""
+        return MediaFile.objects.get(name=self.expected_name).references
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые загрузки хранятся одним файлом по хешу."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, self.expected_name)
+        self.assertEqual(second.image.name, self.expected_name)
+        self.assertEqual(self.references(), 2)
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не остается ссылок.
+
+        Удаление выполняется после фиксации транзакции, поэтому
+        в тесте обработчик on_commit вызывается явно.
+        """
+        first = self.create_post()
+        second = self.create_post()
+        storage = first.image.storage
+        first.delete()
+        self.assertEqual(self.references(), 1)
+        self.assertEqual(delete_unreferenced([self.expected_name]), 0)
+        self.assertTrue(storage.exists(self.expected_name))
+        second.image = SimpleUploadedFile(
+            name='other.txt', content=b'other', content_type='text/plain')
+        second.save()
+        self.assertEqual(self.references(), 0)
+        self.assertEqual(delete_unreferenced([self.expected_name]), 1)
+        self.assertFalse(MediaFile.objects.filter(
+            name=self.expected_name).exists())
+        self.assertFalse(storage.exists(self.expected_name))
+
+    def test_migrate_media_storage_moves_legacy_files(self):
+        """Команда переносит старые файлы и объединяет дубликаты."""
+        storage = Post._meta.get_field('image').storage
+        legacy = []
+        for name in ('posts/image.gif', 'posts/image_0Wjo9Ya.gif'):
+            path = storage.path(name)
+            with open(path, 'wb') as file:
+                file.write(SMALL_GIF)
+            post = Post.objects.create(author=self.user, text='Старый пост.')
+            Post.objects.filter(pk=post.pk).update(image=name)
+            legacy.append(name)
+        updated = dict(Post.objects.values_list('pk', 'updated'))
+        output = StringIO()
+        call_command('migrate_media_storage', batch_size=1, stdout=output)
+        self.assertIn('Перенесено картинок: 2', output.getvalue())
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)),
+            {self.expected_name},
+        )
+        self.assertEqual(
+            dict(Post.objects.values_list('pk', 'updated')), updated)
+        self.assertTrue(is_content_addressed(self.expected_name))
+        self.assertEqual(self.references(), 2)
+        for name in legacy:
+            self.assertFalse(storage.exists(name))
+
+    def test_storage_keeps_existing_content(self):
+        """Повторное сохранение того же содержимого не пишет файл."""
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(name, self.expected_name)
+        MediaFile.objects.create(name=name, references=1)
+        with open(storage.path(name), 'wb') as file:
+            file.write(b'kept')
+        self.assertEqual(
+            storage.save('posts/b.gif', ContentFile(SMALL_GIF)), name)
+        with storage.open(name) as file:
+            self.assertEqual(file.read(), b'kept')
+
+    def test_unreferenced_file_is_rewritten(self):
+        """Файл, который ждет удаления, новая загрузка пишет заново."""
+        first = self.create_post()
+        storage = first.image.storage
+        first.delete()
+        self.assertEqual(self.references(), 0)
+        with open(storage.path(self.expected_name), 'wb') as file:
+            file.write(b'removing')
+        second = self.create_post()
+        self.assertEqual(self.references(), 1)
+        self.assertEqual(delete_unreferenced([self.expected_name]), 0)
+        with second.image.open('rb') as file:
+            self.assertEqual(file.read(), SMALL_GIF)
+        MediaFile.objects.filter(name=self.expected_name).delete()
+        self.create_post()
+        self.assertEqual(self.references(), 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectMediaGarbageTest(TestCase):
+    """Тест команды collect_media_garbage."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUserName')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Очищаем временный каталог для картинок."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        """Пост с картинкой, ее миниатюрами и вариантами."""
+        super().setUp()
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой.',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+        refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        self.storage = Post._meta.get_field('image').storage
+        self.orphan = self.storage.save(
+            'posts/orphan.gif', ContentFile(SMALL_GIF + b'orphan'))
+        self.legacy = default_storage.save(
+            'posts/image_0Wjo9Ya.gif', ContentFile(SMALL_GIF))
+        self.variant = default_storage.save(
+            'variants/posts/00/00/gone-320.webp', ContentFile(b'webp'))
+
+    def tearDown(self) -> None:
+        """Файлы теста удаляются вместе с откатом его транзакции."""
+        super().tearDown()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def collect(self, *args):
+        """Запуск команды без порога возраста файлов."""
+        output = StringIO()
+        call_command(
+            'collect_media_garbage', '--min-age', '0', *args,
+            stdout=output)
+        return output.getvalue()
+
+    def live_files(self):
+        """Файлы поста: оригинал, вариант и миниатюра."""
+        return [
+            self.post.image.name,
+            variant_name(self.post.image.name, 320, 'webp'),
+            get_ready_thumbnail(self.post.image, '960x339').name,
+        ]
+
+    def test_dry_run_keeps_files(self):
+        """В режиме dry-run файлы не удаляются."""
+        output = self.collect('--dry-run')
+        self.assertIn('будет удалено: 3', output)
+        for name in (self.orphan, self.legacy, self.variant):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_orphans_are_deleted(self):
+        """Файлы без ссылок удаляются, файлы поста остаются."""
+        live = self.live_files()
+        output = self.collect('--batch-size', '1')
+        self.assertIn('удалено: 3', output)
+        for name in (self.orphan, self.legacy, self.variant):
+            self.assertFalse(default_storage.exists(name))
+        for name in live:
+            self.assertTrue(default_storage.exists(name), name)
+
+    def test_batch_size_is_bounded(self):
+        """Пачка больше MAX_BATCH_SIZE отклоняется командой."""
+        with self.assertRaises(CommandError):
+            self.collect('--batch-size', str(MAX_BATCH_SIZE + 1))
+        with mock.patch('posts.media_gc.MAX_BATCH_SIZE', 1), \
+                CaptureQueriesContext(connection) as queries:
+            stats = collect_shard(
+                ('originals', 'posts', True), RateLimiter(0),
+                batch_size=10 ** 6, min_age=0, dry_run=True)
+        post_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertGreater(stats['scanned'], 1)
+        self.assertEqual(len(post_queries), stats['scanned'])
+
+    def test_thumbnails_of_deleted_post_are_deleted(self):
+        """Миниатюры картинки удаленного поста удаляются."""
+        thumbnail = get_ready_thumbnail(self.post.image, '960x339')
+        self.post.delete()
+        self.collect('--kind', 'thumbnails')
+        self.assertFalse(default_storage.exists(thumbnail.name))
+        self.assertIsNone(get_ready_thumbnail(self.post.image, '960x339'))
+
+    def test_recent_files_are_kept(self):
+        """Недавно записанные файлы не удаляются."""
+        output = StringIO()
+        call_command('collect_media_garbage', stdout=output)
+        self.assertIn('удалено: 0', output.getvalue())
+        self.assertTrue(default_storage.exists(self.orphan))
@@ -0,0 +1,134 @@
+"""Модуль тестов полнотекстового поиска постов."""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import FTS_TABLE, PostSearch, build_match, stem
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    """Тест индекса FTS5, страницы поиска и поиска в админке."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Настройка фикстур для тестов."""
+        cls.author = User.objects.create_user(username='SearchAuthor')
+        cls.other = User.objects.create_user(username='OtherAuthor')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов')
+        cls.cat_post = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Мой кот любит спать на солнце.')
+        cls.cats_post = Post.objects.create(
+            author=cls.other,
+            text='Ёжики и коты живут дружно, коты спят с ёжиками.')
+        cls.dog_post = Post.objects.create(
+            author=cls.author, text='Собака гуляет во дворе.')
+
+    def search(self, query, **filters):
+        """id найденных постов."""
+        return PostSearch(query, **filters).ids(0, 10)
+
+    def test_stem_strips_russian_endings(self):
+        """Окончания отбрасываются, короткая основа сохраняется."""
+        self.assertEqual(stem('Котами'), 'кот')
+        self.assertEqual(stem('ёжиков'), 'ежик')
+        self.assertEqual(stem('кот'), 'кот')
+
+    def test_build_match_ignores_fts_syntax(self):
+        """Операторы и кавычки FTS5 из запроса не попадают в MATCH."""
+        self.assertEqual(build_match('коты OR "NEAR(спать'),
+                         '"кот"* "or"* "near"* "спат"*')
+        self.assertIsNone(build_match(' "*" '))
+
+    def test_inflected_forms_match(self):
+        """Словоформы и ё находят пост."""
+        self.assertCountEqual(
+            self.search('котами'), [self.cat_post.pk, self.cats_post.pk])
+        self.assertEqual(self.search('ежики'), [self.cats_post.pk])
+        self.assertEqual(self.search('собаки во дворе'), [self.dog_post.pk])
+
+    def test_results_ranked_by_relevance(self):
+        """Пост с большим числом вхождений выше."""
+        self.assertEqual(
+            self.search('коты'), [self.cats_post.pk, self.cat_post.pk])
+
+    def test_filters(self):
+        """Фильтры по группе и автору."""
+        self.assertEqual(
+            self.search('кот', group_id=self.group.pk), [self.cat_post.pk])
+        self.assertEqual(
+            self.search('кот', author_id=self.other.pk), [self.cats_post.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Триггеры обновляют индекс при update() и удалении."""
+        Post.objects.filter(pk=self.dog_post.pk).update(
+            text='Попугай сидит на жердочке.')
+        self.assertEqual(self.search('собака'), [])
+        self.assertEqual(self.search('попугаи'), [self.dog_post.pk])
+        Post.objects.filter(pk=self.cat_post.pk).delete()
+        self.assertEqual(self.search('солнце'), [])
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает удаленные триггеры и индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {FTS_TABLE}_ai')
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        self.assertEqual(self.search('собака'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('собака'), [self.dog_post.pk])
+        post = Post.objects.create(author=self.author, text='Хомяк спит.')
+        self.assertEqual(self.search('хомяки'), [post.pk])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты с фильтрами."""
+        url = reverse('posts:search')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+        response = self.client.get(
+            url, {'q': 'кота', 'group': 'cats', 'author': 'SearchAuthor'})
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.cat_post.pk])
+        response = self.client.get(url, {'q': 'кота', 'author': 'nobody'})
+        self.assertIsNone(response.context['page_obj'])
+        self.assertTrue(response.context['form'].errors)
+
+    def test_search_page_pagination(self):
+        """Номерные страницы результатов сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(author=self.other, text=f'Синица номер {number}.')
+            for number in range(15)
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'синицы'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertTrue(page_obj.has_next())
+        self.assertContains(response, 'q=%D1%81%D0%B8%D0%BD%D0%B8%D1%86%D1%8B'
+                                      '&page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'синицы', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 5)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по индексу и понимает словоформы."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.dog_post.pk])
@@ -0,0 +1,226 @@
+"""Модуль тестов фоновой генерации миниатюр приложения Posts."""
+
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from ..images import NO_VARIANTS, supported_formats, variant_name
+from ..models import Post
+from .. import thumbnails
+from ..thumbnails import (get_ready_thumbnail, refresh_post_thumbnails,
+                          schedule_thumbnails)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostThumbnailsTest(TestCase):
+    """Тест фоновой генерации миниатюр.
+
+    Страница не масштабирует картинку сама: до генерации выводится
+    заглушка, после - готовая миниатюра.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUserName')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой.',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Очищаем временный каталог для картинок."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        """Очищаем кэш и создаем клиент."""
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+
+    def test_page_shows_placeholder_without_resizing(self):
+        """Пока миниатюры нет, страница выводит заглушку."""
+        with mock.patch('sorl.thumbnail.base.ThumbnailBackend'
+                        '._create_thumbnail') as create_thumbnail:
+            response = self.client.get(self.url)
+        create_thumbnail.assert_not_called()
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_worker_generates_thumbnail(self):
+        """Фоновая задача создает миниатюру, не меняя дату правки поста."""
+        self.client.get(self.url)
+        updated = Post.objects.get(pk=self.post.pk).updated
+        refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        thumbnail = get_ready_thumbnail(self.post.image, '960x339')
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).updated, updated)
+        response = self.client.get(self.url)
+        self.assertContains(response, thumbnail.url)
+
+    def test_regenerated_thumbnail_replaces_placeholder_snippet(self):
+        """Сниппет с заглушкой не кэшируется до появления миниатюры."""
+        refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        thumbnail = get_ready_thumbnail(self.post.image, '960x339')
+        default.kvstore.delete(thumbnail)
+        url = reverse('posts:profile', args=(self.user.username,))
+        with mock.patch.object(thumbnails, '_executor'):
+            self.assertNotContains(self.client.get(url), thumbnail.url)
+        refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        self.assertContains(self.client.get(url), thumbnail.url)
+
+    def test_worker_skips_replaced_image(self):
+        """Задача для замененной картинки ничего не создает."""
+        refresh_post_thumbnails(self.post.pk, 'posts/replaced.gif')
+        self.assertIsNone(get_ready_thumbnail(self.post.image, '960x339'))
+
+    def test_rolled_back_post_is_not_scheduled(self):
+        """После отката транзакции пост не остается в очереди."""
+        with mock.patch.object(thumbnails, '_executor') as executor:
+            with self.assertRaises(ValueError), transaction.atomic():
+                schedule_thumbnails(self.post)
+                raise ValueError
+        executor.submit.assert_not_called()
+        self.assertNotIn(self.post.pk, thumbnails._scheduled)
+
+    def test_page_thumbnails_are_fetched_in_one_query(self):
+        """Миниатюры ленты читаются из KV-хранилища одним запросом."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост с картинкой {number}.',
+                image=SimpleUploadedFile(
+                    name='small.gif', content=SMALL_GIF,
+                    content_type='image/gif'),
+            )
+            for number in range(3)
+        ]
+        for post in posts:
+            refresh_post_thumbnails(post.pk, post.image.name)
+        cache.clear()
+        url = reverse('posts:profile', args=(self.user.username,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertEqual(
+            response.content.decode().count('<img class="card-img'),
+            len(posts),
+        )
+
+    def test_worker_builds_responsive_variants(self):
+        """Фоновая задача создает варианты, заглушку и размеры картинки."""
+        refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'))
+        formats = supported_formats()
+        self.assertIn('webp', formats)
+        self.assertEqual(
+            post.image_variants,
+            ' '.join(f'{image_format}:320' for image_format in formats),
+        )
+        name = variant_name(post.image.name, 320, 'webp')
+        self.assertTrue(post.image.storage.exists(name))
+        response = self.client.get(self.url)
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(
+            response, f'{post.image.storage.url(name)} 320w')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_no_variant_formats_is_not_rescheduled(self):
+        """Без форматов вариантов задача не повторяется на каждом запросе."""
+        with mock.patch('posts.images.supported_formats', return_value=[]):
+            refresh_post_thumbnails(self.post.pk, self.post.image.name)
+            post = Post.objects.get(pk=self.post.pk)
+            self.assertEqual(post.image_variants, NO_VARIANTS)
+            refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated,
+                         post.updated)
+        with mock.patch('posts.templatetags.post_thumbnails'
+                        '.schedule_thumbnails') as schedule:
+            response = self.client.get(self.url)
+        schedule.assert_not_called()
+        self.assertNotContains(response, '<source type=')
+
+    def test_replaced_image_resets_variants(self):
+        """Замена картинки сбрасывает варианты и размеры."""
+        refresh_post_thumbnails(self.post.pk, self.post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        post.image = SimpleUploadedFile(
+            name='other.gif', content=SMALL_GIF, content_type='image/gif')
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAILS_EAGER=False)
+class PostThumbnailsWorkerTest(TransactionTestCase):
+    """Тест генерации миниатюр в пуле фоновых потоков."""
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Очищаем временный каталог для картинок."""
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def wait_for_workers(self, post_id: int, timeout: float = 10) -> None:
+        """Ждет, пока фоновая задача поста не завершится."""
+        deadline = time.monotonic() + timeout
+        while post_id in thumbnails._scheduled:
+            if time.monotonic() > deadline:
+                self.fail('Фоновая задача миниатюр не завершилась.')
+            time.sleep(0.05)
+
+    def test_commit_runs_background_task(self):
+        """После фиксации пост попадает в пул потоков и получает миниатюры."""
+        with transaction.atomic():
+            post = Post.objects.create(
+                author=User.objects.create_user(username='TestUserName'),
+                text='Пост с картинкой.',
+                image=SimpleUploadedFile(
+                    name='small.gif', content=SMALL_GIF,
+                    content_type='image/gif'),
+            )
+            self.assertNotIn(post.pk, thumbnails._scheduled)
+        self.wait_for_workers(post.pk)
+        post.refresh_from_db()
+        self.assertIsNotNone(get_ready_thumbnail(post.image, '960x339'))
+        self.assertNotEqual(post.image_variants, '')
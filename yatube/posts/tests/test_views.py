@@ -3,16 +3,24 @@
 
 import shutil
 import tempfile
-from time import sleep
+from http import HTTPStatus
+from io import StringIO
+from time import sleep, time
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.core.paginator import Page
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
 
-from ..models import Comment, Follow, Group, Post
+from ..feeds import PULL_AUTHORS_CACHE_KEY, get_pull_authors
+from ..models import Comment, FeedItem, Follow, Group, Post
+from ..paginators import encode_cursor
 from .page_description import PageDescription
 
 User = get_user_model()
@@ -216,6 +224,71 @@ class PostPagesSerialTests(TestCase):
                                 f'объект {object_name} неверного типа.'
                             )
 
+    def test_paginators_cursor_links(self):
+        """Курсорные ссылки ?after= и ?before= ведут на соседние страницы."""
+        for page in self.pages.values():
+            if page.has_paginator:
+                with self.subTest(reverse_name=page.reverse_name):
+                    first_page = self.second_authorized_client.get(
+                        page.reverse_name).context[page.paginator_object_name]
+                    second_page = self.second_authorized_client.get(
+                        page.reverse_name,
+                        {'after': first_page.paginator.next_cursor},
+                    ).context[page.paginator_object_name]
+                    self.assertEqual(
+                        len(second_page),
+                        self.NUMBER_OF_POSTS_FOR_SECOND_PAGE,
+                        f'Курсор ?after= на странице {page.reverse_name} '
+                        'выдает неверное количество записей.'
+                    )
+                    self.assertFalse(second_page.has_next())
+                    previous_page = self.second_authorized_client.get(
+                        page.reverse_name,
+                        {'before': second_page.paginator.previous_cursor},
+                    ).context[page.paginator_object_name]
+                    self.assertEqual(
+                        list(previous_page), list(first_page),
+                        f'Курсор ?before= на странице {page.reverse_name} '
+                        'не возвращает на первую страницу.'
+                    )
+
+    def test_paginators_cursor_past_end(self):
+        """Курсор за концом ленты ведет на первую страницу."""
+        page: PageDescription = self.pages['index']
+        last_post = Post.objects.order_by('created', 'pk').first()
+        response = self.second_authorized_client.get(
+            page.reverse_name, {'after': encode_cursor(last_post)})
+        page_obj = response.context[page.paginator_object_name]
+        self.assertFalse(page_obj.has_previous())
+        self.assertIsNone(page_obj.paginator.previous_cursor)
+        self.assertEqual(len(page_obj), settings.NUMBER_OF_POSTS_TO_VIEW)
+        self.assertNotContains(response, '?before=&')
+        self.assertNotContains(response, '?before="')
+
+    def test_paginators_do_not_count_posts(self):
+        """Страница паджинатора не выполняет COUNT(*) по всем записям."""
+        page: PageDescription = self.pages['index']
+        with CaptureQueriesContext(connection) as queries:
+            self.second_authorized_client.get(page.second_page_reverse_name)
+        self.assertFalse(
+            any('COUNT(*)' in query['sql']
+                for query in queries.captured_queries),
+            'Паджинатор выполняет COUNT(*) по ленте.'
+        )
+
+    def test_paginators_page_number_is_capped(self):
+        """Номер страницы ?page= ограничен PAGINATOR_MAX_PAGE_NUMBER."""
+        page: PageDescription = self.pages['index']
+        response = self.second_authorized_client.get(
+            page.reverse_name,
+            {'page': settings.PAGINATOR_MAX_PAGE_NUMBER + 1000},
+        )
+        self.assertEqual(
+            response.context[page.paginator_object_name].number,
+            settings.PAGINATOR_MAX_PAGE_NUMBER,
+            'Номер страницы ?page= не ограничен.'
+        )
+
     def test_forms_have_correct_fields_types(self):
         """Типы полей формы соотвествуют ожидаемым, на страницах с формами."""
         for page in self.pages.values():
@@ -462,7 +535,7 @@ class PostPagesCacheTest(TestCase):
 
         cls.pages = cls.set_post_pages_description_batch(cls)
 
-        cache.delete('index_page')
+        cache.clear()
 
     def setUp(self) -> None:
         """Создаем тестовый клиент, пользователь - автор поста."""
@@ -473,10 +546,25 @@ class PostPagesCacheTest(TestCase):
     def test_index_page_cache_works(self):
         """Тест кеширования главной страницы.
 
-        Тестовый пост после удаления, остается на главной странице
-        до принудительной очистки кеша.
+        Изменение поста в обход сигналов не видно на главной странице,
+        пока фрагмент в кэше.
         """
         page: PageDescription = self.pages['index']
+        initial_response = self.authorized_client.get(page.reverse_name)
+
+        Post.objects.filter(pk=self.second_post.pk).update(
+            text='Текст, измененный в обход сигналов.')
+
+        response = self.authorized_client.get(page.reverse_name)
+        self.assertEqual(
+            initial_response.content,
+            response.content,
+            'Контент главной страницы изменился без записи поста '
+            'через ORM, фрагмент не взят из кэша.')
+
+    def test_index_page_cache_invalidated_on_post_delete(self):
+        """Удаление поста сразу сбрасывает кэш главной страницы."""
+        page: PageDescription = self.pages['index']
         posts_count = Post.objects.count()
         initial_response = self.authorized_client.get(page.reverse_name)
         self.assertEqual(
@@ -488,30 +576,43 @@ class PostPagesCacheTest(TestCase):
 
         self.second_post.delete()
 
-        after_post_delete_response = self.authorized_client.get(
-            page.reverse_name)
-
-        self.assertEqual(
-            initial_response.content,
-            after_post_delete_response.content,
-            'Контент главной страницы изменился'
-            'после удаления поста перед очисткой кэша.')
-
-        cache.delete('index_page')
-
         response = self.authorized_client.get(page.reverse_name)
+        self.assertNotContains(
+            response, self.second_post_text,
+            msg_prefix='Удаленный пост остался на главной странице.')
         self.assertEqual(
             len(response.context[page.paginator_object_name]),
             posts_count - 1,
             'Количество записей на главной странице '
-            'не соотвествует ожидаемому после удаления поста'
-            'и очистки кэша index_page.'
+            'не соотвествует ожидаемому после удаления поста.'
         )
 
         first_object = response.context[page.paginator_object_name][0]
 
         self.check_post(first_object)
 
+    def test_index_page_cache_invalidated_on_author_rename(self):
+        """Новое имя автора сразу видно на главной странице."""
+        page: PageDescription = self.pages['index']
+        self.authorized_client.get(page.reverse_name)
+        author = User.objects.get(pk=self.second_user.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        response = self.authorized_client.get(page.reverse_name)
+        self.assertContains(
+            response, 'Переименованный',
+            msg_prefix='На главной странице осталось старое имя автора.')
+
+    def test_index_page_cache_varies_on_auth_state(self):
+        """Гость и авторизованный пользователь видят разные фрагменты."""
+        page: PageDescription = self.pages['index']
+        self.authorized_client.get(page.reverse_name)
+        response = Client().get(page.reverse_name)
+        self.assertNotContains(
+            response, 'Избранные авторы',
+            msg_prefix='Гостю показан фрагмент авторизованного '
+                       'пользователя.')
+
 
 class FollowUnfollowTest(TestCase):
     """Тест создания и удаления подписки Follow.
@@ -541,7 +642,7 @@ class FollowUnfollowTest(TestCase):
 
         cls.pages = cls.set_post_pages_description_batch(cls)
 
-        cache.delete('index_page')
+        cache.clear()
 
     def setUp(self) -> None:
         """Создаем тестовый клиент, пользователь - автор поста."""
@@ -639,7 +740,7 @@ class FollowingPosts(TestCase):
 
         cls.pages = cls.set_post_pages_description_batch(cls)
 
-        cache.delete('index_page')
+        cache.clear()
 
     def setUp(self) -> None:
         """Создаем тестовые клиенты."""
@@ -713,3 +814,348 @@ class FollowingPosts(TestCase):
             'У пользователя на странице подписок не пусто, '
             'но пост автора, на которого подписан пользователь, удален.'
         )
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+class PullAuthorFollowingPosts(TestCase):
+    """Тест ленты подписок для авторов, посты которых не раскладываются.
+
+    Посты pull-авторов не попадают в FeedItem и подмешиваются
+    в ленту подписчика при чтении.
+    """
+    from ._check_post import check_post
+    from ._descript_post_pages import set_post_pages_description_batch
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.second_user = User.objects.create_user(username='TestUser2Name')
+        Follow.objects.create(user=cls.second_user, author=cls.user)
+        cls.post_text = 'Пост автора с множеством подписчиков.'
+        cls.post = Post.objects.create(author=cls.user, text=cls.post_text)
+        cls.pages = cls.set_post_pages_description_batch(cls)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Сбрасываем закэшированный список pull-авторов."""
+        super().tearDownClass()
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+
+    def test_pull_author_post_is_merged_into_feed(self):
+        """Пост pull-автора отображается в ленте подписчика."""
+        self.assertFalse(
+            FeedItem.objects.filter(user=self.second_user).exists(),
+            'Пост pull-автора разложен по лентам подписчиков.'
+        )
+        client = Client()
+        client.force_login(self.second_user)
+        follow_index: PageDescription = self.pages['follow_index']
+        response = client.get(follow_index.reverse_name)
+        page_obj = response.context[follow_index.paginator_object_name]
+        self.assertEqual(
+            len(page_obj), 1,
+            'Пост pull-автора не подмешан в ленту подписчика.'
+        )
+        self.check_post(page_obj[0])
+
+    def test_former_pull_author_posts_are_backfilled(self):
+        """Посты выбывшего pull-автора дописываются в ленты подписчиков."""
+        get_pull_authors()
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+        with self.settings(FEED_FANOUT_MAX_FOLLOWERS=10):
+            self.assertEqual(
+                get_pull_authors(), {self.user.pk},
+                'Выбывший pull-автор перестал подмешиваться до дополнения '
+                'лент.'
+            )
+            self.assertFalse(
+                FeedItem.objects.filter(user=self.second_user).exists(),
+                'Ленты дополняются при чтении множества pull-авторов.'
+            )
+            call_command('rebuild_feeds', pull_authors=True,
+                         stdout=StringIO())
+            self.assertEqual(get_pull_authors(), set())
+        self.assertTrue(
+            FeedItem.objects.filter(
+                user=self.second_user, post=self.post).exists(),
+            'Пост бывшего pull-автора не попал в ленту подписчика.'
+        )
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+
+
+class PostPagesQueryPlanTest(TestCase):
+    """Тест планов запросов страниц приложения Post.
+
+    Ленты и страница поста читают данные только по индексам.
+    """
+    from ._check_query_plan import check_query_plan
+    from ._descript_post_pages import set_post_pages_description_batch
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.second_user = User.objects.create_user(username='TestUser2Name')
+        Follow.objects.create(user=cls.second_user, author=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(settings.NUMBER_OF_POSTS_TO_VIEW + 1):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text=f'Мой тестовый пост номер {i}.',
+                group=cls.group,
+            )
+        Comment.objects.create(
+            text='Комментарий.', author=cls.second_user, post=cls.post)
+        cls.pages = cls.set_post_pages_description_batch(cls)
+
+    def setUp(self) -> None:
+        """Создаем тестовый клиент подписчика."""
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(PostPagesQueryPlanTest.second_user)
+
+    def test_pages_use_indexes(self):
+        """Запросы лент и страницы поста не читают таблицы целиком."""
+        for name in ('index', 'group_list', 'profile', 'follow_index',
+                     'post_detail'):
+            page: PageDescription = self.pages[name]
+            first_page = self.client.get(page.reverse_name).context
+            self.check_query_plan(self.client, page.reverse_name)
+            if page.has_paginator:
+                cursor = first_page[page.paginator_object_name].paginator
+                self.check_query_plan(
+                    self.client,
+                    f'{page.reverse_name}?after={cursor.next_cursor}'
+                )
+
+
+class PostPagesNumQueriesTest(TestCase):
+    """Тест количества запросов к базе на страницах лент.
+
+    Количество запросов не зависит от количества постов на странице:
+    автор, группа и число комментариев читаются вместе с постами.
+    """
+    from ._descript_post_pages import set_post_pages_description_batch
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур: у каждого поста свой автор и группа."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.second_user = User.objects.create_user(username='TestUser2Name')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.second_user, author=cls.user)
+        for i in range(settings.NUMBER_OF_POSTS_TO_VIEW):
+            author = User.objects.create_user(
+                username=f'TestAuthor{i}', first_name=f'Автор {i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-')
+            Follow.objects.create(user=cls.second_user, author=author)
+            post = Post.objects.create(
+                author=author, text=f'Пост номер {i}.', group=group)
+            Comment.objects.create(text='-', author=cls.user, post=post)
+            Post.objects.create(
+                author=cls.user, text=f'Пост автора {i}.', group=cls.group)
+        cls.pages = cls.set_post_pages_description_batch(cls)
+
+    def setUp(self) -> None:
+        """Создаем тестовые клиенты."""
+        super().setUp()
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostPagesNumQueriesTest.second_user)
+
+    def test_guest_feeds_num_queries(self):
+        """Ленты для гостя укладываются в бюджет запросов."""
+        budgets = {
+            'index': 1,
+            'group_list': 2,
+            'profile': 2,
+        }
+        for name, budget in budgets.items():
+            page: PageDescription = self.pages[name]
+            with self.subTest(reverse_name=page.reverse_name):
+                with self.assertNumQueries(budget):
+                    self.guest_client.get(page.reverse_name)
+
+    def test_follow_index_num_queries(self):
+        """Лента подписок укладывается в бюджет запросов.
+
+        Сессия, пользователь, окно ленты и посты окна. Первый запрос
+        прогревает кэш списка pull-авторов.
+        """
+        page: PageDescription = self.pages['follow_index']
+        self.authorized_client.get(page.reverse_name)
+        with self.assertNumQueries(4):
+            self.authorized_client.get(page.reverse_name)
+
+
+class PostSnippetCacheTest(TestCase):
+    """Тест кэширования сниппетов постов в лентах.
+
+    Повторная отрисовка ленты берет сниппеты из кэша, правка поста
+    и переименование группы сбрасывают только свои сниппеты.
+    """
+    from ._descript_post_pages import set_post_pages_description_batch
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст до правки.', group=cls.group)
+        cls.pages = cls.set_post_pages_description_batch(cls)
+
+    def setUp(self) -> None:
+        """Очищаем кэш и создаем клиент автора."""
+        super().setUp()
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostSnippetCacheTest.user)
+
+    def test_snippet_is_rendered_once(self):
+        """Повторная отрисовка профиля не отрисовывает сниппет заново."""
+        page: PageDescription = self.pages['profile']
+        response = self.authorized_client.get(page.reverse_name)
+        self.assertTemplateUsed(
+            response, 'posts/includes/post_snippet.html')
+        response = self.authorized_client.get(page.reverse_name)
+        self.assertTemplateNotUsed(
+            response, 'posts/includes/post_snippet.html',
+            'Сниппет поста отрисован повторно, а не взят из кэша.')
+
+    def test_post_edit_refreshes_snippet(self):
+        """После правки поста в ленте отображается новый текст."""
+        page: PageDescription = self.pages['profile']
+        self.authorized_client.get(page.reverse_name)
+        self.authorized_client.post(
+            self.pages['post_edit'].reverse_name,
+            data={'text': 'Текст после правки.', 'group': self.group.pk},
+        )
+        response = self.authorized_client.get(page.reverse_name)
+        self.assertContains(response, 'Текст после правки.')
+
+    def test_group_rename_refreshes_snippet(self):
+        """После смены слага группы ссылка в сниппете обновляется."""
+        page: PageDescription = self.pages['profile']
+        self.authorized_client.get(page.reverse_name)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed-slug'
+        group.save()
+        response = self.authorized_client.get(page.reverse_name)
+        self.assertContains(response, '/group/renamed-slug/')
+
+
+class ConditionalGetTest(TestCase):
+    """Тест условных GET-запросов к лентам и странице поста.
+
+    Повторный запрос с ETag получает 304 без отрисовки шаблона,
+    правка поста и новый комментарий меняют ETag.
+    """
+    from ._descript_post_pages import set_post_pages_description_batch
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Настройка фикстур для тестов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser1Name')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст до правки.', group=cls.group)
+        cls.pages = cls.set_post_pages_description_batch(cls)
+        cls.page_names = ('index', 'group_list', 'profile', 'post_detail')
+
+    def setUp(self) -> None:
+        """Очищаем кэш и создаем клиент автора."""
+        super().setUp()
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTest.user)
+
+    def test_pages_return_not_modified(self):
+        """Страницы отвечают 304 на совпавший ETag.
+
+        Last-Modified не отправляется, и If-Modified-Since без ETag
+        не дает 304: дата постов не меняется, например, при удалении
+        комментария.
+        """
+        for name in self.page_names:
+            page: PageDescription = self.pages[name]
+            with self.subTest(page=name):
+                response = self.authorized_client.get(page.reverse_name)
+                self.assertFalse(response.has_header('Last-Modified'))
+                self.assertEqual(
+                    self.authorized_client.get(
+                        page.reverse_name,
+                        HTTP_IF_MODIFIED_SINCE=http_date(time() + 3600),
+                    ).status_code,
+                    HTTPStatus.OK,
+                )
+                response = self.authorized_client.get(
+                    page.reverse_name,
+                    HTTP_IF_NONE_MATCH=response['ETag'],
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertTemplateNotUsed(response, page.template)
+
+    def test_post_edit_changes_validators(self):
+        """Правка поста меняет ETag всех страниц с постом."""
+        etags = {
+            name: self.authorized_client.get(
+                self.pages[name].reverse_name)['ETag']
+            for name in self.page_names
+        }
+        self.authorized_client.post(
+            self.pages['post_edit'].reverse_name,
+            data={'text': 'Текст после правки.', 'group': self.group.pk},
+        )
+        for name, etag in etags.items():
+            with self.subTest(page=name):
+                response = self.authorized_client.get(
+                    self.pages[name].reverse_name,
+                    HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertContains(response, 'Текст после правки.')
+
+    def test_comment_changes_validators(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        page: PageDescription = self.pages['post_detail']
+        etag = self.authorized_client.get(page.reverse_name)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий.')
+        response = self.authorized_client.get(
+            page.reverse_name, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый комментарий.')
+
+    def test_validators_vary_on_user(self):
+        """ETag авторизованного пользователя не подходит гостю."""
+        page: PageDescription = self.pages['profile']
+        etag = self.authorized_client.get(page.reverse_name)['ETag']
+        response = self.client.get(
+            page.reverse_name, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
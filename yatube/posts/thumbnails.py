@@ -0,0 +1,222 @@
+"""Модуль фоновой генерации миниатюр картинок постов.
+
+Миниатюры всех геометрий из POST_IMAGE_THUMBNAILS и адаптивные
+варианты (см. posts.images) создаются в пуле фоновых потоков после
+сохранения поста с картинкой. Шаблоны только
+читают готовую миниатюру из KV-хранилища sorl-thumbnail и, пока ее
+нет, выводят заглушку, поэтому веб-запрос никогда не декодирует
+и не масштабирует картинку.
+"""
+
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.functional import SimpleLazyObject
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.surrogate_keys import purge_surrogate_keys
+
+from .caching import (INDEX_PAGE_GENERATION_KEY, bump_generation,
+                      post_surrogate_keys)
+from .images import build_variants
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.POST_THUMBNAIL_WORKERS,
+    thread_name_prefix='post-thumbnails',
+)
+_scheduled: Set[int] = set()
+_scheduled_lock = threading.Lock()
+
+# Поля поста, которые заполняет build_variants.
+VARIANT_FIELDS = (
+    'image_width', 'image_height', 'image_placeholder', 'image_variants',
+)
+
+
+def thumbnail_options(geometry: str) -> dict:
+    """Опции геометрии, дополненные так же, как в get_thumbnail()."""
+    options = dict(settings.POST_IMAGE_THUMBNAILS[geometry])
+    for key, value in default.backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in default.backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry: str) -> ImageFile:
+    """Файл миниатюры картинки (имя вычисляется без чтения картинки)."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, thumbnail_options(geometry))
+    return ImageFile(name, default.storage)
+
+
+def get_ready_thumbnail(image, geometry: str) -> Optional[ImageFile]:
+    """Готовая миниатюра из KV-хранилища или None."""
+    return default.kvstore.get(thumbnail_file(image, geometry))
+
+
+def _get_raw_many(keys: Iterable[str]) -> Dict[str, str]:
+    """Значения ключей KV-хранилища sorl-thumbnail пачкой.
+
+    Ключи читаются из кэша одним get_many, недостающие - одним
+    запросом к таблице; результат (и отсутствие) кладется в кэш,
+    как это делает cached_db KVStore для одного ключа.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+    kvstore = default.kvstore
+    empty = cached_db_kvstore.EMPTY_VALUE
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        fetched = {key: stored.get(key, empty) for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        key: value for key, value in values.items()
+        if value and value != empty
+    }
+
+
+ThumbnailMap = Dict[Tuple[int, str], ImageFile]
+
+
+def get_ready_thumbnails(posts: Iterable[Post]) -> ThumbnailMap:
+    """Готовые миниатюры всех геометрий для постов страницы.
+
+    Ключи KV-хранилища вычисляются без чтения картинок и читаются
+    пачкой, а не отдельным запросом на каждый тег шаблона.
+    Возвращает {(id поста, геометрия): миниатюра}.
+    """
+    wanted = {
+        (post.pk, geometry): thumbnail_file(post.image, geometry)
+        for post in posts if post.image
+        for geometry in settings.POST_IMAGE_THUMBNAILS
+    }
+    if not isinstance(default.kvstore, cached_db_kvstore.KVStore):
+        ready = {
+            item: default.kvstore.get(thumbnail)
+            for item, thumbnail in wanted.items()
+        }
+        return {item: thumbnail for item, thumbnail in ready.items()
+                if thumbnail}
+    # Посты с одинаковой картинкой делят один файл и одну миниатюру.
+    keys: Dict[str, list] = {}
+    for item, thumbnail in wanted.items():
+        keys.setdefault(add_prefix(thumbnail.key), []).append(item)
+    ready = {}
+    for key, value in _get_raw_many(keys).items():
+        thumbnail = deserialize_image_file(value)
+        ready.update(dict.fromkeys(keys[key], thumbnail))
+    return ready
+
+
+def page_thumbnails(posts: Iterable[Post]) -> SimpleLazyObject:
+    """Отложенная карта миниатюр страницы для контекста шаблона.
+
+    Пакетный запрос выполняется при первом обращении, то есть только
+    если страница отрисовывает хотя бы один сниппет не из кэша.
+    """
+    return SimpleLazyObject(lambda: get_ready_thumbnails(posts))
+
+
+def generate_thumbnails(post: Post) -> bool:
+    """Создает недостающие миниатюры картинки поста.
+
+    Возвращает True, если была создана хотя бы одна миниатюра.
+    """
+    created = False
+    for geometry, options in settings.POST_IMAGE_THUMBNAILS.items():
+        if get_ready_thumbnail(post.image, geometry) is None:
+            get_thumbnail(post.image, geometry, **options)
+            created = True
+    return created
+
+
+def refresh_post_thumbnails(post_id: int, image_name: str) -> None:
+    """Создает миниатюры и варианты поста, если его картинка не сменилась.
+
+    Поля вариантов записываются запросом UPDATE, без сигналов и без
+    изменения даты правки поста. Если что-то создано, кэши страниц,
+    на которых выводилась заглушка, сбрасываются явно; если все уже
+    готово, ничего не записывается.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or post.image.name != image_name:
+        return
+    fields = {}
+    if not post.image_variants:
+        build_variants(post)
+        fields = {name: getattr(post, name) for name in VARIANT_FIELDS}
+    created = generate_thumbnails(post)
+    if fields:
+        # Картинку могли заменить, пока создавались варианты.
+        Post.objects.filter(pk=post_id, image=image_name).update(**fields)
+    if created or fields:
+        purge_surrogate_keys(post_surrogate_keys(post))
+        bump_generation(INDEX_PAGE_GENERATION_KEY)
+
+
+def _worker_task(post_id: int, image_name: str, eager: bool = False) -> None:
+    """Задача фонового потока со своим соединением с БД.
+
+    С eager=True задача выполняется в текущем потоке и его соединение
+    не закрывает.
+    """
+    try:
+        refresh_post_thumbnails(post_id, image_name)
+    except Exception:
+        logger.exception('Thumbnail generation failed for post %s', post_id)
+    finally:
+        with _scheduled_lock:
+            _scheduled.discard(post_id)
+        if not eager:
+            connection.close()
+
+
+def schedule_thumbnails(post: Post) -> None:
+    """Ставит генерацию миниатюр поста в фоновую очередь.
+
+    Задача отправляется после фиксации транзакции (при откате пост
+    в очередь не попадает); повторные вызовы для поста, который уже
+    в очереди, игнорируются. При POST_THUMBNAILS_EAGER задача
+    выполняется сразу.
+    """
+    if not post.image:
+        return
+    post_id, image_name = post.pk, post.image.name
+
+    def submit() -> None:
+        """Отправляет задачу, если пост еще не в очереди."""
+        with _scheduled_lock:
+            if post_id in _scheduled:
+                return
+            _scheduled.add(post_id)
+        if settings.POST_THUMBNAILS_EAGER:
+            _worker_task(post_id, image_name, eager=True)
+        else:
+            _executor.submit(_worker_task, post_id, image_name)
+
+    transaction.on_commit(submit)
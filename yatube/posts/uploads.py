@@ -0,0 +1,211 @@
+"""Модуль потоковой обработки загружаемых картинок постов.
+
+Загрузка не держит картинку в памяти целиком: обработчик загрузки
+ограничивает объем файлов запроса и перестает принимать данные после
+превышения лимита, а форма проверяет формат и размеры по заголовку,
+не декодируя пикселей (forms.ImageField лишь открывает картинку
+и проверяет ее структуру). Картинки больше POST_IMAGE_MAX_DIMENSION
+или с метаданными (EXIF, XMP, комментарии) декодируются сразу
+в уменьшенном масштабе (draft для JPEG), уменьшаются и пересохраняются
+без метаданных во временный файл, который остается в памяти только
+пока он небольшой; у анимаций сохраняются все кадры. Остальные
+картинки сохраняются как загружены.
+"""
+
+
+from tempfile import SpooledTemporaryFile
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, ImageSequence
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+BYTES_PER_BAND = {'I': 4, 'F': 4, 'I;16': 2}
+# Технические поля Image.info; остальные (exif, xmp, comment, текстовые
+# блоки PNG) - метаданные, из-за которых картинка пересохраняется.
+TECHNICAL_INFO = {
+    'adobe', 'adobe_transform', 'aspect', 'background', 'dpi', 'duration',
+    'extension', 'gamma', 'icc_profile', 'interlace', 'jfif', 'jfif_density',
+    'jfif_unit', 'jfif_version', 'loop', 'progression', 'progressive',
+    'srgb', 'timestamp', 'transparency', 'version',
+}
+
+
+def upload_too_large() -> forms.ValidationError:
+    """Ошибка превышения лимита POST_IMAGE_MAX_UPLOAD_SIZE."""
+    return forms.ValidationError(
+        'Размер файла не должен превышать %(limit)s.',
+        code='file_too_large',
+        params={
+            'limit': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE),
+        },
+    )
+
+
+class OversizedUploadedFile(UploadedFile):
+    """Пустой файл на месте загрузки, превысившей лимит запроса.
+
+    Данных у файла нет, поэтому чтение сразу поднимает ошибку
+    размера: forms.ImageField читает файл в to_python, и форма
+    показывает ее вместо ошибки формата.
+    """
+
+    def __init__(self, name, content_type, size, charset):
+        """Файл без данных с настоящим размером загрузки."""
+        super().__init__(
+            SpooledTemporaryFile(), name, content_type, size, charset)
+
+    def read(self, *args, **kwargs):
+        """Данных нет: загрузка превысила лимит."""
+        raise upload_too_large()
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Обработчик загрузки с лимитом POST_IMAGE_MAX_UPLOAD_SIZE на запрос.
+
+    Ставится первым в FILE_UPLOAD_HANDLERS и передает данные
+    следующим обработчикам, пока суммарный объем файлов запроса
+    не превысит лимит. Остаток файла дочитывается из потока без
+    сохранения, а вместо файла в форму приходит OversizedUploadedFile.
+    """
+
+    def __init__(self, request=None):
+        """Счетчики объема загрузки запроса."""
+        super().__init__(request)
+        self.total = 0
+        self.file_size = 0
+        self.overflow = False
+
+    def new_file(self, *args, **kwargs):
+        """Начало очередного файла запроса."""
+        super().new_file(*args, **kwargs)
+        self.file_size = 0
+        self.overflow = False
+
+    def receive_data_chunk(self, raw_data, start):
+        """Передает фрагмент дальше, пока не превышен лимит."""
+        self.total += len(raw_data)
+        self.file_size += len(raw_data)
+        if self.total > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+            self.overflow = True
+        return None if self.overflow else raw_data
+
+    def file_complete(self, file_size):
+        """При превышении лимита возвращает пустой файл-маркер."""
+        if not self.overflow:
+            return None
+        return OversizedUploadedFile(
+            self.file_name, self.content_type, self.file_size,
+            self.charset)
+
+
+def _decoded_size(image: Image.Image) -> int:
+    """Объем памяти декодированной картинки в байтах."""
+    bands = BYTES_PER_BAND.get(image.mode, len(image.getbands()))
+    return image.width * image.height * bands
+
+
+def _needs_reencode(image: Image.Image) -> bool:
+    """Нужно ли уменьшать картинку или удалять из нее метаданные."""
+    limit = settings.POST_IMAGE_MAX_DIMENSION
+    return (
+        image.width > limit or image.height > limit
+        or bool(set(image.info) - TECHNICAL_INFO)
+    )
+
+
+def _reencode(image: Image.Image, image_format: str) -> SpooledTemporaryFile:
+    """Уменьшает картинку и сохраняет ее без метаданных.
+
+    Кадры анимации уменьшаются по отдельности и сохраняются все
+    (save_all) с исходными длительностями; лимит памяти
+    POST_IMAGE_MAX_DECODE_MEMORY относится ко всем кадрам сразу.
+    Результат пишется во временный файл, который остается в памяти
+    до FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    limit = settings.POST_IMAGE_MAX_DIMENSION
+    image.draft(image.mode, (limit, limit))
+    frame_count = getattr(image, 'n_frames', 1)
+    if (frame_count * _decoded_size(image)
+            > settings.POST_IMAGE_MAX_DECODE_MEMORY):
+        raise forms.ValidationError(
+            'Картинка слишком велика для обработки.',
+            code='image_memory',
+        )
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 0))
+        frame = ImageOps.exif_transpose(frame)
+        frame.thumbnail((limit, limit), Image.LANCZOS)
+        if image_format == 'JPEG' and frame.mode not in ('RGB', 'L'):
+            frame = frame.convert('RGB')
+        frames.append(frame)
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if len(frames) > 1:
+        options.update(
+            save_all=True,
+            append_images=frames[1:],
+            duration=durations,
+            loop=image.info.get('loop', 0),
+        )
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    frames[0].save(output, format=image_format, **options)
+    output.seek(0)
+    return output
+
+
+def process_image_upload(upload: UploadedFile) -> UploadedFile:
+    """Проверяет загруженную картинку и возвращает очищенную копию.
+
+    Формат и размеры проверяются по заголовку, без декодирования;
+    картинки больше POST_IMAGE_MAX_PIXELS (декомпрессионные бомбы)
+    отклоняются до чтения пикселей. Картинка, которую не нужно
+    уменьшать и очищать, возвращается без изменений.
+    Ошибки - forms.ValidationError.
+    """
+    if (isinstance(upload, OversizedUploadedFile)
+            or upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE):
+        raise upload_too_large()
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise forms.ValidationError(
+            'Картинка слишком велика.', code='image_too_large')
+    except (OSError, SyntaxError):
+        image = None
+    if image is None or image.format not in ALLOWED_FORMATS:
+        raise forms.ValidationError(
+            'Загрузите картинку в формате JPEG, PNG, GIF или WebP.',
+            code='invalid_image',
+        )
+    image_format = image.format
+    if image.width * image.height > settings.POST_IMAGE_MAX_PIXELS:
+        raise forms.ValidationError(
+            'Картинка %(width)s×%(height)s слишком велика.',
+            code='image_too_large',
+            params={'width': image.width, 'height': image.height},
+        )
+    if not _needs_reencode(image):
+        upload.seek(0)
+        upload.content_type = Image.MIME[image_format]
+        return upload
+    try:
+        output = _reencode(image, image_format)
+    except (OSError, SyntaxError):
+        raise forms.ValidationError(
+            'Файл картинки поврежден.', code='invalid_image')
+    output.seek(0, 2)
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(
+        output, upload.name, Image.MIME[image_format], size)
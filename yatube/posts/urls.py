@@ -4,13 +4,27 @@
 from django.urls import path
 
 from . import views
+from .atom import GroupAtomFeed, PostsAtomFeed, ProfileAtomFeed
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/', PostsAtomFeed(), name='atom_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path('group/<slug:slug>/feed/', GroupAtomFeed(), name='atom_group'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/feed/',
+        ProfileAtomFeed(),
+        name='atom_profile'
+    ),
+    path('search/', views.search, name='search'),
+    path(
+        'autocomplete/<slug:kind>/',
+        views.autocomplete_view,
+        name='autocomplete'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('create/', views.post_create, name='post_create'),
@@ -20,6 +34,7 @@ urlpatterns = [
         name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('export/', views.export_view, name='export'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
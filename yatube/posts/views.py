@@ -3,12 +3,28 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-
-from .forms import CommentForm, PostForm
+from django.views.decorators.http import require_safe
+
+from core.conditional import conditional_render
+from core.surrogate_keys import add_surrogate_keys
+
+from .autocomplete import (SOURCES, autocomplete, autocomplete_client,
+                           rate_limited)
+from . import export
+from .caching import (INDEX_PAGE_GENERATION_KEY, get_generation,
+                      page_surrogate_keys, page_validators,
+                      post_surrogate_keys, post_validators)
+from .feeds import get_feed_page
+from .forms import CommentForm, PostForm, SearchForm
 from .models import Follow, Group, Post
+from .paginators import get_cursor_page
+from .search import PostSearch, get_search_page
+from .stats import get_stats
+from .thumbnails import page_thumbnails
 
 User = get_user_model()
 
@@ -17,14 +33,17 @@ def index(request):
     """Главная страница проекта Yatube."""
     template = 'posts/index.html'
 
-    post_list = Post.objects.order_by('-created')
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_TO_VIEW)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_cursor_page(request, Post.objects.for_listing())
     context = {
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
+        'index_cache_timeout': settings.INDEX_PAGE_CACHE_TIMEOUT,
+        'index_cache_generation': get_generation(INDEX_PAGE_GENERATION_KEY),
     }
-    return render(request, template, context)
+    response = conditional_render(
+        request, template, context, page_validators(request, page_obj))
+    return add_surrogate_keys(
+        response, ['posts', *page_surrogate_keys(page_obj)])
 
 
 def group_posts(request, slug):
@@ -34,26 +53,28 @@ def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
 
     # Извлекаем посты группы, настраиваем постраничный вывод
-    post_list = group.posts.order_by('-created')
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_TO_VIEW)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_cursor_page(request, group.posts.for_listing())
     context = {
         'group': group,
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
     }
-    return render(request, template, context)
+    response = conditional_render(
+        request, template, context,
+        page_validators(
+            request, page_obj, group.title, group.description),
+    )
+    return add_surrogate_keys(
+        response, [f'group-{group.pk}', *page_surrogate_keys(page_obj)])
 
 
 def profile(request, username):
     """Профиль пользователя - все записи автора."""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
 
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_TO_VIEW)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_cursor_page(request, author.posts.for_listing())
 
     following: bool = (
         request.user.is_authenticated
@@ -63,13 +84,72 @@ def profile(request, username):
 
     context = {
         'author': author,
+        'stats': get_stats(author),
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
         'following': following,
     }
 
+    stats = context['stats']
+    response = conditional_render(
+        request, template, context,
+        page_validators(
+            request, page_obj, author.get_full_name(), following,
+            stats.post_count, stats.follower_count, stats.following_count,
+        ),
+    )
+    return add_surrogate_keys(
+        response, [f'author-{author.pk}', *page_surrogate_keys(page_obj)])
+
+
+def search(request):
+    """Поиск постов по тексту, результаты по релевантности."""
+    template = 'posts/search.html'
+
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid() and form.cleaned_data['q'].strip():
+        group = form.cleaned_data['group']
+        author = form.cleaned_data['author']
+        page_obj = get_search_page(request, PostSearch(
+            form.cleaned_data['q'],
+            group_id=group.pk if group else None,
+            author_id=author.pk if author else None,
+        ))
+    # Параметры запроса для ссылок на соседние страницы результатов
+    query = request.GET.copy()
+    query.pop('page', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj or []),
+        'query_string': query.urlencode(),
+    }
     return render(request, template, context)
 
 
+@require_safe
+def autocomplete_view(request, kind):
+    """Подсказки групп или пользователей по началу ввода (JSON).
+
+    Адрес открыт: подсказки использует и форма поиска для гостей.
+    Перебор ограничивают минимальная длина префикса, число подсказок
+    и лимит запросов клиента в минуту (сверх лимита - 429 с пустым
+    списком). Формат ответа совместим с select2, который использует
+    админка: {"results": [{"id": ..., "text": ...}], "pagination": {...}}.
+    """
+    if kind not in SOURCES:
+        raise Http404
+    if rate_limited(autocomplete_client(request)):
+        return JsonResponse(
+            {'results': [], 'pagination': {'more': False}}, status=429)
+    prefix = request.GET.get('term', request.GET.get('q', ''))
+    return JsonResponse({
+        'results': autocomplete(kind, prefix),
+        'pagination': {'more': False},
+    })
+
+
 def post_detail(request, post_id):
     """Просмотр поста c комментариями.
 
@@ -78,7 +158,11 @@ def post_detail(request, post_id):
     """
 
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related(
+            'author__stats', 'group').with_activity(),
+        pk=post_id,
+    )
 
     # Короткий текст поста для заголовка вкладки браузера по целым словам
     short_text_of_post = ' '.join(
@@ -96,9 +180,15 @@ def post_detail(request, post_id):
     context = {
         'short_text_of_post': short_text_of_post,
         'post': post,
+        'thumbnails': page_thumbnails([post]),
+        'author_stats': get_stats(post.author),
         'form': form,
     }
-    return render(request, template, context)
+    response = conditional_render(
+        request, template, context,
+        post_validators(request, post, context['author_stats'].post_count),
+    )
+    return add_surrogate_keys(response, post_surrogate_keys(post))
 
 
 def post_edit(request, post_id):
@@ -165,16 +255,12 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Подписки на авторов."""
     template = 'posts/follow.html'
-    user = get_object_or_404(User, username=request.user.username)
 
-    post_list = Post.objects.filter(
-        author__following__user__follower__user=user).distinct()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS_TO_VIEW)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_feed_page(request, request.user)
 
     context = {
         'page_obj': page_obj,
+        'thumbnails': page_thumbnails(page_obj),
     }
 
     return render(request, template, context)
@@ -206,3 +292,32 @@ def profile_unfollow(request, username):
 
     return redirect(
         reverse('posts:profile', kwargs={'username': username},))
+
+
+@login_required(redirect_field_name=None)
+@require_safe
+def export_view(request):
+    """Потоковая выгрузка постов или комментариев пользователя.
+
+    Параметры: ?format=jsonl|csv|zip и ?kind=posts|comments (zip
+    содержит и посты, и комментарии, и картинки). Администратор
+    может выгрузить данные другого пользователя (?username=).
+    """
+    file_format = request.GET.get('format', 'jsonl')
+    kind = request.GET.get('kind', 'posts')
+    if file_format not in export.FORMATS or kind not in export.KINDS:
+        return HttpResponseBadRequest('Неизвестный формат или тип данных.')
+    user = request.user
+    username = request.GET.get('username')
+    if username and username != user.username:
+        if not user.is_staff:
+            raise Http404
+        user = get_object_or_404(User, username=username)
+    response = StreamingHttpResponse(
+        export.iter_export(*export.user_querysets(user), kind, file_format),
+        content_type=export.CONTENT_TYPES[file_format],
+    )
+    filename = export.export_filename(user.username, kind, file_format)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,56 @@
+"""Модуль виджетов форм приложения Posts."""
+
+
+from django import forms
+from django.urls import reverse
+
+
+class AutocompleteSelect(forms.Select):
+    """Список выбора с подсказками с сервера вместо всех вариантов.
+
+    В разметку попадают только пустой и выбранный варианты, поэтому
+    страница не загружает всю таблицу. Остальные варианты подставляет
+    js/autocomplete.js по мере ввода, запрашивая posts:autocomplete.
+    """
+
+    def __init__(self, kind: str, attrs=None) -> None:
+        """kind - вид подсказок: 'groups' или 'users'."""
+        super().__init__(attrs)
+        self.kind = kind
+
+    class Media:
+        """Скрипт подсказок."""
+        js = ('js/autocomplete.js',)
+
+    def get_context(self, name, value, attrs):
+        """Адрес подсказок и поле значения в data-атрибутах."""
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs'].update({
+            'data-autocomplete-url': reverse(
+                'posts:autocomplete', args=[self.kind]),
+            'data-autocomplete-value': (
+                self.choices.field.to_field_name or 'id'),
+        })
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        """Пустой вариант и выбранные значения без запроса всех строк."""
+        field = self.choices.field
+        choices = []
+        if field.empty_label is not None:
+            choices.append(('', field.empty_label))
+        values = [item for item in value if item]
+        if values:
+            key = field.to_field_name or 'pk'
+            choices.extend(
+                self.choices.choice(obj)
+                for obj in self.choices.queryset.filter(
+                    **{f'{key}__in': values})
+            )
+        return [
+            (None, [self.create_option(
+                name, choice_value, label,
+                str(choice_value) in value, index, attrs=attrs,
+            )], index)
+            for index, (choice_value, label) in enumerate(choices)
+        ]
@@ -0,0 +1,55 @@
+// Подсказки для списков выбора posts.widgets.AutocompleteSelect.
+// Перед списком добавляется поле ввода; по мере ввода варианты списка
+// заменяются ответом data-autocomplete-url, выбранный вариант остается.
+(function () {
+  'use strict';
+
+  var DELAY = 250;
+
+  function replaceOptions(select, results, valueField) {
+    var keep = Array.prototype.filter.call(select.options, function (option) {
+      return option.value === '' || option.selected;
+    });
+    var values = keep.map(function (option) { return option.value; });
+    select.innerHTML = '';
+    keep.forEach(function (option) { select.add(option); });
+    results.forEach(function (item) {
+      var value = String(item[valueField]);
+      if (values.indexOf(value) === -1) {
+        select.add(new Option(item.text, value));
+      }
+    });
+  }
+
+  function attach(select) {
+    var input = document.createElement('input');
+    var timer = null;
+    var request = 0;
+    input.type = 'search';
+    input.className = 'form-control mb-1';
+    input.placeholder = 'Начните вводить для поиска';
+    input.setAttribute('aria-controls', select.id);
+    select.parentNode.insertBefore(input, select);
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var current = ++request;
+        var url = select.dataset.autocompleteUrl +
+          '?q=' + encodeURIComponent(input.value);
+        fetch(url, {credentials: 'same-origin'})
+          .then(function (response) { return response.json(); })
+          .then(function (data) {
+            if (current === request) {
+              replaceOptions(
+                select, data.results, select.dataset.autocompleteValue);
+            }
+          });
+      }, DELAY);
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]')
+      .forEach(attach);
+  });
+}());
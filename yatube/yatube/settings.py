@@ -31,19 +31,24 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Панель отладки стоит снаружи кэша страниц: ее HTML не попадает
+    # в закэшированные ответы.
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -69,6 +74,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Тесты не читают и не засоряют кэш и медиафайлы запущенного сайта:
+# на время прогона они переносятся во временный каталог.
+TEST_RUNNER = 'core.runner.TestRunner'
+
 
 DATABASES = {
     'default': {
@@ -107,6 +116,13 @@ USE_TZ = True
 
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# collectstatic добавляет к именам хеш содержимого и создает сжатые
+# копии .gz (и .br при установленном пакете brotli); их отдает
+# core.middleware.StaticFilesMiddleware. Файлы с хешем кэшируются
+# браузером навсегда, остальные - на STATIC_MAX_AGE секунд.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE: int = 60
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
@@ -119,16 +135,134 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUMBER_OF_POSTS_TO_VIEW: int = 10
 NUMBER_OF_SYMBOLS_TO_VIEW: int = 30
+# Старые номерные ссылки ?page=N ограничены этим номером страницы.
+PAGINATOR_MAX_PAGE_NUMBER: int = 10
+
+# Поиск постов: учитываются только первые слова запроса.
+SEARCH_MAX_TERMS: int = 8
+# Количество подсказок автодополнения групп и пользователей.
+AUTOCOMPLETE_LIMIT: int = 10
+# Наименьшая длина начала ввода, для которого выдаются подсказки.
+AUTOCOMPLETE_MIN_PREFIX: int = 2
+# Запросов подсказок от одного клиента (пользователь или IP) в минуту.
+AUTOCOMPLETE_RATE_LIMIT: int = 120
+# Новые пользователи попадают в подсказки с задержкой до стольких
+# секунд: процесс перестраивает индекс не чаще.
+AUTOCOMPLETE_REBUILD_DELAY: int = 60
+# Наибольший размер страницы API (?limit=).
+API_MAX_PAGE_SIZE: int = 100
+# Выгрузка данных: строк в одной выборке из БД и размер блока ответа.
+EXPORT_CHUNK_SIZE: int = 2000
+EXPORT_BLOCK_SIZE: int = 64 * 1024
+
+# Atom-ленты: количество записей, длина заголовка записи в словах,
+# время хранения готовой ленты в кэше (сбрасывается и записью постов)
+# и время, на которое клиентам разрешено кэшировать ленту.
+ATOM_FEED_SIZE: int = 20
+ATOM_FEED_TITLE_WORDS: int = 10
+ATOM_FEED_CACHE_TIMEOUT: int = 60 * 60 * 24
+ATOM_FEED_MAX_AGE: int = 300
+
+# Лента подписок: авторы с большим числом подписчиков не раскладываются
+# по лентам при публикации, а подмешиваются в ленту при чтении.
+FEED_FANOUT_MAX_FOLLOWERS: int = 10000
+FEED_PULL_AUTHORS_CACHE_TIMEOUT: int = 300
+FEED_BATCH_SIZE: int = 1000
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Отдача медиафайлов (core.views.serve_media): None - сам Django
+# (FileResponse с Range), 'x-sendfile' (Apache, lighttpd) или
+# 'x-accel-redirect' (nginx, internal location с префиксом
+# MEDIA_ACCEL_REDIRECT_PREFIX, указывающий на MEDIA_ROOT).
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE: int = 3600
+# Функция name -> bool: учтены ли ссылки на файл картинки. Файл без
+# ссылок core.storage.ContentAddressedStorage записывает заново,
+# а не переиспользует: его может удалять delete_unreferenced.
+MEDIA_REFERENCE_CHECK = 'posts.media.is_referenced'
+
+# Миниатюры картинок постов: геометрия -> опции sorl-thumbnail.
+# Создаются фоновыми потоками после сохранения поста, шаблоны
+# до их готовности выводят заглушку.
+POST_IMAGE_THUMBNAILS = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+POST_THUMBNAIL_WORKERS: int = 2
+# Миниатюры создаются сразу при фиксации транзакции, без фонового
+# потока (YATUBE_THUMBNAILS_EAGER=1; тесты включают через настройки).
+POST_THUMBNAILS_EAGER: bool = (
+    os.environ.get('YATUBE_THUMBNAILS_EAGER') == '1')
+# Загрузка картинок постов: лимит объема файлов запроса, лимит
+# пикселей (защита от декомпрессионных бомб), лимит памяти на
+# декодирование и максимальная сторона сохраняемого оригинала.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+POST_IMAGE_MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS: int = 50_000_000
+POST_IMAGE_MAX_DECODE_MEMORY: int = 128 * 1024 * 1024
+POST_IMAGE_MAX_DIMENSION: int = 2560
+# Адаптивные варианты картинок постов (srcset): кадр с пропорциями
+# сниппета нескольких ширин; форматы, которые не умеет сохранять
+# Pillow, пропускаются.
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1920)
+POST_IMAGE_VARIANT_FORMATS = ('avif', 'webp')
+POST_IMAGE_VARIANT_QUALITY: int = 75
+POST_IMAGE_PLACEHOLDER_WIDTH: int = 16
+POST_IMAGE_SIZES = '(max-width: 992px) 100vw, 720px'
+
+# Бэкенды кэша: shared - общий для всех процессов узла файл SQLite
+# (core.cache.SQLiteCache), locmem - свой кэш у каждого процесса.
+# Файл кэша лежит в каталоге проекта (или по пути YATUBE_CACHE_PATH),
+# а префикс ключей отделяет их от ключей других сайтов в том же файле.
+CACHE_BACKENDS = {
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    },
+}
+CACHE_BACKEND: str = 'shared'
 
+# default - двухуровневый кэш (core.cache.TieredCache): LRU процесса
+# поверх выбранного бэкенда с защитой от одновременного пересчета.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': 256,
+            'LOCAL_TIMEOUT': 5,
+            'STALE_TIMEOUT': 60 * 10,
+            'LOCK_TIMEOUT': 30,
+            'LOCK_WAIT': 2,
+            'EARLY_REFRESH_BETA': 1,
+            'STATS_FLUSH_INTERVAL': 10,
+        },
+    },
+    'shared': CACHE_BACKENDS[CACHE_BACKEND],
 }
 
+# Фрагмент главной страницы сбрасывается сигналами при записи постов,
+# поэтому время жизни может быть большим.
+INDEX_PAGE_CACHE_TIMEOUT: int = 60 * 60 * 6
+# Сниппеты постов кэшируются по ключу из id и даты изменения поста.
+POST_SNIPPET_CACHE_TIMEOUT: int = 60 * 60 * 24
+# Полные страницы для гостей сбрасываются по суррогатным ключам.
+PAGE_CACHE_TIMEOUT: int = 60 * 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 INTERNAL_IPS = [